@@ -0,0 +1,241 @@
+"""
+Adaptive Tuner
+Picks read sizes and segment counts from measured throughput and round-trip time
+"""
+
+import time
+import threading
+
+
+def _power_of_two(value):
+    """Nearest power of two at or below value (at least 1)"""
+    return 1 << max(0, int(value).bit_length() - 1)
+
+
+def _format_size(bytes_size):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if bytes_size < 1024.0:
+            return f"{bytes_size:.1f} {unit}"
+        bytes_size /= 1024.0
+    return f"{bytes_size:.1f} TB"
+
+
+class TransferMonitor:
+    """
+    Throughput and RTT of one running transfer, and the read size chosen for it
+
+    Call update() with every read; read_size follows the measured rate.
+    snapshot() describes the current decision for progress callbacks.
+    """
+
+    def __init__(self, tuner, host, read_size, rtt=None):
+        self.tuner = tuner
+        self.host = host
+        self.read_size = read_size
+        self.rtt = rtt  # Seconds from request to response headers
+        self.throughput = 0.0  # Smoothed bytes per second
+        self.decision = f"start at {_format_size(read_size)} per read"
+        self.started = time.monotonic()
+        self.bytes = 0
+        self._window_start = self.started
+        self._window_bytes = 0
+
+    def update(self, received):
+        """
+        Account for received bytes
+
+        Returns:
+            int: Read size to use next
+        """
+        self.bytes += received
+        self._window_bytes += received
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed >= self.tuner.sample_interval:
+            rate = self._window_bytes / elapsed
+            self.throughput = rate if not self.throughput else 0.5 * self.throughput + 0.5 * rate
+            self._window_start = now
+            self._window_bytes = 0
+            size, decision = self.tuner.next_read_size(self.read_size, self.throughput)
+            if size != self.read_size:
+                self.read_size = size
+                self.decision = decision
+        return self.read_size
+
+    def finish(self, segments=None, throttled=False):
+        """Report the finished transfer so later ones to the same host start well"""
+        self.tuner.record_transfer(
+            self.host, segments, self.bytes, time.monotonic() - self.started,
+            read_size=self.read_size if self.throughput else None, throttled=throttled
+        )
+
+    def snapshot(self):
+        """Current measurements and decision"""
+        return {
+            'read_size': self.read_size,
+            'throughput': int(self.throughput),
+            'rtt_ms': round(self.rtt * 1000, 1) if self.rtt is not None else None,
+            'decision': self.decision
+        }
+
+
+class AdaptiveTuner:
+    """
+    Tune transfers to the link instead of using fixed sizes
+
+    Read size: each read should take about target_read_time at the measured
+    throughput. Fast links get large reads (fewer loop iterations and
+    system calls); slow links get small ones (steady progress, little
+    memory held per transfer). Sizes move in powers of two and only when
+    the ideal is at least twice as large or half as small.
+
+    Segments: per host, the parallel segment count is hill-climbed across
+    downloads. While adding connections raises throughput by more than 10%
+    the count keeps growing; when it stops helping it steps back. High-RTT
+    hosts start with twice as many connections, since one TCP stream
+    reaches less of the link there. Throttled transfers teach nothing.
+
+    Args:
+        initial_read_size: First read size for hosts without history
+        min_read_size, max_read_size: Bounds for read sizes
+        min_start_read_size: Floor for starting read sizes - segments and
+                             iter_content() loops keep theirs for the whole transfer
+        target_read_time: Seconds one read should take
+        initial_segments, max_segments: Segment count bounds
+        min_segment_size: Smallest segment worth its own connection
+        sample_interval: Seconds between throughput samples
+    """
+
+    def __init__(self, initial_read_size=1024 * 1024, min_read_size=8 * 1024, max_read_size=4 * 1024 * 1024,
+                 min_start_read_size=256 * 1024, target_read_time=0.05, initial_segments=4, max_segments=16,
+                 min_segment_size=8 * 1024 * 1024, sample_interval=0.5):
+        self.min_read_size = min_read_size
+        self.max_read_size = max_read_size
+        self.min_start_read_size = min_start_read_size
+        self.initial_read_size = self._clamp(initial_read_size)
+        self.target_read_time = target_read_time
+        self.initial_segments = max(1, initial_segments)
+        self.max_segments = max(self.initial_segments, max_segments)
+        self.min_segment_size = min_segment_size
+        self.sample_interval = sample_interval
+        self.high_rtt = 0.15  # Seconds
+        self._hosts = {}  # host -> learned settings
+        self._lock = threading.Lock()
+
+    def configure(self, initial_read_size=None, max_segments=None):
+        """Change settings (None leaves a setting unchanged)"""
+        with self._lock:
+            if initial_read_size:
+                self.initial_read_size = self._clamp(initial_read_size)
+            if max_segments:
+                self.max_segments = max(self.initial_segments, int(max_segments))
+
+    def _clamp(self, size):
+        return max(self.min_read_size, min(self.max_read_size, int(size)))
+
+    def read_size_for(self, host, streams=1):
+        """Starting read size for a host, split across parallel streams"""
+        with self._lock:
+            learned = self._hosts.get(host, {}).get('read_size') or self.initial_read_size
+        return self._clamp(max(self.min_start_read_size, _power_of_two(learned // max(1, streams))))
+
+    def monitor(self, host, rtt=None):
+        """Start measuring a transfer"""
+        return TransferMonitor(self, host, self.read_size_for(host), rtt)
+
+    def next_read_size(self, current, throughput):
+        """
+        Read size for the measured throughput
+
+        Returns:
+            tuple: (read size, human-readable decision)
+        """
+        ideal = self._clamp(_power_of_two(max(1, throughput * self.target_read_time)))
+        if ideal >= current * 2:
+            return ideal, f"grow reads to {_format_size(ideal)} at {_format_size(throughput)}/s"
+        if ideal * 2 <= current:
+            return ideal, f"shrink reads to {_format_size(ideal)} at {_format_size(throughput)}/s"
+        return current, f"keep {_format_size(current)} reads"
+
+    def segments_for(self, host, total_size, rtt=None, initial=None):
+        """
+        Segment count for a new download
+
+        Args:
+            host: Server the file comes from
+            total_size: File size
+            rtt: Measured round-trip time in seconds, if known
+            initial: Count to start from for hosts without history
+
+        Returns:
+            tuple: (segment count, human-readable decision)
+        """
+        by_size = max(1, total_size // self.min_segment_size)
+        with self._lock:
+            learned = self._hosts.get(host, {})
+            count = learned.get('segments')
+            decision = learned.get('decision')
+        if count is None:
+            count = min(self.max_segments, initial or self.initial_segments)
+            decision = f"start with {count} connections"
+            if rtt is not None and rtt >= self.high_rtt:
+                count = min(self.max_segments, count * 2)
+                decision = f"start with {count} connections (RTT {rtt * 1000:.0f} ms)"
+        if count > by_size:
+            count = by_size
+            decision = f"{count} connections (file too small for more)"
+        return count, decision
+
+    def record_transfer(self, host, segments, nbytes, seconds, read_size=None, throttled=False):
+        """
+        Learn from a finished transfer
+
+        Args:
+            host: Server the transfer came from
+            segments: Parallel segments used (None for a single-stream transfer)
+            nbytes, seconds: Bytes fetched and how long it took
+            read_size: Read size the transfer settled on
+            throttled: A bandwidth limit applied, so the rate says nothing about the link
+        """
+        if throttled or seconds <= 0:
+            return
+        with self._lock:
+            learned = self._hosts.setdefault(host, {})
+            if read_size:
+                learned['read_size'] = read_size
+            if segments is None or nbytes < self.min_segment_size:
+                return
+            rate = nbytes / seconds
+            previous_rate = learned.get('rate')
+            previous_segments = learned.get('tried_segments')
+            step = learned.get('step', 2)
+
+            if previous_rate is None or previous_segments is None or previous_segments == segments:
+                learned['segments'] = max(1, min(self.max_segments, segments + step))
+                learned['decision'] = f"{segments} connections gave {_format_size(rate)}/s, trying {learned['segments']}"
+            elif rate > previous_rate * 1.1:
+                learned['segments'] = max(1, min(self.max_segments, segments + step))
+                learned['decision'] = (f"{segments} connections were {(rate / previous_rate - 1) * 100:.0f}% faster, "
+                                       f"trying {learned['segments']}")
+            else:
+                # No real gain: settle on the cheaper count unless this one was clearly worse,
+                # and probe the other direction next time
+                if rate >= previous_rate * 0.9:
+                    best = min(segments, previous_segments)
+                else:
+                    best = previous_segments
+                learned['step'] = -step
+                learned['segments'] = best
+                learned['decision'] = f"{segments} connections did not help, settling on {best}"
+                rate = max(rate, previous_rate)
+                segments = best
+            learned['rate'] = rate
+            learned['tried_segments'] = segments
+
+
+_tuner = AdaptiveTuner()
+
+
+def get_tuner():
+    """Shared tuner, so every downloader learns from the same transfers"""
+    return _tuner
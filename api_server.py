@@ -3,25 +3,37 @@ REST API Server for Download Manager
 Runs on GCE VM, controlled remotely by phone app
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 import os
+import json
+import math
+import uuid
+import hashlib
+import itertools
 import threading
 from pathlib import Path
 import mimetypes
+from urllib.parse import quote
+from werkzeug.http import parse_date
 
 # Import existing download manager components
 from youtube_downloader import YouTubeDownloader
 from huggingface_downloader import HuggingFaceDownloader
 from download_manager import DownloadManager
-from downloads_database import DownloadsDatabase
-from utils import URLDetector
+from downloads_database import SQLiteDownloadsDatabase
+from download_scheduler import DownloadScheduler
+from event_bus import EventBus
+from file_index import FileIndex
+from bandwidth_limiter import get_limiter
+from adaptive_tuner import get_tuner
+from utils import URLDetector, ConfigManager
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for mobile app
 
 # Initialize components
-downloads_db = DownloadsDatabase()
+downloads_db = SQLiteDownloadsDatabase()  # Imports downloads_database.json on first run
 url_detector = URLDetector()
 downloaders = {
     'youtube': YouTubeDownloader(),
@@ -32,9 +44,50 @@ downloaders = {
 # Configuration
 DOWNLOAD_DIR = os.path.expanduser("~/Downloads/NGK_Downloads")
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+STREAM_CHUNK_SIZE = 256 * 1024  # Read size for streamed file responses
+MAX_PAGE_SIZE = 500  # Largest page served by GET /downloads
+MAX_RANGES = 16  # Ranges honoured in one Range header; more get the whole file
+EVENT_MAX_RATE = 4  # Progress batches per second sent to each /events client
+EVENT_KEEPALIVE = 15  # Seconds between keep-alive comments on idle streams
+EVENT_FIELDS = ('filename', 'status', 'progress_percent', 'speed', 'downloaded', 'total', 'error')
 
 # Active downloads tracking
 active_downloads = {}
+download_counter = itertools.count()
+
+# Running downloads deleted by the user - their progress callbacks stop the transfer
+cancelled_downloads = set()
+
+# In-memory listing of DOWNLOAD_DIR for /files, kept current by filesystem events
+file_index = FileIndex(DOWNLOAD_DIR).start()
+
+# Progress deltas pushed to /events subscribers
+event_bus = EventBus(max_rate=EVENT_MAX_RATE)
+
+# Playlist parents -> item counters (items run as their own scheduled downloads)
+playlists = {}
+playlists_lock = threading.Lock()
+
+# Bounded worker pool - sized from the app config instead of one thread per request
+config = ConfigManager().load_config()
+scheduler = DownloadScheduler(
+    max_workers=config.get('max_downloads', 3),
+    per_host_limit=config.get('max_downloads_per_host', 2)
+)
+
+# Download bandwidth shaping shared by every downloader, adjustable through /bandwidth
+bandwidth = get_limiter()
+bandwidth.configure(
+    global_rate=config.get('bandwidth_limit', 0),
+    link_rate=config.get('link_rate', 0),
+    serving_reserve=config.get('serving_reserve', 0)
+)
+
+# Read sizes and segment counts start from the config and then follow measured throughput
+get_tuner().configure(
+    initial_read_size=config.get('chunk_size'),
+    max_segments=config.get('max_segments')
+)
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -54,7 +107,8 @@ def queue_download():
         {
             "url": "https://youtube.com/watch?v=...",
             "quality": "best" | "720p" | "480p" | "audio",
-            "filename": "optional_custom_name"
+            "filename": "optional_custom_name",
+            "priority": 0  (optional, higher runs sooner)
         }
     """
     data = request.json
@@ -65,12 +119,17 @@ def queue_download():
     if not url:
         return jsonify({'error': 'URL is required'}), 400
     
+    try:
+        priority = int(data.get('priority', 0))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'priority must be an integer'}), 400
+    
     # Detect URL type
     url_type = url_detector.detect_url_type(url)
     
     # Generate download ID
     from datetime import datetime
-    download_id = f"dl_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{len(active_downloads)}"
+    download_id = f"dl_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{next(download_counter)}"
     
     # Add to database
     downloads_db.add_download(
@@ -81,24 +140,44 @@ def queue_download():
         url_type=url_type
     )
     
-    # Start download in background thread
-    thread = threading.Thread(
-        target=download_worker,
-        args=(download_id, url, url_type, quality),
-        daemon=True
+    event_bus.publish(download_id, filename=custom_filename or "Preparing...", status='queued', url=url)
+    
+    # Hand off to the worker pool
+    position = scheduler.submit(
+        download_id,
+        download_worker,
+        args=(download_id, url, url_type, quality, priority),
+        priority=priority,
+        host=url_detector.extract_domain(url)
     )
-    thread.start()
     
     return jsonify({
         'download_id': download_id,
         'url': url,
         'type': url_type,
-        'status': 'queued'
+        'status': 'queued',
+        'queue_position': position
     }), 201
 
-def download_worker(download_id, url, url_type, quality):
-    """Background worker to handle downloads"""
+class DownloadCancelled(Exception):
+    """Raised from a progress callback to stop a deleted download"""
+    pass
+
+def _update_download(download_id, **fields):
+    """Update a download in the database and push the change to /events"""
+    if download_id in cancelled_downloads:
+        return  # Deleted: the row is gone and clients were told
+    downloads_db.update_download(download_id, **fields)
+    delta = {key: value for key, value in fields.items() if key in EVENT_FIELDS and value is not None}
+    if delta:
+        event_bus.publish(download_id, **delta)
+
+def _progress_updater(download_id):
+    """Build a progress callback that writes into one database entry"""
     def progress_callback(progress_info):
+        if download_id in cancelled_downloads:
+            raise DownloadCancelled(f"Download {download_id} was deleted")
+        
         # Update database with progress
         update_data = {}
         if 'filename' in progress_info:
@@ -114,13 +193,33 @@ def download_worker(download_id, url, url_type, quality):
             update_data['speed'] = progress_info['speed']
         if 'status' in progress_info:
             update_data['status'] = progress_info['status']
+        if 'downloaded' in progress_info:
+            update_data['downloaded'] = progress_info['downloaded']
+        if progress_info.get('total'):
+            update_data['total'] = progress_info['total']
         
         if update_data:
-            downloads_db.update_download(download_id, **update_data)
+            _update_download(download_id, **update_data)
+    
+    return progress_callback
+
+def download_worker(download_id, url, url_type, quality, priority=0, parent_id=None):
+    """Background worker to handle downloads"""
+    progress_callback = _progress_updater(download_id)
+    # PUT /downloads/<id>/bandwidth limits apply to this download's transfers (and a playlist's to its items)
+    bandwidth.register_download(download_id, url, parent=parent_id)
+    expanded = False
     
     try:
         active_downloads[download_id] = {'status': 'downloading'}
         
+        if url_type == "YouTube" and parent_id is None and url_detector.is_playlist_url(url):
+            playlist = downloaders['youtube'].expand_playlist(url)
+            if playlist:
+                expanded = True  # The playlist's limit stays until its last item finishes
+                queue_playlist_items(download_id, playlist, quality, priority)
+                return
+        
         if url_type == "YouTube":
             audio_only = quality == "audio"
             result = downloaders['youtube'].download(
@@ -133,8 +232,16 @@ def download_worker(download_id, url, url_type, quality):
         else:
             result = downloaders['direct'].download(url, DOWNLOAD_DIR, progress_callback)
         
+        # Downloaders report failure through their return value
+        if result is False:
+            raise Exception('Download failed')
+        if isinstance(result, dict) and result.get('status') == 'error':
+            raise Exception(result.get('error', 'Download failed'))
+        
+        _index_download(result)
+        
         # Mark as completed
-        downloads_db.update_download(
+        _update_download(
             download_id,
             status='completed',
             progress_percent=100,
@@ -143,12 +250,146 @@ def download_worker(download_id, url, url_type, quality):
         active_downloads[download_id] = {'status': 'completed', 'result': result}
         
     except Exception as e:
-        downloads_db.update_download(
+        _update_download(
             download_id,
             status='failed',
             error=str(e)
         )
         active_downloads[download_id] = {'status': 'failed', 'error': str(e)}
+    
+    finally:
+        cancelled_downloads.discard(download_id)
+        if not expanded:
+            bandwidth.unregister_download(download_id, url)
+        if parent_id is not None:
+            _playlist_item_finished(parent_id, active_downloads[download_id])
+
+def _index_download(result):
+    """Make a finished download show up in /files right away"""
+    filepath = result.get('filepath') if isinstance(result, dict) else None
+    if filepath and os.path.isfile(filepath):
+        file_index.update(filepath)
+    elif not file_index.is_watching():
+        file_index.schedule_rescan()
+
+def queue_playlist_items(download_id, playlist, quality, priority):
+    """Queue every playlist entry as its own download with its own progress row"""
+    entries = playlist['entries']
+    if not entries:
+        # Nothing will report back, so the playlist finishes here
+        bandwidth.unregister_download(download_id)
+        active_downloads[download_id] = {'status': 'completed', 'result': {'title': playlist['title'], 'total': 0}}
+        _update_download(
+            download_id,
+            filename=f"{playlist['title']} (0/0 items)",
+            status='completed',
+            progress_percent=100,
+            playlist_items=0
+        )
+        return
+    
+    with playlists_lock:
+        playlists[download_id] = {'title': playlist['title'], 'total': len(entries),
+                                  'completed': 0, 'skipped': 0, 'failed': 0}
+    
+    _update_download(
+        download_id,
+        filename=f"{playlist['title']} (0/{len(entries)} items)",
+        status='Queued playlist items',
+        progress_percent=0,
+        playlist_items=len(entries)
+    )
+    active_downloads[download_id] = {'status': 'playlist'}
+    
+    for entry in entries:
+        item_id = f"{download_id}_{entry['index']:04d}"
+        downloads_db.add_download(
+            download_id=item_id,
+            url=entry['url'],
+            filename=entry['title'],
+            destination=DOWNLOAD_DIR,
+            url_type="YouTube"
+        )
+        downloads_db.update_download(item_id, playlist_id=download_id, playlist_index=entry['index'])
+        event_bus.publish(item_id, filename=entry['title'], status='queued', url=entry['url'])
+        scheduler.submit(
+            item_id,
+            download_worker,
+            args=(item_id, entry['url'], "YouTube", quality, priority, download_id),
+            priority=priority,
+            host=url_detector.extract_domain(entry['url'])
+        )
+
+def _playlist_item_finished(parent_id, outcome):
+    """Fold one finished item into its playlist's progress row"""
+    with playlists_lock:
+        counts = playlists.get(parent_id)
+        if counts is None:
+            return
+        if outcome.get('status') != 'completed':
+            counts['failed'] += 1
+        elif isinstance(outcome.get('result'), dict) and outcome['result'].get('skipped'):
+            counts['skipped'] += 1
+        else:
+            counts['completed'] += 1
+        finished = counts['completed'] + counts['skipped'] + counts['failed']
+        snapshot = dict(counts)
+    
+    update = {
+        'filename': f"{snapshot['title']} ({finished}/{snapshot['total']} items)",
+        'progress_percent': (finished / snapshot['total']) * 100,
+        'playlist_completed': snapshot['completed'],
+        'playlist_skipped': snapshot['skipped'],
+        'playlist_failed': snapshot['failed'],
+        'status': f"Downloading playlist ({finished}/{snapshot['total']})"
+    }
+    if finished == snapshot['total']:
+        update['status'] = 'failed' if snapshot['failed'] == snapshot['total'] else 'completed'
+        active_downloads[parent_id] = {'status': update['status'], 'result': snapshot}
+        with playlists_lock:
+            playlists.pop(parent_id, None)
+        bandwidth.unregister_download(parent_id)
+    _update_download(parent_id, **update)
+
+@app.route('/events', methods=['GET'])
+def stream_events():
+    """
+    Server-Sent Events stream of download changes
+    
+    Each event carries a JSON list of compact deltas, one per changed
+    download: {"id", and any of "filename", "status", "progress_percent",
+    "speed", "downloaded", "total", "error"}. Updates for the same download
+    are coalesced and each client receives at most EVENT_MAX_RATE events per
+    second. Query: ?rate=<events per second> to ask for fewer.
+    """
+    try:
+        rate = float(request.args.get('rate', EVENT_MAX_RATE))
+    except ValueError:
+        rate = EVENT_MAX_RATE
+    if not (math.isfinite(rate) and rate > 0):
+        rate = EVENT_MAX_RATE  # Zero, negative or NaN rates would lift the limit
+    rate = min(rate, EVENT_MAX_RATE)
+    subscription = event_bus.subscribe(max_rate=rate)
+    
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                batch = subscription.get(timeout=EVENT_KEEPALIVE)
+                if subscription.closed:
+                    return
+                if not batch:
+                    yield ": keepalive\n\n"
+                    continue
+                payload = json.dumps(batch, separators=(',', ':'))
+                yield f"id: {event_bus.next_sequence()}\nevent: progress\ndata: {payload}\n\n"
+        finally:
+            subscription.close()
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let a reverse proxy buffer the stream
+    return response
 
 @app.route('/status/<download_id>', methods=['GET'])
 def get_download_status(download_id):
@@ -158,51 +399,134 @@ def get_download_status(download_id):
     if not download_info:
         return jsonify({'error': 'Download not found'}), 404
     
+    download_info['queue_position'] = scheduler.get_position(download_id)
     return jsonify(download_info)
 
+def _int_arg(name):
+    """Integer query argument, None if absent (ValueError if not an integer)"""
+    value = request.args.get(name)
+    return int(value) if value is not None else None
+
 @app.route('/downloads', methods=['GET'])
 def list_downloads():
-    """List all downloads"""
+    """
+    List downloads
+    
+    Query:
+        status: Only downloads with this status
+        fields: Comma-separated fields to return (id is always included)
+        limit: Page size; the response then carries next_cursor
+        cursor: next_cursor from the previous page
+        since: Revision from an earlier response - return only rows changed
+               after it, plus the ids deleted since (delta sync). With status,
+               rows that changed to another status are listed as deleted.
+    
+    Without limit/cursor/since the response is the plain list of downloads.
+    Otherwise it is {"revision", "downloads", ...}. Every response carries an
+    ETag, so an unchanged list costs a 304 with no body.
+    """
     status_filter = request.args.get('status')  # Optional: filter by status
+    fields = [f for f in request.args.get('fields', '').split(',') if f]
     
-    all_downloads = downloads_db.get_all_downloads()
+    try:
+        limit = _int_arg('limit')
+        since = _int_arg('since')
+        if (limit is not None and limit <= 0) or (since is not None and since < 0):
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'limit must be a positive integer and since a non-negative integer'}), 400
+    limit = min(limit, MAX_PAGE_SIZE) if limit else None
+    cursor = request.args.get('cursor')
     
-    if status_filter:
-        filtered = {
-            did: info for did, info in all_downloads.items()
-            if info.get('status') == status_filter
-        }
-        return jsonify(filtered)
+    # The revision changes with every write, so it validates any query. Delta
+    # polls change since= every time, so their ETag leaves it out: a client that
+    # is caught up sends back the ETag it got with the revision it now asks from.
+    revision = downloads_db.get_revision()
+    query = sorted((key, value) for key, value in request.args.items(multi=True) if key != 'since')
+    etag = f'"{revision}-{hashlib.md5(repr(query).encode()).hexdigest()[:12]}"'
+    if_none_match = [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]
+    if etag in if_none_match and (since is None or since >= revision):
+        response = app.response_class(status=304)
+        response.headers['ETag'] = etag
+        return response
     
-    return jsonify(all_downloads)
+    def project(rows):
+        if not fields:
+            return rows
+        return [{key: row.get(key) for key in ['id'] + fields} for row in rows]
+    
+    try:
+        if since is not None:
+            changes = downloads_db.get_changes(since, limit)
+            rows = changes['downloads']
+            deleted = changes['deleted']
+            if status_filter:
+                # Rows that changed to another status left the filtered view
+                deleted = deleted + [d['id'] for d in rows if d.get('status') != status_filter]
+                rows = [d for d in rows if d.get('status') == status_filter]
+            body = {
+                'revision': changes['revision'],
+                'downloads': project(rows),
+                'deleted': deleted,
+                'has_more': changes['has_more'],
+                'reset': changes['reset']
+            }
+        elif limit is not None or cursor:
+            rows, next_cursor = downloads_db.list_downloads(status_filter, limit, cursor)
+            body = {
+                'revision': revision,
+                'downloads': project(rows),
+                'next_cursor': next_cursor
+            }
+        else:
+            if status_filter:
+                rows = downloads_db.get_downloads_by_status(status_filter)
+            else:
+                rows = downloads_db.get_all_downloads()
+            body = project(rows)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    response = jsonify(body)
+    response.headers['ETag'] = etag
+    response.headers['X-Revision'] = str(revision)
+    return response
 
 @app.route('/files', methods=['GET'])
 def list_files():
-    """List downloaded files"""
+    """
+    List downloaded files (served from the in-memory file index)
+    
+    Query:
+        search: Case-insensitive substring of the file name
+        sort: modified (default) | name | size
+        order: desc (default) | asc
+        offset, limit: Page window (default: every file)
+    """
     try:
-        files = []
-        download_path = Path(DOWNLOAD_DIR)
-        
-        for file_path in download_path.rglob('*'):
-            if file_path.is_file() and not file_path.name.endswith('.part'):
-                stat = file_path.stat()
-                files.append({
-                    'name': file_path.name,
-                    'path': str(file_path.relative_to(download_path)),
-                    'size': stat.st_size,
-                    'modified': stat.st_mtime,
-                    'url': f'/files/{file_path.relative_to(download_path)}'
-                })
+        offset = request.args.get('offset', 0, type=int)
+        limit = request.args.get('limit', type=int)
+        if offset < 0 or (limit is not None and limit < 0):
+            return jsonify({'error': 'offset and limit must not be negative'}), 400
         
-        # Sort by modified time, newest first
-        files.sort(key=lambda x: x['modified'], reverse=True)
+        total, files = file_index.query(
+            search=request.args.get('search') or None,
+            sort=request.args.get('sort', 'modified'),
+            descending=request.args.get('order', 'desc') != 'asc',
+            offset=offset,
+            limit=limit
+        )
         
         return jsonify({
             'directory': DOWNLOAD_DIR,
             'count': len(files),
+            'total': total,
+            'offset': offset,
             'files': files
         })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -220,57 +544,245 @@ def download_file(filepath):
             return jsonify({'error': 'Access denied'}), 403
         
         # Support range requests for video streaming
+        stat = file_path.stat()
         range_header = request.headers.get('Range')
-        if range_header:
-            return send_file_with_range(file_path, range_header)
+        if range_header and _if_range_matches(stat, request.headers.get('If-Range')):
+            response = send_file_with_range(file_path, range_header)
+        else:
+            response = send_file(
+                file_path,
+                as_attachment=True,
+                download_name=file_path.name,
+                etag=_file_etag(stat).strip('"'),
+                # A Range that failed If-Range gets the whole file; send_file
+                # would otherwise apply it again with weak-validator matching
+                conditional=not range_header
+            )
+            response.headers['Accept-Ranges'] = 'bytes'
         
-        return send_file(
-            file_path,
-            as_attachment=True,
-            download_name=file_path.name
-        )
+        # Downloads give way to the serving reserve until the response is sent
+        bandwidth.begin_serving()
+        response.call_on_close(bandwidth.end_serving)
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def send_file_with_range(file_path, range_header):
-    """Send file with range support for streaming"""
-    file_size = file_path.stat().st_size
+def _file_etag(stat):
+    """Strong validator for a file, derived from its mtime and size"""
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+def _if_range_matches(stat, if_range):
+    """Check an If-Range validator; ranges only apply when it still matches"""
+    if not if_range:
+        return True
     
-    # Parse range header
-    byte_range = range_header.replace('bytes=', '').split('-')
-    start = int(byte_range[0]) if byte_range[0] else 0
-    end = int(byte_range[1]) if len(byte_range) > 1 and byte_range[1] else file_size - 1
-    length = end - start + 1
+    if_range = if_range.strip()
+    if if_range.startswith('W/'):
+        return False  # Weak validators never match for ranges
+    if if_range.startswith('"'):
+        return if_range == _file_etag(stat)
     
-    # Read requested chunk
+    since = parse_date(if_range)
+    return since is not None and int(since.timestamp()) == int(stat.st_mtime)
+
+def parse_range_header(range_header, file_size):
+    """
+    Parse a Range header into a list of (start, end) byte pairs
+    
+    Handles open-ended (bytes=N-), suffix (bytes=-N) and multiple ranges.
+    Overlapping and adjacent ranges are merged, so one request cannot ask
+    for the same bytes several times; more than MAX_RANGES ranges are
+    ignored like a malformed header (RFC 9110 section 14.2).
+    
+    Returns:
+        list: Satisfiable ranges in file order, an empty list if none are
+              satisfiable, or None if the header should be ignored
+    """
+    units, _, spec = range_header.partition('=')
+    if units.strip().lower() != 'bytes' or not spec:
+        return None
+    parts = spec.split(',')
+    if len(parts) > MAX_RANGES:
+        return None
+    
+    ranges = []
+    for part in parts:
+        first, sep, last = part.strip().partition('-')
+        if not sep:
+            return None
+        try:
+            if not first:
+                # Suffix range: last N bytes
+                length = int(last)
+                if length <= 0:
+                    continue
+                start, end = max(0, file_size - length), file_size - 1
+            else:
+                start = int(first)
+                end = int(last) if last else file_size - 1
+                if last and end < start:
+                    return None
+                end = min(end, file_size - 1)
+        except ValueError:
+            return None
+        
+        if start < file_size:
+            ranges.append((start, end))
+    
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def _iter_file_range(file_path, start, end):
+    """Yield a byte range from disk in fixed-size reads"""
+    remaining = end - start + 1
     with open(file_path, 'rb') as f:
         f.seek(start)
-        data = f.read(length)
+        while remaining > 0:
+            data = f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+def send_file_with_range(file_path, range_header):
+    """Stream one or more byte ranges of a file with constant memory"""
+    stat = file_path.stat()
+    file_size = stat.st_size
     
-    # Determine content type
     content_type, _ = mimetypes.guess_type(str(file_path))
     if not content_type:
         content_type = 'application/octet-stream'
     
-    response = app.response_class(
-        data,
-        206,  # Partial Content
-        mimetype=content_type,
-        direct_passthrough=True
-    )
-    response.headers.add('Content-Range', f'bytes {start}-{end}/{file_size}')
-    response.headers.add('Accept-Ranges', 'bytes')
-    response.headers.add('Content-Length', str(length))
+    ranges = parse_range_header(range_header, file_size)
+    if ranges is None:
+        # Malformed Range headers are ignored per RFC 9110 - stream the whole file
+        response = app.response_class(
+            _iter_file_range(file_path, 0, file_size - 1),
+            200,
+            mimetype=content_type,
+            direct_passthrough=True
+        )
+        response.content_length = file_size
+        response.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(file_path.name)}"
+    elif not ranges:
+        response = app.response_class(status=416)
+        response.headers['Content-Range'] = f'bytes */{file_size}'
+        return response
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        response = app.response_class(
+            _iter_file_range(file_path, start, end),
+            206,  # Partial Content
+            mimetype=content_type,
+            direct_passthrough=True
+        )
+        response.headers['Content-Range'] = f'bytes {start}-{end}/{file_size}'
+        response.content_length = end - start + 1
+    else:
+        boundary = uuid.uuid4().hex
+        parts = []
+        for start, end in ranges:
+            header = (
+                f"\r\n--{boundary}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n"
+            ).encode('latin-1')
+            parts.append((header, start, end))
+        closing = f"\r\n--{boundary}--\r\n".encode('latin-1')
+        
+        def generate():
+            for header, start, end in parts:
+                yield header
+                yield from _iter_file_range(file_path, start, end)
+            yield closing
+        
+        response = app.response_class(
+            generate(),
+            206,
+            mimetype=f'multipart/byteranges; boundary={boundary}',
+            direct_passthrough=True
+        )
+        response.content_length = (
+            sum(len(header) + end - start + 1 for header, start, end in parts) + len(closing)
+        )
     
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['ETag'] = _file_etag(stat)
+    response.last_modified = stat.st_mtime
     return response
 
+@app.route('/bandwidth', methods=['GET'])
+def get_bandwidth():
+    """Current bandwidth limits (bytes per second, 0 = unlimited)"""
+    return jsonify(bandwidth.get_limits())
+
+@app.route('/bandwidth', methods=['PUT'])
+def set_bandwidth():
+    """
+    Change bandwidth limits while downloads run
+    
+    Body (every field optional; rates in bytes/s or strings like "2M", "20Mbit"):
+        {
+            "global": "5M",
+            "hosts": {"huggingface.co": "2M", "example.com": 0},
+            "link_rate": "100Mbit",
+            "serving_reserve": "20Mbit"
+        }
+    """
+    data = request.json or {}
+    try:
+        bandwidth.configure(
+            global_rate=data.get('global'),
+            link_rate=data.get('link_rate'),
+            serving_reserve=data.get('serving_reserve')
+        )
+        for host, rate in (data.get('hosts') or {}).items():
+            bandwidth.set_host_limit(host, rate)
+    except (TypeError, ValueError, AttributeError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(bandwidth.get_limits())
+
+@app.route('/downloads/<download_id>/bandwidth', methods=['PUT'])
+def set_download_bandwidth(download_id):
+    """
+    Limit one download
+    
+    A playlist's limit is shared by all of its items. The limit is
+    dropped when the download finishes.
+    
+    Body:
+        {"limit": "1M"}  (0 removes the limit)
+    """
+    download = downloads_db.get_download(download_id)
+    if not download:
+        return jsonify({'error': 'Download not found'}), 404
+    if download.get('status') in ('completed', 'failed'):
+        return jsonify({'error': 'Download already finished'}), 409
+    
+    try:
+        bandwidth.set_download_limit(download_id, (request.json or {}).get('limit'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'download_id': download_id,
+        'limit': bandwidth.get_limits()['downloads'].get(download_id, 0)
+    })
+
 @app.route('/delete/<download_id>', methods=['DELETE'])
 def delete_download(download_id):
-    """Delete a download from database"""
+    """Delete a download from database (a queued job is dropped, a running one stopped)"""
+    if not scheduler.cancel(download_id) and scheduler.get_position(download_id) == 0:
+        cancelled_downloads.add(download_id)  # Running: its next progress update stops it
     success = downloads_db.delete_download(download_id)
     
     if success:
+        event_bus.publish(download_id, status='deleted')
         return jsonify({'message': 'Download deleted'})
     else:
         return jsonify({'error': 'Download not found'}), 404
@@ -279,6 +791,7 @@ def delete_download(download_id):
 def get_stats():
     """Get download statistics"""
     stats = downloads_db.get_statistics()
+    stats['scheduler'] = scheduler.get_stats()
     return jsonify(stats)
 
 if __name__ == '__main__':
@@ -0,0 +1,255 @@
+"""
+Async Download Engine
+asyncio/aiohttp backend for running thousands of direct downloads on one event loop
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+from urllib.parse import urlparse, unquote
+
+try:
+    import aiohttp
+except ImportError:  # Optional dependency - DownloadManager falls back to threads
+    aiohttp = None
+
+from bandwidth_limiter import get_limiter
+
+
+def claim_filename(filename, claimed):
+    """
+    Reserve a filename within one batch
+
+    Two URLs with the same basename (e.g. .../a/model.bin and .../b/model.bin)
+    would otherwise write the same .part file at once. Later ones get
+    "model (2).bin", "model (3).bin", ...
+
+    Args:
+        filename: Preferred name
+        claimed: Set of lower-cased names already taken (updated in place)
+
+    Returns:
+        str: filename or a numbered variant that was free
+    """
+    stem, ext = os.path.splitext(filename)
+    candidate = filename
+    number = 2
+    while candidate.lower() in claimed:
+        candidate = f"{stem} ({number}){ext}"
+        number += 1
+    claimed.add(candidate.lower())
+    return candidate
+
+
+class AsyncDownloadEngine:
+    """
+    Download many files concurrently on a single asyncio event loop
+
+    Concurrency is bounded globally by a semaphore and per host by the
+    aiohttp connector, so a batch of thousands of small files does not
+    need a thread per transfer. Progress is reported through the same
+    progress_callback dict contract as DownloadManager, with an extra
+    'url' key so a shared callback can tell transfers apart.
+    """
+
+    def __init__(self, max_concurrency=100, per_host_limit=16, chunk_size=262144,
+                 max_retries=3, timeout=60, write_buffer_size=1024 * 1024):
+        if aiohttp is None:
+            raise ImportError("aiohttp is required for the async download engine (pip install aiohttp)")
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.write_buffer_size = write_buffer_size  # Bytes collected before one off-loop write
+
+    @staticmethod
+    def is_available():
+        """Check whether aiohttp is installed"""
+        return aiohttp is not None
+
+    def download_many(self, urls, destination, progress_callback=None):
+        """
+        Download a batch of URLs into destination (blocking)
+
+        Args:
+            urls: Iterable of URLs
+            destination: Destination folder
+            progress_callback: Function to call with progress updates
+
+        Returns:
+            dict: url -> True if downloaded, False otherwise
+
+        Files are named after the URL (or Content-Disposition); URLs whose
+        names collide within the batch get numbered names.
+        """
+        return asyncio.run(self.download_many_async(urls, destination, progress_callback))
+
+    async def download_many_async(self, urls, destination, progress_callback=None):
+        """Coroutine version of download_many for callers already on an event loop"""
+        os.makedirs(destination, exist_ok=True)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.per_host_limit)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout)
+
+        urls = list(dict.fromkeys(urls))
+        claimed = set()
+        filenames = {url: claim_filename(self._filename_from_url(url, {}), claimed) for url in urls}
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            results = await asyncio.gather(*[
+                self._download_with_retry(session, semaphore, url, destination, progress_callback,
+                                          filenames[url], claimed)
+                for url in urls
+            ])
+        return dict(zip(urls, results))
+
+    async def _download_with_retry(self, session, semaphore, url, destination, progress_callback,
+                                   filename=None, claimed=None):
+        """Download one URL, retrying with backoff and resuming from the .part file"""
+        filename = filename or self._filename_from_url(url, {})
+        async with semaphore:
+            last_error = None
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return await self._download_one(session, url, destination, progress_callback,
+                                                    filename, claimed)
+                except aiohttp.ClientResponseError as e:
+                    last_error = e
+                    if e.status != 429 and e.status < 500:
+                        break  # Client errors will not fix themselves
+                    await asyncio.sleep(min(2 ** attempt, 30))
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    last_error = e
+                    await asyncio.sleep(min(2 ** attempt, 30))
+                except Exception as e:
+                    last_error = e
+                    break
+
+            self._report(progress_callback, {
+                'url': url,
+                'filename': filename,
+                'progress': "0%",
+                'speed': "0 B/s",
+                'status': f'Error: {last_error}'
+            })
+            return False
+
+    async def _download_one(self, session, url, destination, progress_callback, filename, claimed=None):
+        """Stream one URL to disk"""
+        filepath = os.path.join(destination, filename)
+        part_path = filepath + '.part'
+        existing_size = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+        headers = {'Range': f'bytes={existing_size}-'} if existing_size else {}
+        async with session.get(url, headers=headers, allow_redirects=True) as response:
+            if existing_size and response.status == 416:
+                # Only a .part of exactly the full size is complete; anything else starts over
+                total = response.headers.get('Content-Range', '').rpartition('/')[2]
+                if total.isdigit() and int(total) == existing_size:
+                    os.replace(part_path, filepath)
+                    return True
+                os.remove(part_path)
+                return await self._download_one(session, url, destination, progress_callback, filename, claimed)
+            response.raise_for_status()
+
+            # Content-Disposition may name the file once the response arrives
+            resolved = self._filename_from_url(url, response.headers)
+            if resolved != filename and not existing_size and (claimed is None or resolved.lower() not in claimed):
+                if claimed is not None:
+                    claimed.add(resolved.lower())
+                filename = resolved
+                filepath = os.path.join(destination, filename)
+                part_path = filepath + '.part'
+
+            if response.status == 206:
+                mode = 'ab'
+                total_size = existing_size + (response.content_length or 0)
+            else:
+                mode = 'wb'
+                existing_size = 0
+                total_size = response.content_length or 0
+
+            downloaded = existing_size
+            start_time = time.time()
+            last_update = 0
+
+            limiter = get_limiter()
+            host = urlparse(url).hostname
+            pending = []  # Chunks not yet written
+            pending_size = 0
+            # Disk writes run in a worker thread so a slow disk does not stall every transfer
+            f = await asyncio.to_thread(open, part_path, mode)
+            try:
+                async for chunk in response.content.iter_chunked(limiter.read_size(self.chunk_size, host, url)):
+                    pending.append(chunk)
+                    pending_size += len(chunk)
+                    if pending_size >= self.write_buffer_size:
+                        await asyncio.to_thread(f.write, b''.join(pending))
+                        pending, pending_size = [], 0
+                    downloaded += len(chunk)
+                    delay = limiter.reserve(len(chunk), host, url)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+
+                    now = time.time()
+                    if now - last_update >= 0.3:
+                        elapsed = now - start_time
+                        speed = (downloaded - existing_size) / elapsed if elapsed > 0 else 0
+                        self._report(progress_callback, {
+                            'url': url,
+                            'filename': filename,
+                            'progress': f"{(downloaded / total_size) * 100:.1f}%" if total_size > 0 else self._format_size(downloaded),
+                            'speed': f"{self._format_size(speed)}/s",
+                            'status': 'Downloading',
+                            'downloaded': downloaded,
+                            'total': total_size
+                        })
+                        last_update = now
+                if pending:
+                    await asyncio.to_thread(f.write, b''.join(pending))
+            finally:
+                await asyncio.to_thread(f.close)
+
+        if total_size and downloaded != total_size and 'Content-Encoding' not in response.headers:
+            raise aiohttp.ClientPayloadError(f"Incomplete download: got {downloaded} of {total_size} bytes")
+        os.replace(part_path, filepath)
+        self._report(progress_callback, {
+            'url': url,
+            'filename': filename,
+            'progress': "100%",
+            'speed': "0 B/s",
+            'status': 'Completed',
+            'downloaded': downloaded,
+            'total': total_size or downloaded
+        })
+        return True
+
+    def _report(self, progress_callback, info):
+        """Send a progress update without letting callback errors kill the transfer"""
+        if not progress_callback:
+            return
+        try:
+            progress_callback(info)
+        except Exception as e:
+            print(f"Progress callback error: {e}")
+
+    def _filename_from_url(self, url, headers):
+        """Filename from the URL path, falling back to Content-Disposition"""
+        filename = os.path.basename(urlparse(url).path)
+        if not filename or '.' not in filename:
+            content_disposition = headers.get('content-disposition', '')
+            if 'filename=' in content_disposition:
+                filename = content_disposition.split('filename=')[1].split(';')[0].strip('"\'')
+            else:
+                filename = f"download_{hashlib.md5(url.encode()).hexdigest()[:8]}"
+        return unquote(filename)
+
+    def _format_size(self, bytes_size):
+        """Format file size in human readable format"""
+        for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
+            if bytes_size < 1024.0:
+                return f"{bytes_size:.1f} {unit}"
+            bytes_size /= 1024.0
+        return f"{bytes_size:.1f} PB"
@@ -0,0 +1,271 @@
+"""
+Bandwidth Limiter
+Token-bucket shaping shared by every downloader: global, per-host and per-download limits
+"""
+
+import re
+import time
+import threading
+from contextlib import contextmanager
+
+MIN_READ_SIZE = 16 * 1024  # Smallest read suggested to a throttled transfer
+
+
+def parse_rate(value):
+    """
+    Parse a rate into bytes per second
+
+    Accepts numbers (bytes/s) and strings such as "500K", "2.5M", "1G"
+    (bytes) or "20Mbit", "20mbps", "512kbit" (bits). 0 or None means
+    unlimited.
+
+    Returns:
+        int: Bytes per second
+    """
+    if value is None or value == '':
+        return 0
+    if isinstance(value, (int, float)):
+        rate = float(value)
+    else:
+        match = re.fullmatch(r'\s*([\d.]+)\s*([kmg]?)(i?b?|bit|bps|bit/s|b/s)?\s*', str(value).lower())
+        if not match:
+            raise ValueError(f"Invalid rate: {value}")
+        number, prefix, unit = match.groups()
+        rate = float(number) * {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}[prefix]
+        if unit in ('bit', 'bps', 'bit/s'):
+            rate = float(number) * {'': 1, 'k': 1000, 'm': 1000 ** 2, 'g': 1000 ** 3}[prefix] / 8
+    if rate < 0:
+        raise ValueError(f"Invalid rate: {value}")
+    return int(rate)
+
+
+class TokenBucket:
+    """
+    Classic token bucket; a rate of 0 means unlimited
+
+    Callers take tokens for bytes they already received and are told how
+    long to wait. The balance may go negative, so concurrent transfers
+    queue up behind each other's debt and share the rate fairly.
+
+    Args:
+        rate: Bytes per second
+        burst: Bytes that may pass without waiting (default: half a second)
+    """
+
+    def __init__(self, rate=0, burst=None):
+        self._lock = threading.Lock()
+        self.rate = 0
+        self.burst = 0
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate, burst=None):
+        """Change the rate; accumulated debt is forgiven"""
+        with self._lock:
+            self.rate = max(0, int(rate or 0))
+            self.burst = burst if burst is not None else max(self.rate // 2, MIN_READ_SIZE)
+            self._tokens = min(max(self._tokens, 0.0), self.burst)
+            self._updated = time.monotonic()
+
+    def reserve(self, nbytes):
+        """
+        Take tokens for nbytes
+
+        Returns:
+            float: Seconds the caller should wait before continuing
+        """
+        with self._lock:
+            if not self.rate:
+                return 0.0
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= nbytes
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+
+class BandwidthLimiter:
+    """
+    Shape download traffic so the rest of the machine keeps some bandwidth
+
+    Every transfer takes tokens from the global bucket, its host's bucket
+    and its download's bucket, and waits for the slowest of them. Download
+    limits are keyed by download id; register_download() tells the limiter
+    which id (and parent, e.g. a playlist) a transfer URL belongs to.
+    Unregistered URLs are their own key. Limits can be changed while
+    transfers run.
+
+    Serving reserve: while files are being streamed to clients (see
+    serving()), downloads are additionally held to link_rate minus the
+    reserve. Without a configured link_rate the highest download
+    throughput seen so far stands in for the link capacity.
+    """
+
+    def __init__(self, global_rate=0, link_rate=0, serving_reserve=0):
+        self._lock = threading.Lock()
+        self._global = TokenBucket()
+        self._hosts = {}  # host -> TokenBucket
+        self._downloads = {}  # download id (or url) -> TokenBucket
+        self._transfers = {}  # url -> download ids whose limits apply to it
+        self.global_rate = 0
+        self.link_rate = 0
+        self.serving_reserve = 0
+        self._serving = 0
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self.peak_rate = 0  # Highest unreserved download throughput observed
+        self.configure(global_rate=global_rate, link_rate=link_rate, serving_reserve=serving_reserve)
+
+    def configure(self, global_rate=None, link_rate=None, serving_reserve=None):
+        """Change global settings (None leaves a setting unchanged)"""
+        with self._lock:
+            if global_rate is not None:
+                self.global_rate = parse_rate(global_rate)
+            if link_rate is not None:
+                self.link_rate = parse_rate(link_rate)
+            if serving_reserve is not None:
+                self.serving_reserve = parse_rate(serving_reserve)
+            self._apply_global()
+
+    def _apply_global(self):
+        """Recompute the global bucket's rate (caller holds the lock)"""
+        rate = self.global_rate
+        if self._serving and self.serving_reserve:
+            capacity = self.link_rate or self.peak_rate
+            if capacity:
+                # Never stop downloads outright - keep at least a tenth of the link
+                available = max(capacity - self.serving_reserve, capacity // 10)
+                rate = min(rate, available) if rate else available
+        if rate != self._global.rate:
+            self._global.set_rate(rate)
+
+    def set_host_limit(self, host, rate):
+        """Limit one host (0 removes the limit)"""
+        self._set_limit(self._hosts, host.lower(), rate)
+
+    def set_download_limit(self, key, rate):
+        """Limit one download, identified by its download id or URL (0 removes the limit)"""
+        self._set_limit(self._downloads, key, rate)
+
+    def register_download(self, key, url, parent=None):
+        """Apply the limits of download key (and its parent's) to transfers of url"""
+        with self._lock:
+            self._transfers[url] = [key] + ([parent] if parent else [])
+
+    def unregister_download(self, key, url=None):
+        """A download finished: forget its URL mapping and its limit"""
+        with self._lock:
+            if url and self._transfers.get(url, [None])[0] == key:
+                del self._transfers[url]
+            self._downloads.pop(key, None)
+
+    def _set_limit(self, buckets, key, rate):
+        rate = parse_rate(rate)
+        with self._lock:
+            if not rate:
+                buckets.pop(key, None)
+            elif key in buckets:
+                buckets[key].set_rate(rate)
+            else:
+                buckets[key] = TokenBucket(rate)
+
+    def _buckets(self, host, url):
+        """Buckets a transfer draws from (caller holds the lock)"""
+        buckets = [self._global]
+        if host and host.lower() in self._hosts:
+            buckets.append(self._hosts[host.lower()])
+        if url:
+            for key in self._transfers.get(url, (url,)):
+                if key in self._downloads:
+                    buckets.append(self._downloads[key])
+        return buckets
+
+    def reserve(self, nbytes, host=None, url=None):
+        """
+        Account for nbytes received without blocking
+
+        Returns:
+            float: Seconds to wait (for asyncio callers)
+        """
+        with self._lock:
+            self._record(nbytes)
+            buckets = self._buckets(host, url)
+        return max(bucket.reserve(nbytes) for bucket in buckets)
+
+    def throttle(self, nbytes, host=None, url=None):
+        """Account for nbytes received and sleep as long as the limits require"""
+        delay = self.reserve(nbytes, host, url)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _record(self, nbytes):
+        """Track aggregate throughput to estimate link capacity (caller holds the lock)"""
+        self._window_bytes += nbytes
+        elapsed = time.monotonic() - self._window_start
+        if elapsed >= 1.0:
+            if not self._serving and not self.global_rate:
+                self.peak_rate = max(self.peak_rate, int(self._window_bytes / elapsed))
+            self._window_start += elapsed
+            self._window_bytes = 0
+
+    def limit_for(self, host=None, url=None):
+        """Tightest limit that applies to a transfer (0 if unlimited)"""
+        with self._lock:
+            rates = [bucket.rate for bucket in self._buckets(host, url) if bucket.rate]
+        return min(rates) if rates else 0
+
+    def read_size(self, default, host=None, url=None):
+        """
+        Read size for a transfer
+
+        Throttled transfers read smaller pieces so waits stay short and the
+        rate stays smooth instead of arriving in one large burst per second.
+        """
+        rate = self.limit_for(host, url)
+        if not rate:
+            return default
+        return max(MIN_READ_SIZE, min(default, rate // 4))
+
+    def begin_serving(self):
+        """A file stream to a client started"""
+        with self._lock:
+            self._serving += 1
+            self._apply_global()
+
+    def end_serving(self):
+        """A file stream to a client finished"""
+        with self._lock:
+            self._serving = max(0, self._serving - 1)
+            self._apply_global()
+
+    @contextmanager
+    def serving(self):
+        """Hold the serving reserve while the block runs"""
+        self.begin_serving()
+        try:
+            yield
+        finally:
+            self.end_serving()
+
+    def get_limits(self):
+        """Current configuration and state (bytes per second)"""
+        with self._lock:
+            return {
+                'global': self.global_rate,
+                'effective_global': self._global.rate,
+                'link_rate': self.link_rate,
+                'serving_reserve': self.serving_reserve,
+                'serving': self._serving,
+                'peak_rate': self.peak_rate,
+                'hosts': {host: bucket.rate for host, bucket in self._hosts.items()},
+                'downloads': {key: bucket.rate for key, bucket in self._downloads.items()}
+            }
+
+
+_limiter = BandwidthLimiter()
+
+
+def get_limiter():
+    """Shared limiter used by all downloaders"""
+    return _limiter
@@ -0,0 +1,221 @@
+"""
+Checksum Service
+Fast file hashing: large read buffers, parallel workers and a stat-keyed result cache
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+HASH_BUFFER_SIZE = 4 * 1024 * 1024  # 1-8 MB keeps per-call overhead negligible
+
+
+def hash_file(filepath, algorithm='sha256', buffer_size=HASH_BUFFER_SIZE):
+    """
+    Hash a file through one reusable buffer
+
+    readinto() fills the same bytearray every time (no bytes object per
+    block), and hashlib releases the GIL while it digests each multi-MB
+    block, so several threads hashing different files use several cores.
+
+    Returns:
+        str: Hex digest
+    """
+    hash_obj = hashlib.new(algorithm)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(filepath, 'rb', buffering=0) as f:
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            hash_obj.update(view[:count])
+    return hash_obj.hexdigest()
+
+
+def _hash_job(filepath, algorithm):
+    """Worker entry point (module level so process pools can pickle it)"""
+    try:
+        return hash_file(filepath, algorithm)
+    except OSError:
+        return None
+
+
+class ChecksumService:
+    """
+    Hash many files in parallel and remember the results
+
+    A result is reused while the file's (path, size, mtime, inode) are
+    unchanged, so re-verifying a download directory only reads new or
+    modified files. The cache is saved to cache_file; it keeps the
+    max_entries most recently used files and forgets deleted ones.
+
+    Args:
+        cache_file: JSON cache location (default ~/.ngk_download_manager/checksum_cache.json)
+        max_workers: Parallel hashing workers (default: CPU count)
+        use_processes: Hash in a process pool; falls back to threads where
+                       processes are unavailable (e.g. Android) or the pool breaks
+        max_entries: Most files kept in the cache
+    """
+
+    def __init__(self, cache_file=None, max_workers=None, use_processes=True, max_entries=20000):
+        if cache_file is None:
+            cache_file = os.path.join(os.path.expanduser("~/.ngk_download_manager"), "checksum_cache.json")
+        self.cache_file = cache_file
+        self.max_workers = max_workers or os.cpu_count() or 2
+        self.use_processes = use_processes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.cache = self._load_cache()
+
+    def _load_cache(self):
+        """Load cached checksums from disk, dropping files that no longer exist"""
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    cache = json.load(f)
+                return {path: entry for path, entry in cache.items() if os.path.exists(path)}
+            except Exception as e:
+                print(f"Error loading checksum cache: {e}")
+        return {}
+
+    def save(self):
+        """Save the cache to disk (atomic write-then-rename)"""
+        with self._lock:
+            cache_dir = os.path.dirname(os.path.abspath(self.cache_file))
+            tmp_path = None
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix='.checksums.', suffix='.tmp')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self.cache, f, separators=(',', ':'))
+                os.replace(tmp_path, self.cache_file)
+            except Exception as e:
+                print(f"Error saving checksum cache: {e}")
+                if tmp_path and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    @staticmethod
+    def _identity(stat):
+        """What must stay the same for a cached checksum to be valid"""
+        return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+    def _cached(self, path, identity, algorithm):
+        """Cached digest, or None if missing or the file changed"""
+        with self._lock:
+            entry = self.cache.pop(path, None)
+            if entry and entry['identity'] == identity:
+                self.cache[path] = entry  # Most recently used entries live at the end
+                return entry['digests'].get(algorithm)
+        return None
+
+    def _store(self, path, identity, algorithm, digest):
+        with self._lock:
+            entry = self.cache.pop(path, None)
+            if not entry or entry['identity'] != identity:
+                entry = {'identity': identity, 'digests': {}}
+            self.cache[path] = entry
+            entry['digests'][algorithm] = digest
+            while len(self.cache) > self.max_entries:
+                del self.cache[next(iter(self.cache))]  # Least recently used
+
+    def _forget(self, path):
+        with self._lock:
+            self.cache.pop(path, None)
+
+    def checksum(self, filepath, algorithm='sha256'):
+        """
+        Checksum of one file (cached)
+
+        Returns:
+            str: Hex digest, or None if the file cannot be read
+        """
+        return self.checksum_many([filepath], algorithm).get(os.path.abspath(filepath))
+
+    def checksum_many(self, filepaths, algorithm='sha256', progress_callback=None):
+        """
+        Checksum several files, hashing cache misses in parallel
+
+        Args:
+            filepaths: Files to hash
+            algorithm: Any hashlib algorithm
+            progress_callback: Called as progress_callback(done, total) as files finish
+
+        Returns:
+            dict: absolute path -> hex digest (None for unreadable files)
+        """
+        results = {}
+        pending = {}  # path -> identity
+        for filepath in filepaths:
+            path = os.path.abspath(filepath)
+            try:
+                identity = self._identity(os.stat(path))
+            except OSError:
+                results[path] = None
+                self._forget(path)
+                continue
+            digest = self._cached(path, identity, algorithm)
+            if digest:
+                results[path] = digest
+            else:
+                pending[path] = identity
+
+        total = len(results) + len(pending)
+        if progress_callback:
+            progress_callback(len(results), total)
+
+        if pending:
+            processes = self.use_processes
+            try:
+                self._hash_pending(pending, algorithm, results, total, progress_callback, processes)
+            except (BrokenProcessPool, OSError, RuntimeError) as e:
+                if not processes:
+                    raise
+                # A worker died or could not be started - finish the rest in threads
+                print(f"Process pool failed, hashing with threads: {e}")
+                self.use_processes = False
+                remaining = {path: identity for path, identity in pending.items() if path not in results}
+                self._hash_pending(remaining, algorithm, results, total, progress_callback, False)
+            self.save()
+
+        return results
+
+    def _hash_pending(self, pending, algorithm, results, total, progress_callback, processes):
+        """Hash pending files in a worker pool, storing digests in results and the cache"""
+        with self._executor(len(pending), processes) as pool:
+            futures = {path: pool.submit(_hash_job, path, algorithm) for path in pending}
+            for path, future in futures.items():
+                digest = future.result()
+                results[path] = digest
+                if digest:
+                    self._store(path, pending[path], algorithm, digest)
+                if progress_callback:
+                    progress_callback(len(results), total)
+
+    def checksum_directory(self, directory, algorithm='sha256', progress_callback=None,
+                           ignore_suffixes=('.part', '.tmp', '.ytdl')):
+        """
+        Checksum every finished file under a directory
+
+        Returns:
+            dict: path relative to directory -> hex digest
+        """
+        filepaths = []
+        for root, _, files in os.walk(directory):
+            filepaths.extend(os.path.join(root, name) for name in files if not name.endswith(ignore_suffixes))
+        results = self.checksum_many(filepaths, algorithm, progress_callback)
+        return {os.path.relpath(path, directory): digest for path, digest in results.items()}
+
+    def _executor(self, jobs, processes):
+        """Worker pool sized for the job count"""
+        workers = max(1, min(self.max_workers, jobs))
+        if processes and workers > 1:
+            try:
+                return ProcessPoolExecutor(max_workers=workers)
+            except (ImportError, NotImplementedError, OSError):
+                pass  # No working multiprocessing (Android, some sandboxes)
+        return ThreadPoolExecutor(max_workers=workers)
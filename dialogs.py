@@ -4,11 +4,11 @@ Enhanced dialogs and features for the download manager
 
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import requests
 from PIL import Image, ImageTk
 from io import BytesIO
 import threading
 import webbrowser
+from http_session import get_session
 
 class QualitySelectionDialog:
     """Dialog for selecting video quality and format"""
@@ -448,7 +448,7 @@ class ThumbnailViewer:
         # Download thumbnail in background
         def download_thumbnail():
             try:
-                response = requests.get(url, timeout=10)
+                response = get_session().get(url, timeout=10)
                 response.raise_for_status()
                 
                 image = Image.open(BytesIO(response.content))
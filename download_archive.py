@@ -0,0 +1,279 @@
+"""
+Download Archive
+Persistent index of fetched videos so repeats are skipped without network access
+"""
+
+import os
+import json
+import tempfile
+import threading
+from datetime import datetime
+
+from video_info_cache import video_key, info_key
+from checksum_service import hash_file
+
+
+class DownloadArchive:
+    """
+    Map 'Extractor:video_id' to the file it was saved as
+
+    Each entry keeps the path, size and SHA-256 of the downloaded file. A
+    lookup only needs the URL (the ID is parsed offline) and one stat() of
+    the recorded file, so re-queuing a whole channel skips finished items
+    in milliseconds. Existing downloads are picked up by scanning the
+    .info.json files yt-dlp writes next to each video.
+    """
+
+    SIDECAR_EXTENSIONS = ('.json', '.part', '.ytdl', '.webp', '.jpg', '.jpeg', '.png', '.vtt', '.srt', '.description')
+
+    def __init__(self, archive_file=None):
+        if archive_file is None:
+            archive_file = os.path.join(os.path.expanduser("~/.ngk_download_manager"), "download_archive.json")
+        self.archive_file = archive_file
+        self.archive_dir = os.path.dirname(archive_file) or '.'
+        os.makedirs(self.archive_dir, exist_ok=True)
+        self._lock = threading.RLock()
+
+        data = self._load_archive()
+        self.entries = data.get('entries', {})
+        self.scanned = data.get('scanned', {})  # info.json path -> mtime already indexed
+        self._listings = {}  # folder -> (mtime_ns, subfolders) as of the last scan in this process
+
+    def _load_archive(self):
+        """Load the archive from disk"""
+        if os.path.exists(self.archive_file):
+            try:
+                with open(self.archive_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"Error loading download archive: {e}")
+        return {}
+
+    def _save_archive(self):
+        """Save the archive to disk (atomic write-then-rename)"""
+        with self._lock:
+            tmp_path = None
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=self.archive_dir, prefix='.archive.', suffix='.tmp')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump({'entries': self.entries, 'scanned': self.scanned}, f, separators=(',', ':'))
+                os.replace(tmp_path, self.archive_file)
+            except Exception as e:
+                print(f"Error saving download archive: {e}")
+                if tmp_path and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def lookup(self, url, destination=None):
+        """
+        Find a finished download for url without touching the network
+
+        Args:
+            url: Video URL in any form yt-dlp recognizes
+            destination: If given, only files inside this folder count
+
+        Returns:
+            dict: Archive entry (path, size, sha256, ...) or None
+        """
+        key = video_key(url)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            path = entry['path']
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = None
+            if size != entry.get('size'):
+                # File was moved, deleted or replaced - forget it
+                for stale in [k for k, v in self.entries.items() if v['path'] == path]:
+                    del self.entries[stale]
+                self._save_archive()
+                return None
+
+        if destination and not self._is_inside(path, destination):
+            return None
+        return dict(entry, key=key)
+
+    def record(self, info, filepath, compute_hash=True):
+        """
+        Add a finished download
+
+        Args:
+            info: yt-dlp info dict (needs extractor_key and id)
+            filepath: Final media file
+            compute_hash: Hash the file (one sequential read)
+        """
+        keys = self._keys_for(info)
+        if not keys or not filepath or not os.path.isfile(filepath):
+            return None
+
+        entry = {
+            'path': os.path.abspath(filepath),
+            'size': os.path.getsize(filepath),
+            'sha256': self._hash_file(filepath) if compute_hash else None,
+            'title': info.get('title'),
+            'webpage_url': info.get('webpage_url'),
+            'added_at': datetime.now().isoformat()
+        }
+        with self._lock:
+            for key in keys:
+                self.entries[key] = entry
+            self._save_archive()
+        return entry
+
+    def scan(self, destination):
+        """
+        Index existing downloads from the .info.json files in destination
+
+        Only info files that are new or changed since the last scan are read,
+        and within one process only folders whose mtime changed are listed
+        again, so repeated scans cost one stat() per folder.
+
+        Returns:
+            int: Number of entries added
+        """
+        if not os.path.isdir(destination):
+            return 0
+
+        added = 0
+        changed = False
+        with self._lock:
+            by_folder = None  # folder -> indexed info files, built on first use
+            for root, files in self._changed_folders(destination):
+                media_by_stem = self._media_by_stem(files)
+                for name in files:
+                    if not name.endswith('.info.json'):
+                        continue
+                    info_path = os.path.join(root, name)
+                    try:
+                        mtime = os.path.getmtime(info_path)
+                    except OSError:
+                        continue
+                    if self.scanned.get(info_path) == mtime:
+                        continue
+                    self.scanned[info_path] = mtime
+                    changed = True
+
+                    try:
+                        with open(info_path, 'r', encoding='utf-8') as f:
+                            info = json.load(f)
+                    except Exception:
+                        continue
+
+                    keys = [key for key in self._keys_for(info) if key not in self.entries]
+                    media_path = self._find_media_file(info, root, name[:-len('.info.json')], media_by_stem)
+                    if keys and media_path:
+                        entry = {
+                            'path': os.path.abspath(media_path),
+                            'size': os.path.getsize(media_path),
+                            'sha256': None,
+                            'title': info.get('title'),
+                            'webpage_url': info.get('webpage_url'),
+                            'added_at': datetime.now().isoformat()
+                        }
+                        for key in keys:
+                            self.entries[key] = entry
+                        added += 1
+
+                # Forget info files that no longer exist
+                if by_folder is None:
+                    by_folder = {}
+                    for info_path in self.scanned:
+                        by_folder.setdefault(os.path.dirname(info_path), []).append(info_path)
+                names = set(files)
+                for info_path in by_folder.get(root, ()):
+                    if os.path.basename(info_path) not in names and info_path in self.scanned:
+                        del self.scanned[info_path]
+                        changed = True
+
+            if changed:
+                self._save_archive()
+        return added
+
+    def remove(self, url):
+        """Drop the entry for url"""
+        with self._lock:
+            entry = self.entries.pop(video_key(url), None)
+            if entry is None:
+                return False
+            for key in [k for k, v in self.entries.items() if v['path'] == entry['path']]:
+                del self.entries[key]
+            self._save_archive()
+            return True
+
+    def _keys_for(self, info):
+        """Archive keys for an info dict: its own ID plus the IDs of its URLs"""
+        keys = [info_key(info)]
+        for url in (info.get('original_url'), info.get('webpage_url')):
+            if url:
+                keys.append(video_key(url))
+        return list(dict.fromkeys(key for key in keys if key))
+
+    def _changed_folders(self, destination):
+        """
+        Yield (folder, file names) for folders under destination that changed
+
+        A folder whose mtime matches the last scan is skipped without being
+        listed; its remembered subfolders are still visited. A folder that
+        disappeared is reported as empty.
+        """
+        pending = [os.path.abspath(destination)]
+        while pending:
+            folder = pending.pop()
+            try:
+                mtime = os.stat(folder).st_mtime_ns
+            except OSError:
+                listing = self._listings.pop(folder, None)
+                if listing:
+                    pending.extend(listing[1])
+                    yield folder, []
+                continue
+            listing = self._listings.get(folder)
+            if listing and listing[0] == mtime:
+                pending.extend(listing[1])
+                continue
+            try:
+                with os.scandir(folder) as entries:
+                    entries = list(entries)
+            except OSError:
+                continue
+            subfolders = [entry.path for entry in entries if entry.is_dir(follow_symlinks=False)]
+            self._listings[folder] = (mtime, subfolders)
+            pending.extend(subfolders)
+            yield folder, [entry.name for entry in entries if entry.is_file()]
+
+    def _media_by_stem(self, names):
+        """Map every dotted prefix of the media files in a folder to the first such file"""
+        media = {}
+        for name in sorted(names):
+            if name.endswith(self.SIDECAR_EXTENSIONS):
+                continue
+            index = name.find('.')
+            while index > 0:
+                media.setdefault(name[:index], name)
+                index = name.find('.', index + 1)
+        return media
+
+    def _find_media_file(self, info, folder, stem, media_by_stem):
+        """Locate the media file an info.json describes"""
+        for candidate in (info.get('filepath'), info.get('_filename'), info.get('filename')):
+            if candidate and os.path.isfile(candidate):
+                return candidate
+
+        # The recorded name may predate merging/conversion - match by stem
+        name = media_by_stem.get(stem)
+        return os.path.join(folder, name) if name else None
+
+    def _hash_file(self, filepath):
+        """SHA-256 of a file"""
+        return hash_file(filepath, 'sha256')
+
+    def _is_inside(self, path, folder):
+        """Check whether path lies inside folder"""
+        try:
+            folder = os.path.realpath(folder)
+            return os.path.commonpath([os.path.realpath(path), folder]) == folder
+        except ValueError:
+            return False  # Different drives on Windows
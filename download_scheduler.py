@@ -0,0 +1,149 @@
+"""
+Download Scheduler
+Bounded worker pool with a priority queue and per-host concurrency caps
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+
+class DownloadScheduler:
+    """
+    Run queued downloads on a fixed number of worker threads
+
+    Jobs with a higher priority run first; equal priorities run in the
+    order they were submitted. A job is held back while its host already
+    has per_host_limit downloads running, so one busy site cannot take
+    every worker.
+    """
+
+    def __init__(self, max_workers=3, per_host_limit=2):
+        self.max_workers = max(1, max_workers)
+        self.per_host_limit = max(1, per_host_limit)
+        self._queue = []  # heap of (-priority, seq, job)
+        self._queued = {}  # job_id -> job
+        self._running = {}  # job_id -> job
+        self._host_active = {}
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._shutdown = False
+
+        self._workers = []
+        for index in range(self.max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"download-worker-{index}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, job_id, func, args=(), priority=0, host=None):
+        """
+        Queue a download job
+
+        Args:
+            job_id: Unique id used for position lookups and cancellation
+            func: Callable that performs the download
+            args: Positional arguments for func
+            priority: Higher values run sooner (default 0)
+            host: Host used for the per-host concurrency cap
+
+        Returns:
+            int: 1-based queue position of the new job
+        """
+        job = {
+            'id': job_id,
+            'func': func,
+            'args': args,
+            'priority': priority,
+            'host': host or '',
+            'queued_at': time.time()
+        }
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Scheduler is shut down")
+            heapq.heappush(self._queue, (-priority, next(self._counter), job))
+            self._queued[job_id] = job
+            self._cond.notify()
+            return self._position_locked(job_id)
+
+    def cancel(self, job_id):
+        """Remove a job that has not started yet"""
+        with self._cond:
+            if job_id not in self._queued:
+                return False
+            del self._queued[job_id]
+            self._queue = [entry for entry in self._queue if entry[2]['id'] != job_id]
+            heapq.heapify(self._queue)
+            return True
+
+    def get_position(self, job_id):
+        """1-based position in the queue, 0 if running, None if unknown"""
+        with self._cond:
+            if job_id in self._running:
+                return 0
+            return self._position_locked(job_id)
+
+    def _position_locked(self, job_id):
+        """Queue position for job_id (caller holds the lock)"""
+        if job_id not in self._queued:
+            return None
+        for position, entry in enumerate(sorted(self._queue), start=1):
+            if entry[2]['id'] == job_id:
+                return position
+        return None
+
+    def get_stats(self):
+        """Snapshot of queue and worker usage"""
+        with self._cond:
+            return {
+                'max_workers': self.max_workers,
+                'per_host_limit': self.per_host_limit,
+                'running': len(self._running),
+                'queued': len(self._queued),
+                'hosts': {host: count for host, count in self._host_active.items() if count}
+            }
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs and let workers exit once idle"""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _next_job_locked(self):
+        """Pop the highest-priority job whose host is under its cap"""
+        for entry in sorted(self._queue):
+            job = entry[2]
+            if self._host_active.get(job['host'], 0) < self.per_host_limit:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                return job
+        return None
+
+    def _worker_loop(self):
+        """Take jobs off the queue until shutdown"""
+        while True:
+            with self._cond:
+                job = self._next_job_locked()
+                while job is None:
+                    if self._shutdown:
+                        return
+                    self._cond.wait()
+                    job = self._next_job_locked()
+
+                del self._queued[job['id']]
+                self._running[job['id']] = job
+                self._host_active[job['host']] = self._host_active.get(job['host'], 0) + 1
+
+            try:
+                job['func'](*job['args'])
+            except Exception as e:
+                print(f"Download job {job['id']} crashed: {e}")
+            finally:
+                with self._cond:
+                    del self._running[job['id']]
+                    self._host_active[job['host']] -= 1
+                    # A host slot opened up - jobs held back for it may now run
+                    self._cond.notify_all()
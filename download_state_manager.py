@@ -5,17 +5,39 @@ Saves and restores download progress across app restarts
 
 import os
 import json
+import time
+import atexit
+import tempfile
+import threading
 from pathlib import Path
 from datetime import datetime
 
 class DownloadStateManager:
-    def __init__(self, state_dir=None):
+    """
+    Tracks download progress on disk with write-behind persistence
+
+    Progress updates only touch memory and mark the state dirty. The file is
+    rewritten once flush_interval seconds have passed or flush_bytes of new
+    data have been recorded, whichever comes first. Starting, completing and
+    removing a download, as well as interpreter shutdown, always flush.
+    """
+    
+    def __init__(self, state_dir=None, flush_interval=2.0, flush_bytes=64 * 1024 * 1024):
         if state_dir is None:
             state_dir = os.path.expanduser("~/.ngk_download_manager")
         self.state_dir = state_dir
         self.state_file = os.path.join(state_dir, "downloads.json")
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
         os.makedirs(state_dir, exist_ok=True)
         self.downloads = self._load_state()
+        
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._pending_bytes = 0
+        self._last_flush = time.time()
+        self._flush_timer = None
+        atexit.register(self.flush)
     
     def _load_state(self):
         """Load saved download state from disk"""
@@ -28,63 +50,139 @@ class DownloadStateManager:
         return {}
     
     def _save_state(self):
-        """Save download state to disk"""
-        try:
-            with open(self.state_file, 'w') as f:
-                json.dump(self.downloads, f, indent=2)
-        except Exception as e:
-            print(f"Error saving download state: {e}")
+        """Save download state to disk (atomic write-then-rename)"""
+        with self._lock:
+            if self._flush_timer:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=self.state_dir, prefix='.downloads.', suffix='.tmp')
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(self.downloads, f, separators=(',', ':'))
+                os.replace(tmp_path, self.state_file)
+                self._dirty = False
+                self._pending_bytes = 0
+                self._last_flush = time.time()
+            except Exception as e:
+                print(f"Error saving download state: {e}")
+                try:
+                    os.remove(tmp_path)
+                except Exception:
+                    pass
     
-    def start_download(self, url, filepath, total_size=0):
-        """Record a new download"""
+    def _mark_dirty(self, new_bytes=0):
+        """Record an in-memory change and flush once a checkpoint is due"""
+        with self._lock:
+            self._dirty = True
+            self._pending_bytes += max(0, new_bytes)
+            
+            due = (time.time() - self._last_flush >= self.flush_interval
+                   or self._pending_bytes >= self.flush_bytes)
+            if due:
+                self._save_state()
+            elif not self._flush_timer:
+                # Make sure a stalled download still reaches disk
+                self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+    
+    def flush(self):
+        """Write pending changes to disk if there are any"""
+        with self._lock:
+            if self._dirty:
+                self._save_state()
+    
+    def close(self):
+        """Flush pending changes; call on shutdown"""
+        self.flush()
+    
+    def start_download(self, url, filepath, total_size=0, extra=None):
+        """Record a new download (extra: optional fields such as an ETag to validate resumes)"""
         download_id = f"{url}_{filepath}"
-        self.downloads[download_id] = {
-            'url': url,
-            'filepath': filepath,
-            'total_size': total_size,
-            'downloaded_size': 0,
-            'status': 'started',
-            'started_at': datetime.now().isoformat(),
-            'chunks': 0
-        }
-        self._save_state()
+        with self._lock:
+            self.downloads[download_id] = {
+                'url': url,
+                'filepath': filepath,
+                'total_size': total_size,
+                'downloaded_size': 0,
+                'status': 'started',
+                'started_at': datetime.now().isoformat(),
+                'chunks': 0
+            }
+            if extra:
+                self.downloads[download_id].update(extra)
+            self._save_state()
         return download_id
     
     def update_download(self, download_id, downloaded_size, chunks, status='downloading'):
-        """Update download progress"""
-        if download_id in self.downloads:
-            self.downloads[download_id].update({
-                'downloaded_size': downloaded_size,
-                'chunks': chunks,
-                'status': status,
-                'last_update': datetime.now().isoformat()
-            })
-            self._save_state()
+        """Update download progress (kept in memory until the next checkpoint)"""
+        with self._lock:
+            if download_id in self.downloads:
+                entry = self.downloads[download_id]
+                new_bytes = downloaded_size - entry.get('downloaded_size', 0)
+                status_changed = entry.get('status') != status
+                entry.update({
+                    'downloaded_size': downloaded_size,
+                    'chunks': chunks,
+                    'status': status,
+                    'last_update': datetime.now().isoformat()
+                })
+                if status_changed and status != 'downloading':
+                    self._save_state()
+                else:
+                    self._mark_dirty(new_bytes)
     
-    def complete_download(self, download_id):
-        """Mark download as complete"""
-        if download_id in self.downloads:
-            self.downloads[download_id]['status'] = 'completed'
-            self.downloads[download_id]['completed_at'] = datetime.now().isoformat()
-            self._save_state()
+    def update_segments(self, download_id, segments, downloaded_size, status='downloading', extra=None):
+        """Update per-segment progress for a segmented download (extra: e.g. the file's validator)"""
+        with self._lock:
+            if download_id in self.downloads:
+                entry = self.downloads[download_id]
+                new_bytes = downloaded_size - entry.get('downloaded_size', 0)
+                entry.update({
+                    'segments': segments,
+                    'downloaded_size': downloaded_size,
+                    'status': status,
+                    'last_update': datetime.now().isoformat()
+                })
+                if extra:
+                    entry.update(extra)
+                self._mark_dirty(new_bytes)
+
+    def complete_download(self, download_id, extra=None):
+        """Mark download as complete (extra: optional fields such as the file's digests)"""
+        with self._lock:
+            if download_id in self.downloads:
+                self.downloads[download_id]['status'] = 'completed'
+                self.downloads[download_id]['completed_at'] = datetime.now().isoformat()
+                if extra:
+                    self.downloads[download_id].update(extra)
+                self._save_state()
     
     def remove_download(self, download_id):
         """Remove download from state"""
-        if download_id in self.downloads:
-            del self.downloads[download_id]
-            self._save_state()
+        with self._lock:
+            if download_id in self.downloads:
+                del self.downloads[download_id]
+                self._save_state()
     
     def get_resumable_downloads(self, destination_dir):
         """Find partial downloads that can be resumed"""
         resumable = []
         
-        for download_id, info in self.downloads.items():
+        for download_id, info in list(self.downloads.items()):
             if info['status'] in ['downloading', 'paused']:
                 filepath = info['filepath']
                 
                 # Check if partial file exists
                 if os.path.exists(filepath + '.part'):
-                    partial_size = os.path.getsize(filepath + '.part')
+                    if info.get('segments'):
+                        # Segmented .part files are preallocated - count fetched bytes instead
+                        partial_size = sum(s['downloaded'] for s in info['segments'])
+                    elif info.get('preallocated'):
+                        # Preallocated .part files have their full size - the checkpoint says what was written
+                        partial_size = min(os.path.getsize(filepath + '.part'), info.get('downloaded_size', 0))
+                    else:
+                        partial_size = os.path.getsize(filepath + '.part')
                     resumable.append({
                         'download_id': download_id,
                         'url': info['url'],
@@ -96,6 +194,9 @@ class DownloadStateManager:
                     })
                 elif os.path.exists(filepath):
                     file_size = os.path.getsize(filepath)
+                    if info.get('preallocated'):
+                        # Preallocated files have their full size - the checkpoint says what was written
+                        file_size = min(file_size, info.get('downloaded_size', 0))
                     total = info['total_size']
                     if file_size < total:
                         resumable.append({
@@ -117,3 +218,21 @@ class DownloadStateManager:
     def get_all_downloads(self):
         """Get all downloads"""
         return self.downloads
+
+
+_state_manager = None
+_state_lock = threading.Lock()
+
+
+def get_state_manager():
+    """
+    Shared state manager used by all downloaders
+
+    Every instance rewrites the whole downloads.json from its own memory,
+    so two instances in one process would overwrite each other's entries.
+    """
+    global _state_manager
+    with _state_lock:
+        if _state_manager is None:
+            _state_manager = DownloadStateManager()
+        return _state_manager
@@ -5,17 +5,32 @@ Stores all downloads (active, completed, failed) across app restarts
 
 import os
 import json
-from datetime import datetime
+import base64
+import sqlite3
+import time
+import atexit
+import threading
+from datetime import datetime, timedelta
 from pathlib import Path
 
 class DownloadsDatabase:
     """
     Persistent database for all downloads
     Survives app restart - nothing removed until user explicitly deletes
+    
+    Every change stamps the entry with a new value of a monotonically
+    increasing revision counter, and deletions leave a tombstone, so clients
+    can ask for only what changed since the revision they last saw.
     """
     
+    META_KEY = '_meta'  # Reserved key holding the revision counter and tombstones
+    MAX_TOMBSTONES = 1000  # Older deletions are forgotten; clients behind them resync
+    
     def __init__(self, db_file="downloads_database.json"):
         self.db_file = db_file
+        self.revision = 0
+        self.tombstones = {}  # download_id -> revision it was deleted at
+        self.tombstone_floor = 0  # Changes at or below this may be missing tombstones
         self.downloads = self._load_database()
     
     def _load_database(self):
@@ -23,7 +38,14 @@ class DownloadsDatabase:
         if os.path.exists(self.db_file):
             try:
                 with open(self.db_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    downloads = json.load(f)
+                meta = downloads.pop(self.META_KEY, {})
+                self.tombstones = meta.get('deleted', {})
+                self.tombstone_floor = meta.get('tombstone_floor', 0)
+                self.revision = max(
+                    [meta.get('revision', 0)] + [d.get('revision', 0) for d in downloads.values()]
+                )
+                return downloads
             except Exception as e:
                 print(f"Error loading downloads database: {e}")
                 return {}
@@ -32,8 +54,14 @@ class DownloadsDatabase:
     def _save_database(self):
         """Save downloads database to disk"""
         try:
+            data = dict(self.downloads)
+            data[self.META_KEY] = {
+                'revision': self.revision,
+                'deleted': self.tombstones,
+                'tombstone_floor': self.tombstone_floor
+            }
             with open(self.db_file, 'w', encoding='utf-8') as f:
-                json.dump(self.downloads, f, indent=2, ensure_ascii=False)
+                json.dump(data, f, indent=2, ensure_ascii=False)
             return True
         except Exception as e:
             print(f"Error saving downloads database: {e}")
@@ -53,7 +81,17 @@ class DownloadsDatabase:
         Returns:
             dict: The download entry
         """
-        entry = {
+        entry = self._new_entry(download_id, url, filename, destination, url_type)
+        entry['revision'] = self._next_revision()
+        self.tombstones.pop(download_id, None)
+        self.downloads[download_id] = entry
+        self._save_database()
+        return entry
+    
+    @staticmethod
+    def _new_entry(download_id, url, filename, destination, url_type):
+        """Build a fresh download entry"""
+        return {
             'id': download_id,
             'url': url,
             'filename': filename,
@@ -70,10 +108,6 @@ class DownloadsDatabase:
             'completed_at': None,
             'error': None
         }
-        
-        self.downloads[download_id] = entry
-        self._save_database()
-        return entry
     
     def update_download(self, download_id, **kwargs):
         """
@@ -86,8 +120,123 @@ class DownloadsDatabase:
         if download_id not in self.downloads:
             return False
         
-        download = self.downloads[download_id]
+        self._apply_update(self.downloads[download_id], kwargs)
+        self.downloads[download_id]['revision'] = self._next_revision()
+        self._save_database()
+        return True
+    
+    def update_many(self, updates):
+        """
+        Update several downloads with a single write
+        
+        Args:
+            updates: dict of download_id -> fields to update
+        
+        Returns:
+            int: Number of downloads updated
+        """
+        updated = 0
+        for download_id, kwargs in updates.items():
+            if download_id in self.downloads:
+                self._apply_update(self.downloads[download_id], kwargs)
+                self.downloads[download_id]['revision'] = self._next_revision()
+                updated += 1
+        if updated:
+            self._save_database()
+        return updated
+    
+    def _next_revision(self):
+        """Advance the change counter"""
+        self.revision += 1
+        return self.revision
+    
+    def _add_tombstone(self, download_id):
+        """Remember a deletion so delta clients can drop the row"""
+        self.tombstones[download_id] = self._next_revision()
+        if len(self.tombstones) > self.MAX_TOMBSTONES:
+            oldest = sorted(self.tombstones.items(), key=lambda item: item[1])
+            for old_id, old_revision in oldest[:len(self.tombstones) - self.MAX_TOMBSTONES]:
+                del self.tombstones[old_id]
+                self.tombstone_floor = max(self.tombstone_floor, old_revision)
+    
+    def get_revision(self):
+        """Current value of the change counter"""
+        return self.revision
+    
+    @staticmethod
+    def encode_cursor(download):
+        """Opaque pagination cursor pointing just past a download"""
+        raw = json.dumps([download.get('created_at') or '', download.get('id')])
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        """Turn a cursor back into (created_at, id); raises ValueError if invalid"""
+        try:
+            created_at, download_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            return str(created_at), str(download_id)
+        except Exception:
+            raise ValueError("Invalid cursor")
+    
+    def list_downloads(self, status=None, limit=None, cursor=None):
+        """
+        Page through downloads, newest first
+        
+        Args:
+            status: Only downloads with this status
+            limit: Page size (None for everything)
+            cursor: next_cursor from the previous page
+        
+        Returns:
+            tuple: (downloads, next_cursor or None)
+        """
+        rows = self.get_downloads_by_status(status) if status else list(self.downloads.values())
+        rows.sort(key=lambda d: (d.get('created_at') or '', d.get('id') or ''), reverse=True)
+        if cursor:
+            position = self.decode_cursor(cursor)
+            rows = [d for d in rows if (d.get('created_at') or '', d.get('id') or '') < position]
+        return self._page(rows, limit)
+    
+    def _page(self, rows, limit):
+        """Cut rows to one page and build its cursor"""
+        if limit is None or len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, self.encode_cursor(rows[-1])
+    
+    def get_changes(self, since, limit=None):
+        """
+        Downloads changed and deleted after revision since
+        
+        Returns:
+            dict: {'revision': revision to pass as the next since,
+                   'downloads': changed entries (oldest change first),
+                   'deleted': ids removed, 'has_more': more changes pending,
+                   'reset': True if since is too old - fetch the full list}
+        """
+        if since < self.tombstone_floor:
+            return {'revision': self.revision, 'downloads': [], 'deleted': [], 'has_more': False, 'reset': True}
         
+        changes = [(d.get('revision', 0), 'row', d) for d in self.downloads.values() if d.get('revision', 0) > since]
+        changes += [(revision, 'deleted', download_id) for download_id, revision in self.tombstones.items() if revision > since]
+        return self._collect_changes(sorted(changes, key=lambda change: change[0]), limit, self.revision)
+    
+    def _collect_changes(self, changes, limit, revision):
+        """Build a get_changes() result from (revision, kind, value) tuples read at revision"""
+        has_more = limit is not None and len(changes) > limit
+        if has_more:
+            changes = changes[:limit]
+        return {
+            'revision': changes[-1][0] if has_more else revision,
+            'downloads': [value for _, kind, value in changes if kind == 'row'],
+            'deleted': [value for _, kind, value in changes if kind == 'deleted'],
+            'has_more': has_more,
+            'reset': False
+        }
+    
+    @staticmethod
+    def _apply_update(download, kwargs):
+        """Apply update fields and derived timestamps to a download entry"""
         # Update provided fields
         for key, value in kwargs.items():
             download[key] = value
@@ -105,8 +254,7 @@ class DownloadsDatabase:
             download['status'] = 'completed'
             download['completed_at'] = datetime.now().isoformat()
         
-        self._save_database()
-        return True
+        return download
     
     def get_download(self, download_id):
         """Get a specific download entry"""
@@ -135,6 +283,7 @@ class DownloadsDatabase:
         """
         if download_id in self.downloads:
             del self.downloads[download_id]
+            self._add_tombstone(download_id)
             self._save_database()
             return True
         return False
@@ -147,11 +296,12 @@ class DownloadsDatabase:
             older_than_days: If set, only clear downloads older than N days
         """
         if older_than_days is None:
-            # Clear all
+            # Clear all - every delta client has to resync
             self.downloads = {}
+            self.tombstones = {}
+            self.tombstone_floor = self._next_revision()
         else:
             # Clear only old entries
-            from datetime import timedelta
             cutoff = datetime.now() - timedelta(days=older_than_days)
             to_delete = []
             
@@ -162,6 +312,7 @@ class DownloadsDatabase:
             
             for download_id in to_delete:
                 del self.downloads[download_id]
+                self._add_tombstone(download_id)
         
         self._save_database()
         return True
@@ -197,9 +348,478 @@ class DownloadsDatabase:
                 imported = json.load(f)
             
             # Merge with existing
+            imported.pop(self.META_KEY, None)
+            for download_id, download in imported.items():
+                download['revision'] = self._next_revision()
+                self.tombstones.pop(download_id, None)
             self.downloads.update(imported)
             self._save_database()
             return True
         except Exception as e:
             print(f"Error importing downloads: {e}")
             return False
+
+
+
+class SQLiteDownloadsDatabase(DownloadsDatabase):
+    """
+    SQLite storage engine for the downloads database
+    
+    Same API as DownloadsDatabase, but rows live in an indexed SQLite table
+    (WAL mode) so updates touch one row and status/statistics queries run
+    in SQL instead of scanning every entry. An existing JSON database is
+    imported automatically the first time it is seen.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS downloads (
+            id TEXT PRIMARY KEY,
+            status TEXT,
+            created_at TEXT,
+            downloaded INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            revision INTEGER NOT NULL DEFAULT 0,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_downloads_status ON downloads(status);
+        CREATE INDEX IF NOT EXISTS idx_downloads_created_at ON downloads(created_at);
+        CREATE TABLE IF NOT EXISTS deleted (
+            id TEXT PRIMARY KEY,
+            revision INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_deleted_revision ON deleted(revision);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+    
+    def __init__(self, db_file="downloads_database.db", json_file="downloads_database.json"):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(self.SCHEMA)
+        self._migrate()
+        self._conn.commit()
+        
+        self.revision = int(self._get_meta('revision', 0))
+        self.tombstone_floor = int(self._get_meta('tombstone_floor', 0))
+        
+        if json_file:
+            self._import_json_database(json_file)
+    
+    def _migrate(self):
+        """Add the revision column to databases created before it existed"""
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(downloads)")]
+        if 'revision' not in columns:
+            self._conn.execute("ALTER TABLE downloads ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_downloads_revision ON downloads(revision)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_downloads_cursor ON downloads(created_at, id)")
+    
+    def _get_meta(self, key, default=None):
+        """Read a meta value"""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+    
+    def _set_meta(self, key, value):
+        """Write a meta value (caller holds the lock, inside a transaction)"""
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+    
+    def _next_revision(self):
+        """Advance the change counter (caller holds the lock, inside a transaction)"""
+        self.revision += 1
+        self._set_meta('revision', self.revision)
+        return self.revision
+    
+    def _add_tombstone(self, download_id):
+        """Record a deletion and forget the oldest ones (caller holds the lock)"""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO deleted (id, revision) VALUES (?, ?)",
+            (download_id, self._next_revision())
+        )
+        row = self._conn.execute(
+            "SELECT revision FROM deleted ORDER BY revision DESC LIMIT 1 OFFSET ?", (self.MAX_TOMBSTONES,)
+        ).fetchone()
+        if row:
+            self._conn.execute("DELETE FROM deleted WHERE revision <= ?", (row[0],))
+            self.tombstone_floor = max(self.tombstone_floor, row[0])
+            self._set_meta('tombstone_floor', self.tombstone_floor)
+    
+    def get_revision(self):
+        """Current value of the change counter"""
+        with self._lock:
+            return self.revision
+    
+    def list_downloads(self, status=None, limit=None, cursor=None):
+        """Page through downloads, newest first (keyset pagination in SQL)"""
+        where, params = [], []
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        if cursor:
+            created_at, download_id = self.decode_cursor(cursor)
+            where.append("(created_at < ? OR (created_at = ? AND id < ?))")
+            params += [created_at, created_at, download_id]
+        
+        sql = "SELECT data FROM downloads"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit + 1)  # One extra row tells whether another page exists
+        return self._page(self._query(sql, params), limit)
+    
+    def get_changes(self, since, limit=None):
+        """Downloads changed and deleted after revision since (uses the revision indexes)"""
+        with self._lock:
+            if since < self.tombstone_floor:
+                return {'revision': self.revision, 'downloads': [], 'deleted': [], 'has_more': False, 'reset': True}
+            
+            limit_sql = " LIMIT ?" if limit is not None else ""
+            limit_params = (limit + 1,) if limit is not None else ()
+            rows = self._conn.execute(
+                "SELECT revision, data FROM downloads WHERE revision > ? ORDER BY revision" + limit_sql,
+                (since,) + limit_params
+            ).fetchall()
+            tombstones = self._conn.execute(
+                "SELECT revision, id FROM deleted WHERE revision > ? ORDER BY revision" + limit_sql,
+                (since,) + limit_params
+            ).fetchall()
+            revision = self.revision
+        
+        changes = [(rev, 'row', json.loads(data)) for rev, data in rows]
+        changes += [(rev, 'deleted', download_id) for rev, download_id in tombstones]
+        return self._collect_changes(sorted(changes, key=lambda change: change[0]), limit, revision)
+    
+    def _import_json_database(self, json_file):
+        """
+        Import a legacy JSON database once
+        
+        The JSON file is only the migration source: after the first import
+        SQLite holds the newer state, so later changes to the file (the old
+        engine still saving, or a touched mtime) must not overwrite rows.
+        """
+        if not os.path.exists(json_file):
+            return
+        
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = 'imported_json'"
+            ).fetchone()
+        if row:
+            return
+        
+        if self.import_downloads(json_file):
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('imported_json', ?)",
+                    (os.path.abspath(json_file),)
+                )
+    
+    @staticmethod
+    def _as_int(value):
+        """Coerce a numeric field for the indexed columns"""
+        try:
+            return int(value or 0)
+        except (TypeError, ValueError):
+            return 0
+    
+    def _row_values(self, download):
+        """Column values for a download entry"""
+        return (
+            download.get('id'),
+            download.get('status'),
+            download.get('created_at') or '',
+            self._as_int(download.get('downloaded')),
+            self._as_int(download.get('total')),
+            download.get('revision', 0),
+            json.dumps(download, ensure_ascii=False)
+        )
+    
+    def _upsert(self, download):
+        """Insert or replace a download row with a new revision (caller holds the lock)"""
+        download['revision'] = self._next_revision()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO downloads (id, status, created_at, downloaded, total, revision, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            self._row_values(download)
+        )
+        self._conn.execute("DELETE FROM deleted WHERE id = ?", (download['id'],))
+    
+    def _query(self, sql, params=()):
+        """Run a SELECT returning decoded entries"""
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+    
+    def add_download(self, download_id, url, filename, destination, url_type):
+        """Add a new download to the database"""
+        entry = self._new_entry(download_id, url, filename, destination, url_type)
+        with self._lock, self._conn:
+            self._upsert(entry)
+        return entry
+    
+    def update_download(self, download_id, **kwargs):
+        """Update download progress and status (single-row write)"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT data FROM downloads WHERE id = ?", (download_id,)
+            ).fetchone()
+            if not row:
+                return False
+            download = self._apply_update(json.loads(row[0]), kwargs)
+            self._upsert(download)
+        return True
+    
+    def update_many(self, updates):
+        """Update several downloads in one transaction"""
+        updated = 0
+        with self._lock, self._conn:
+            for download_id, kwargs in updates.items():
+                row = self._conn.execute(
+                    "SELECT data FROM downloads WHERE id = ?", (download_id,)
+                ).fetchone()
+                if row:
+                    self._upsert(self._apply_update(json.loads(row[0]), kwargs))
+                    updated += 1
+        return updated
+    
+    def get_download(self, download_id):
+        """Get a specific download entry"""
+        results = self._query("SELECT data FROM downloads WHERE id = ?", (download_id,))
+        return results[0] if results else None
+    
+    def get_all_downloads(self):
+        """Get all downloads (ordered by creation date, newest first)"""
+        return self._query("SELECT data FROM downloads ORDER BY created_at DESC")
+    
+    def get_downloads_by_status(self, status):
+        """Get downloads by status (uses the status index)"""
+        return self._query(
+            "SELECT data FROM downloads WHERE status = ? ORDER BY created_at DESC", (status,)
+        )
+    
+    def delete_download(self, download_id):
+        """Delete a download from the database"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM downloads WHERE id = ?", (download_id,))
+            if cursor.rowcount > 0:
+                self._add_tombstone(download_id)
+        return cursor.rowcount > 0
+    
+    def clear_downloads(self, older_than_days=None):
+        """Clear all downloads, or only those older than N days"""
+        with self._lock, self._conn:
+            if older_than_days is None:
+                # Clear all - every delta client has to resync
+                self._conn.execute("DELETE FROM downloads")
+                self._conn.execute("DELETE FROM deleted")
+                self.tombstone_floor = self._next_revision()
+                self._set_meta('tombstone_floor', self.tombstone_floor)
+            else:
+                cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat()
+                old_ids = [row[0] for row in self._conn.execute(
+                    "SELECT id FROM downloads WHERE created_at < ?", (cutoff,)
+                )]
+                self._conn.execute("DELETE FROM downloads WHERE created_at < ?", (cutoff,))
+                for download_id in old_ids:
+                    self._add_tombstone(download_id)
+        return True
+    
+    def get_statistics(self):
+        """Get download statistics with one aggregate query"""
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT
+                    COUNT(*),
+                    COALESCE(SUM(status = 'downloading'), 0),
+                    COALESCE(SUM(status = 'completed'), 0),
+                    COALESCE(SUM(status = 'failed'), 0),
+                    COALESCE(SUM(status = 'queued'), 0),
+                    COALESCE(SUM(downloaded), 0),
+                    COALESCE(SUM(total), 0)
+                FROM downloads
+            """).fetchone()
+        
+        return {
+            'total': row[0],
+            'downloading': row[1],
+            'completed': row[2],
+            'failed': row[3],
+            'queued': row[4],
+            'total_downloaded': row[5],
+            'total_size': row[6]
+        }
+    
+    def export_downloads(self, filepath):
+        """Export downloads to JSON file"""
+        try:
+            exported = {d['id']: d for d in self.get_all_downloads()}
+            with open(filepath, 'w', encoding='utf-8') as f:
+                json.dump(exported, f, indent=2, ensure_ascii=False)
+            return True
+        except Exception as e:
+            print(f"Error exporting downloads: {e}")
+            return False
+    
+    def import_downloads(self, filepath):
+        """Import downloads from JSON file"""
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                imported = json.load(f)
+            
+            imported.pop(self.META_KEY, None)
+            with self._lock, self._conn:
+                for download_id, download in imported.items():
+                    download.setdefault('id', download_id)
+                    self._upsert(download)
+            return True
+        except Exception as e:
+            print(f"Error importing downloads: {e}")
+            return False
+    
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+class DatabaseWriter:
+    """
+    Write-behind queue in front of a downloads database
+    
+    add/update/delete only record the change in memory and return, so UI
+    threads never wait on disk. A background thread applies queued changes
+    every `interval` seconds: updates to the same download are merged into
+    one, and all updates in a batch go through update_many() as a single
+    file rewrite / transaction. The queue holds at most max_pending
+    downloads; past that, callers block until the writer catches up.
+    """
+    
+    MAX_ATTEMPTS = 5  # Writes of one download before its changes are dropped
+    
+    def __init__(self, db, interval=0.5, max_pending=256):
+        self.db = db
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = {}  # download_id -> {'add': kwargs, 'fields': dict, 'delete': bool}
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='DatabaseWriter', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    def _entry(self, download_id):
+        """Pending change record for a download (caller holds the lock)"""
+        entry = self._pending.get(download_id)
+        if entry is None:
+            while len(self._pending) >= self.max_pending and not self._closed:
+                self._cond.wait()  # Back-pressure until the writer drains the queue
+            entry = {'add': None, 'fields': {}, 'delete': False}
+            self._pending[download_id] = entry
+            self._cond.notify_all()
+        return entry
+    
+    def add(self, download_id, url, filename, destination, url_type):
+        """Queue a new download"""
+        with self._cond:
+            entry = self._entry(download_id)
+            entry['add'] = dict(url=url, filename=filename, destination=destination, url_type=url_type)
+            entry['delete'] = False
+    
+    def update(self, download_id, **kwargs):
+        """Queue field updates (merged with any still waiting)"""
+        with self._cond:
+            self._entry(download_id)['fields'].update(kwargs)
+    
+    def delete(self, download_id):
+        """Queue a deletion (drops changes still waiting for the download)"""
+        with self._cond:
+            entry = self._entry(download_id)
+            entry.update(add=None, fields={}, delete=True)
+    
+    def pending_count(self):
+        """Downloads with changes not yet written"""
+        with self._cond:
+            return len(self._pending)
+    
+    def _run(self):
+        """Writer thread: wait for changes, let them coalesce, write the batch"""
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._pending:
+                    return
+            time.sleep(self.interval)
+            self.flush()
+    
+    def flush(self):
+        """Write everything queued so far (blocks until it is on disk)"""
+        with self._write_lock:
+            with self._cond:
+                batch = self._pending
+                self._pending = {}
+                self._cond.notify_all()
+            if not batch:
+                return
+            
+            failed = {}
+            for download_id, entry in batch.items():
+                try:
+                    if entry['delete']:
+                        self.db.delete_download(download_id)
+                    elif entry['add']:
+                        self.db.add_download(download_id, **entry['add'])
+                except Exception as e:
+                    print(f"Error writing download {download_id}: {e}")
+                    failed[download_id] = entry
+            
+            updates = {
+                download_id: entry['fields'] for download_id, entry in batch.items()
+                if entry['fields'] and not entry['delete'] and download_id not in failed
+            }
+            if updates:
+                try:
+                    self.db.update_many(updates)
+                except Exception as e:
+                    # Retry one at a time so one bad row does not hold back the rest
+                    print(f"Error writing downloads database: {e}")
+                    for download_id, fields in updates.items():
+                        try:
+                            self.db.update_download(download_id, **fields)
+                        except Exception as e:
+                            print(f"Error writing download {download_id}: {e}")
+                            failed[download_id] = batch[download_id]
+            
+            if failed:
+                self._requeue(failed)
+    
+    def _requeue(self, failed):
+        """Put entries that could not be written back in front of newer changes"""
+        with self._cond:
+            for download_id, entry in failed.items():
+                entry['attempts'] = entry.get('attempts', 0) + 1
+                if entry['attempts'] >= self.MAX_ATTEMPTS:
+                    print(f"Giving up writing download {download_id} after {entry['attempts']} attempts")
+                    continue
+                newer = self._pending.get(download_id)
+                if newer is not None:
+                    if newer['delete'] or (newer['add'] and entry['delete']):
+                        continue  # The newer change replaces the failed one
+                    if not entry['delete']:
+                        entry['add'] = newer['add'] or entry['add']
+                        entry['fields'].update(newer['fields'])
+                self._pending[download_id] = entry
+            self._cond.notify_all()
+    
+    def close(self):
+        """Write pending changes and stop the writer thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.flush()
@@ -0,0 +1,136 @@
+"""
+Event Bus
+Fan-out of download progress deltas to streaming clients, coalesced and rate-bounded
+"""
+
+import itertools
+import math
+import threading
+import time
+
+
+class Subscription:
+    """
+    One client's view of the bus
+
+    Deltas for the same download are merged while they wait, so a slow
+    client only ever receives the latest state of each download and the
+    backlog can never grow beyond one entry per download. What was last
+    sent is remembered per download until it finishes or is deleted.
+    """
+
+    FINAL_STATUSES = ('completed', 'failed', 'cancelled', 'deleted')
+
+    def __init__(self, bus, max_rate):
+        if not (max_rate > 0 and math.isfinite(max_rate)):
+            max_rate = bus.max_rate  # A bad client rate falls back to the bus default, never "unlimited"
+        self._bus = bus
+        self._min_interval = 1.0 / max_rate if max_rate > 0 else 0
+        self._pending = {}  # download_id -> merged delta
+        self._sent = {}  # download_id -> fields as last delivered
+        self._cond = threading.Condition()
+        self._last_sent = 0
+        self.closed = False
+
+    def push(self, download_id, delta):
+        """Merge a delta into the pending batch"""
+        with self._cond:
+            merged = self._pending.setdefault(download_id, {'id': download_id})
+            merged.update(delta)
+            self._cond.notify()
+
+    def get(self, timeout=15.0):
+        """
+        Wait for the next batch of deltas
+
+        Blocks until something changed, then holds the batch until at least
+        1/max_rate seconds have passed since the previous one.
+
+        Returns:
+            list: Deltas (one per download), or [] on timeout
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while not self._pending and not self.closed:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return []
+                self._cond.wait(remaining)
+
+            wait = self._last_sent + self._min_interval - time.time()
+            if wait > 0 and not self.closed:
+                # Let more updates coalesce into this batch
+                self._cond.release()
+                try:
+                    time.sleep(wait)
+                finally:
+                    self._cond.acquire()
+
+            pending = self._pending
+            self._pending = {}
+            self._last_sent = time.time()
+            return self._changed_only(pending)
+
+    def _changed_only(self, pending):
+        """Strip fields the client already has (caller holds the lock)"""
+        batch = []
+        for download_id, delta in pending.items():
+            sent = self._sent.setdefault(download_id, {})
+            changed = {key: value for key, value in delta.items() if key != 'id' and sent.get(key) != value}
+            if delta.get('status') in self.FINAL_STATUSES:
+                self._sent.pop(download_id, None)  # No more deltas to diff against
+            else:
+                sent.update(changed)
+            if changed:
+                batch.append(dict(changed, id=download_id))
+        return batch
+
+    def close(self):
+        """Detach from the bus"""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        self._bus.unsubscribe(self)
+
+
+class EventBus:
+    """
+    Publish download changes to any number of subscribers
+
+    Args:
+        max_rate: Maximum batches per second delivered to each subscriber
+    """
+
+    def __init__(self, max_rate=4.0):
+        self.max_rate = max_rate
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+
+    def publish(self, download_id, **delta):
+        """Send a change for one download to every subscriber"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push(download_id, delta)
+
+    def subscribe(self, max_rate=None):
+        """Create a subscription (call close() when the client goes away)"""
+        subscription = Subscription(self, max_rate or self.max_rate)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscription"""
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def next_sequence(self):
+        """Monotonic id for the next event sent to a client"""
+        return next(self._sequence)
+
+    def subscriber_count(self):
+        """Number of connected subscribers"""
+        with self._lock:
+            return len(self._subscribers)
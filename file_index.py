@@ -0,0 +1,240 @@
+"""
+File Index
+In-memory index of the download directory, kept current by filesystem events
+"""
+
+import os
+import threading
+import time
+from stat import S_ISDIR
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # Optional dependency - falls back to periodic rescans
+    Observer = None
+    FileSystemEventHandler = object
+
+
+class _IndexEventHandler(FileSystemEventHandler):
+    """Forward watchdog events to the index"""
+
+    def __init__(self, index):
+        self.index = index
+
+    def on_created(self, event):
+        self._changed(event.src_path, event.is_directory)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.index.update(event.src_path)
+
+    def on_closed(self, event):
+        self.index.update(event.src_path)
+
+    def on_deleted(self, event):
+        self.index.remove(event.src_path)
+
+    def on_moved(self, event):
+        self.index.remove(event.src_path)
+        self._changed(event.dest_path, event.is_directory)
+
+    def _changed(self, path, is_directory):
+        if is_directory:
+            self.index.rescan(path)
+        else:
+            self.index.update(path)
+
+
+class FileIndex:
+    """
+    Keep name, size and mtime of every file under root in memory
+
+    The tree is walked once; after that watchdog (inotify, FSEvents,
+    ReadDirectoryChangesW) events and explicit update()/rescan() calls from
+    finished downloads keep it current. Without watchdog installed the tree
+    is rescanned in the background every rescan_interval seconds instead.
+    Listing, sorting and searching never touch the disk.
+    """
+
+    SORT_KEYS = ('modified', 'name', 'size')
+
+    def __init__(self, root, ignore_suffixes=('.part', '.tmp', '.ytdl'), rescan_interval=60):
+        self.root = os.path.abspath(root)
+        self.ignore_suffixes = tuple(ignore_suffixes)
+        self.rescan_interval = rescan_interval
+        self._files = {}  # relative path -> entry
+        self._sorted = {}  # sort key -> entries, cleared on every change
+        self._lock = threading.RLock()
+        self._observer = None
+        self._timer = None
+        self._rescan_pending = False
+        self.built_at = None
+
+    def start(self):
+        """Build the index and start following changes"""
+        self.rescan()
+        if Observer is not None:
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_IndexEventHandler(self), self.root, recursive=True)
+                self._observer.daemon = True
+                self._observer.start()
+                return self
+            except Exception as e:
+                print(f"File watcher unavailable, using periodic rescans: {e}")
+                self._observer = None
+        self._schedule_periodic_rescan()
+        return self
+
+    def stop(self):
+        """Stop following changes"""
+        if self._observer:
+            self._observer.stop()
+            self._observer = None
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    def is_watching(self):
+        """True if filesystem events keep the index current"""
+        return self._observer is not None
+
+    def _schedule_periodic_rescan(self):
+        """Fallback when watchdog is not installed"""
+        def run():
+            self.rescan()
+            self._schedule_periodic_rescan()
+        self._timer = threading.Timer(self.rescan_interval, run)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _entry(self, path, stat):
+        """Index entry for a file"""
+        relative = os.path.relpath(path, self.root).replace(os.sep, '/')
+        return relative, {
+            'name': os.path.basename(path),
+            'path': relative,
+            'size': stat.st_size,
+            'modified': stat.st_mtime,
+            'url': f'/files/{relative}'
+        }
+
+    def _ignored(self, name):
+        return name.endswith(self.ignore_suffixes)
+
+    def _walk(self, directory):
+        """Yield (path, stat) for every file under directory"""
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            yield from self._walk(entry.path)
+                        elif entry.is_file() and not self._ignored(entry.name):
+                            yield entry.path, entry.stat()
+                    except OSError:
+                        continue
+        except OSError:
+            return
+
+    def rescan(self, directory=None):
+        """Re-read directory (default: the whole root) from disk"""
+        directory = os.path.abspath(directory or self.root)
+        found = {}
+        for path, stat in self._walk(directory):
+            relative, entry = self._entry(path, stat)
+            found[relative] = entry
+
+        prefix = os.path.relpath(directory, self.root).replace(os.sep, '/')
+        prefix = '' if prefix == '.' else prefix + '/'
+        with self._lock:
+            for relative in [r for r in self._files if r.startswith(prefix) and r not in found]:
+                del self._files[relative]
+            self._files.update(found)
+            self._sorted = {}
+            if not prefix:
+                self.built_at = time.time()
+
+    def schedule_rescan(self, delay=2.0):
+        """Rescan the whole root soon, collapsing repeated requests into one"""
+        with self._lock:
+            if self._rescan_pending:
+                return
+            self._rescan_pending = True
+
+        def run():
+            with self._lock:
+                self._rescan_pending = False
+            self.rescan()
+
+        timer = threading.Timer(delay, run)
+        timer.daemon = True
+        timer.start()
+
+    def update(self, path):
+        """Add or refresh one file (e.g. a download that just finished)"""
+        path = os.path.abspath(path)
+        if self._ignored(path) or not path.startswith(self.root + os.sep):
+            return  # Checked first: partial files change on every write
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.remove(path)
+            return
+        if S_ISDIR(stat.st_mode):
+            self.rescan(path)
+            return
+        relative, entry = self._entry(path, stat)
+        with self._lock:
+            self._files[relative] = entry
+            self._sorted = {}
+
+    def remove(self, path):
+        """Drop a file, or everything under a removed directory"""
+        relative = os.path.relpath(os.path.abspath(path), self.root).replace(os.sep, '/')
+        with self._lock:
+            removed = self._files.pop(relative, None) is not None
+            prefix = relative + '/'
+            for child in [r for r in self._files if r.startswith(prefix)]:
+                del self._files[child]
+                removed = True
+            if removed:
+                self._sorted = {}
+
+    def query(self, search=None, sort='modified', descending=True, offset=0, limit=None):
+        """
+        List files from memory
+
+        Args:
+            search: Case-insensitive substring matched against file names
+            sort: 'modified', 'name' or 'size'
+            descending: Largest/newest/Z first
+            offset, limit: Page window (limit None for everything)
+
+        Returns:
+            tuple: (total matching files, list of entries in the page)
+        """
+        if sort not in self.SORT_KEYS:
+            raise ValueError(f"sort must be one of {', '.join(self.SORT_KEYS)}")
+
+        with self._lock:
+            ordered = self._sorted.get(sort)
+            if ordered is None:
+                key = (lambda e: e['name'].lower()) if sort == 'name' else (lambda e: e[sort])
+                ordered = sorted(self._files.values(), key=key)
+                self._sorted[sort] = ordered
+
+        if search:
+            needle = search.casefold()
+            ordered = [e for e in ordered if needle in e['name'].casefold()]
+        if descending:
+            ordered = ordered[::-1]
+
+        total = len(ordered)
+        end = None if limit is None else offset + limit
+        return total, [dict(e) for e in ordered[offset:end]]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._files)
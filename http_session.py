@@ -0,0 +1,96 @@
+"""
+Shared HTTP Session
+Process-wide connection pool with keep-alive and retry/backoff, shared by every downloader
+"""
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class SessionManager:
+    """
+    Owns one requests.Session with tuned connection pools
+
+    Reusing the session keeps TCP/TLS connections alive between requests,
+    so many small files from the same host only pay connection setup once.
+
+    Args:
+        pool_connections: Number of hosts to keep connection pools for
+        pool_maxsize: Connections kept alive per host
+        block: If True, pool_maxsize becomes a hard per-host limit and
+               extra requests wait for a free connection
+        max_retries: Retries for connection errors and retryable statuses
+        backoff_factor: Exponential backoff between retries (seconds)
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, pool_connections=32, pool_maxsize=16, block=False,
+                 max_retries=3, backoff_factor=0.5, user_agent="NGK-Download-Manager/1.0"):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.block = block
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.user_agent = user_agent
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _build_session(self):
+        """Create a session with retrying, pooled adapters"""
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=self.max_retries,
+            status=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=frozenset(['HEAD', 'GET', 'OPTIONS']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.block,
+            max_retries=retry
+        )
+
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers['User-Agent'] = self.user_agent
+        return session
+
+    def get_session(self):
+        """Return the shared session, creating it on first use"""
+        with self._lock:
+            if self._session is None:
+                self._session = self._build_session()
+            return self._session
+
+    def close(self):
+        """Close all pooled connections"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+_manager = SessionManager()
+
+
+def get_session():
+    """Shared requests.Session used by all downloaders"""
+    return _manager.get_session()
+
+
+def configure(**kwargs):
+    """Replace the shared pool settings (takes effect for new requests)"""
+    global _manager
+    old_manager = _manager
+    _manager = SessionManager(**kwargs)
+    old_manager.close()
+    return _manager
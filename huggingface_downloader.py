@@ -4,21 +4,28 @@ Handles authentication and downloads from Hugging Face Hub
 """
 
 import os
-import requests
-from huggingface_hub import HfApi, hf_hub_download, snapshot_download, login, logout
+import re
+from huggingface_hub import HfApi, hf_hub_download, login, logout
 from huggingface_hub.utils import RepositoryNotFoundError, RevisionNotFoundError
 from urllib.parse import urlparse, unquote
 import time
 import threading
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import json
-from download_state_manager import DownloadStateManager
+from download_state_manager import get_state_manager
+from http_session import get_session
+from integrity import StreamHasher, IntegrityError
+from bandwidth_limiter import get_limiter
+from adaptive_tuner import get_tuner
 
 class HuggingFaceDownloader:
-    def __init__(self):
+    def __init__(self, max_workers=4, tuner=None, state_manager=None):
         self.api = HfApi()
         self.active_downloads = {}
-        self.state_manager = DownloadStateManager()
+        self.state_manager = state_manager or get_state_manager()
+        self.max_workers = max_workers  # Parallel file downloads for whole repositories
+        self.tuner = tuner or get_tuner()  # Read sizes follow measured throughput
         
     def download(self, url, destination, progress_callback=None, token=None):
         """
@@ -82,11 +89,11 @@ class HuggingFaceDownloader:
             # Download specific file or entire repository
             if filename:
                 success = self._download_single_file(
-                    repo_id, filename, repo_dest, repo_type, progress_callback
+                    repo_id, filename, repo_dest, repo_type, progress_callback, source_url=url
                 )
             else:
                 success = self._download_repository(
-                    repo_id, repo_dest, repo_type, progress_callback
+                    repo_id, repo_dest, repo_type, progress_callback, source_url=url
                 )
             
             if success and progress_callback:
@@ -137,8 +144,16 @@ class HuggingFaceDownloader:
                 'filename': repo_info.get('filename') if 'repo_info' in locals() else None
             }
     
-    def _download_single_file(self, repo_id, filename, destination, repo_type, progress_callback):
-        """Download a single file from HF repository with progress tracking"""
+    def _download_single_file(self, repo_id, filename, destination, repo_type, progress_callback, bytes_callback=None,
+                              source_url=None):
+        """
+        Download a single file from HF repository with progress tracking
+        
+        bytes_callback, if given, is called as bytes_callback(filename, downloaded, total)
+        after every chunk so repository downloads can aggregate byte-accurate progress.
+        source_url is the URL the download was requested with; bandwidth limits set
+        for it apply to the resolved file URL.
+        """
         try:
             if progress_callback:
                 progress_callback({
@@ -156,21 +171,15 @@ class HuggingFaceDownloader:
             else:  # model
                 download_url = f"https://huggingface.co/{repo_id}/resolve/main/{filename}"
             
-            # Use requests for download with progress tracking
-            import requests
-            import time
-            
+            # Use the shared session for download with progress tracking
             # Get headers for authentication if token exists
             headers = {}
             if 'HUGGINGFACE_HUB_TOKEN' in os.environ:
                 headers['Authorization'] = f"Bearer {os.environ['HUGGINGFACE_HUB_TOKEN']}"
             
-            # First, try to get file info with HEAD request
-            try:
-                head_response = requests.head(download_url, headers=headers, allow_redirects=True)
-                total_size = int(head_response.headers.get('content-length', 0))
-            except:
-                total_size = 0
+            # Identify the exact revision of the file before touching local data
+            remote = self._get_remote_file_info(download_url, headers)
+            total_size = remote['size']
             
             if progress_callback and total_size > 0:
                 progress_callback({
@@ -180,45 +189,114 @@ class HuggingFaceDownloader:
                     'status': 'Connecting'
                 })
             
+            # Create full file path; data is staged in .part until complete
+            file_path = os.path.join(destination, filename)
+            part_path = file_path + '.part'
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            
+            download_id = f"{download_url}_{file_path}"
+            state = self.state_manager.get_download_info(download_id)
+            same_revision = (
+                state is not None
+                and remote['etag'] is not None
+                and state.get('etag') == remote['etag']
+                and state.get('total_size') == total_size
+            )
+            
+            if same_revision and state.get('status') == 'completed' and os.path.exists(file_path) \
+                    and os.path.getsize(file_path) == total_size:
+                if bytes_callback:
+                    bytes_callback(filename, total_size, total_size)
+                if progress_callback:
+                    progress_callback({
+                        'filename': f"{filename} ({self._format_size(total_size)})",
+                        'progress': "100%",
+                        'speed': "0 B/s",
+                        'status': 'Already downloaded'
+                    })
+                return True
+            
+            # Only resume a .part file that belongs to the same revision
+            existing_size = 0
+            if same_revision and os.path.exists(part_path):
+                existing_size = os.path.getsize(part_path)
+                if total_size and existing_size >= total_size:
+                    existing_size = 0
+            if not existing_size:
+                self.state_manager.start_download(download_url, file_path, total_size, extra={
+                    'etag': remote['etag'],
+                    'commit': remote['commit']
+                })
+            
+            request_headers = dict(headers)
+            if existing_size:
+                request_headers['Range'] = f'bytes={existing_size}-'
+            
             # Start download
-            response = requests.get(download_url, headers=headers, stream=True)
+            response = get_session().get(download_url, headers=request_headers, stream=True)
             response.raise_for_status()
             
-            # If we didn't get size from HEAD, try from GET response
+            if existing_size and response.status_code == 206:
+                mode = 'ab'
+                if progress_callback:
+                    progress_callback({
+                        'filename': f"{filename} ({self._format_size(existing_size)}/{self._format_size(total_size)})",
+                        'progress': f"{(existing_size / total_size) * 100:.1f}%" if total_size else "0%",
+                        'speed': "0 B/s",
+                        'status': 'Resuming'
+                    })
+            else:
+                mode = 'wb'
+                existing_size = 0
+            
+            # If the hub did not report a size, fall back to the GET response
             if total_size == 0:
                 total_size = int(response.headers.get('content-length', 0))
             
-            # Create full file path
-            file_path = os.path.join(destination, filename)
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            # Hash while streaming; a resumed .part re-reads only the bytes it keeps
+            expected = self._expected_digest(remote['etag'], total_size)
+            hasher = StreamHasher([expected[0]] if expected else ['sha256'], size=total_size)
+            if existing_size:
+                hasher.update_from_file(part_path, existing_size)
             
-            # Use larger chunk size for better performance
-            chunk_size = 1024 * 1024  # 1MB chunks for better performance
+            # Read size comes from what this host reached before (smaller when throttled)
+            limiter = get_limiter()
+            host = urlparse(download_url).hostname
+            limit_url = source_url or download_url
+            monitor = self.tuner.monitor(host, rtt=response.elapsed.total_seconds())
+            chunk_size = limiter.read_size(monitor.read_size, host, limit_url)
             
             # Download with progress tracking
-            downloaded_size = 0
+            downloaded_size = existing_size
             start_time = time.time()
             last_update = start_time
             chunks_downloaded = 0
             
-            with open(file_path, 'wb') as f:
+            with open(part_path, mode) as f:
                 try:
                     for chunk in response.iter_content(chunk_size=chunk_size):
                         if chunk:
                             f.write(chunk)
+                            hasher.update(chunk)
                             downloaded_size += len(chunk)
                             chunks_downloaded += 1
                             
+                            self.state_manager.update_download(download_id, downloaded_size, chunks_downloaded)
+                            limiter.throttle(len(chunk), host, limit_url)
+                            monitor.update(len(chunk))
+                            if bytes_callback:
+                                bytes_callback(filename, downloaded_size, total_size)
+                            
                             # Update progress every 0.5 seconds
                             current_time = time.time()
                             if current_time - last_update >= 0.5:
                                 elapsed_time = current_time - start_time
                                 if elapsed_time > 0:
-                                    speed = downloaded_size / elapsed_time
+                                    speed = (downloaded_size - existing_size) / elapsed_time
                                     speed_str = self._format_speed(speed)
                                 else:
+                                    speed = 0
                                     speed_str = "0 B/s"
-                                
                                 if progress_callback:
                                     try:
                                         if total_size > 0:
@@ -245,7 +323,8 @@ class HuggingFaceDownloader:
                                             'filename': filename_display,
                                             'progress': progress_str,
                                             'speed': speed_display,
-                                            'status': 'Downloading'
+                                            'status': 'Downloading',
+                                            'tuning': dict(monitor.snapshot(), read_size=chunk_size)
                                         })
                                     except Exception as callback_error:
                                         # Don't let callback errors stop the download
@@ -254,11 +333,31 @@ class HuggingFaceDownloader:
                                 last_update = current_time
                 except KeyboardInterrupt:
                     print("Download interrupted by user")
+                    self.state_manager.flush()
                     return False
                 except Exception as download_error:
                     print(f"Download error: {download_error}")
+                    self.state_manager.flush()
                     return False
             
+            # Never promote a short file - the .part stays for the next resume
+            if total_size and downloaded_size != total_size:
+                self.state_manager.flush()
+                raise IOError(f"Incomplete download: got {downloaded_size} of {total_size} bytes")
+            monitor.finish(throttled=bool(limiter.limit_for(host, limit_url)))
+            
+            if expected:
+                try:
+                    hasher.verify(expected[0], expected[1])
+                except IntegrityError:
+                    # Corrupt data must not be resumed from either
+                    os.remove(part_path)
+                    self.state_manager.remove_download(download_id)
+                    raise
+            
+            os.replace(part_path, file_path)
+            self.state_manager.complete_download(download_id, extra=hasher.hexdigests())
+            
             # Final progress update
             if progress_callback:
                 if total_size > 0:
@@ -286,6 +385,53 @@ class HuggingFaceDownloader:
                 })
             return False
     
+    def _get_remote_file_info(self, download_url, headers):
+        """
+        Get size and revision identity of a hub file
+        
+        The hub answers a resolve URL with a redirect carrying X-Linked-Size and
+        X-Linked-Etag for LFS files (the LFS sha256), or with ETag/Content-Length
+        for regular files. X-Repo-Commit identifies the commit served.
+        """
+        info = {'size': 0, 'etag': None, 'commit': None}
+        try:
+            response = get_session().head(download_url, headers=headers, allow_redirects=False, timeout=10)
+            response_headers = response.headers
+            
+            if response.is_redirect and not response_headers.get('x-linked-size'):
+                # Non-LFS redirect (e.g. renamed repo) - follow it for the real headers
+                response = get_session().head(download_url, headers=headers, allow_redirects=True, timeout=10)
+                response_headers = response.headers
+            
+            size = response_headers.get('x-linked-size') or response_headers.get('content-length') or 0
+            etag = response_headers.get('x-linked-etag') or response_headers.get('etag')
+            
+            info['size'] = int(size)
+            info['etag'] = etag.replace('W/', '').strip('"') if etag else None
+            info['commit'] = response_headers.get('x-repo-commit')
+        except Exception as e:
+            print(f"Could not get file info for {download_url}: {e}")
+        
+        return info
+    
+    @staticmethod
+    def _expected_digest(etag, size):
+        """
+        Digest a hub file must have, from its ETag
+        
+        LFS files carry their sha256 (X-Linked-Etag); regular files carry the
+        git blob sha1, which covers a "blob <size>" header plus the content.
+        
+        Returns:
+            tuple: (algorithm, hexdigest) or None
+        """
+        etag = (etag or '').lower()
+        if re.fullmatch(r'[0-9a-f]{64}', etag):
+            return 'sha256', etag
+        if re.fullmatch(r'[0-9a-f]{40}', etag) and size:
+            return 'git-sha1', etag
+        return None
+    
     def _format_speed(self, bytes_per_second):
         """Format download speed in human readable format"""
         return f"{self._format_size(bytes_per_second)}/s"
@@ -303,41 +449,84 @@ class HuggingFaceDownloader:
             minutes = (seconds % 3600) // 60
             return f"{hours:.0f}h {minutes:.0f}m"
     
-    def _download_repository(self, repo_id, destination, repo_type, progress_callback):
-        """Download entire repository from HF"""
+    def _download_repository(self, repo_id, destination, repo_type, progress_callback, max_workers=None,
+                             source_url=None):
+        """
+        Download entire repository from HF, several files at a time
+        
+        Files come from get_repository_info and are started largest first so the
+        long transfers overlap with the many small ones. Progress is aggregated
+        across files in bytes.
+        """
         try:
             # Get repository info
             repo_info = self.get_repository_info(repo_id, repo_type)
             if not repo_info:
                 return False
             
-            total_files = len(repo_info.get('files', []))
-            downloaded_files = 0
+            file_sizes = repo_info.get('file_sizes', {})
+            files = sorted(repo_info.get('files', []), key=lambda name: file_sizes.get(name, 0), reverse=True)
+            total_files = len(files)
+            total_bytes = sum(file_sizes.get(name, 0) for name in files)
+            
+            lock = threading.Lock()
+            file_progress = {}
+            completed_files = [0]
+            failed_files = []
+            start_time = time.time()
+            last_update = [0]
             
-            def file_progress_callback(file_info):
-                nonlocal downloaded_files
-                downloaded_files += 1
-                progress = (downloaded_files / total_files) * 100 if total_files > 0 else 0
+            def report(force=False):
+                now = time.time()
+                if not progress_callback or (not force and now - last_update[0] < 0.5):
+                    return
+                last_update[0] = now
                 
-                if progress_callback:
+                downloaded = sum(file_progress.values())
+                elapsed = now - start_time
+                speed = downloaded / elapsed if elapsed > 0 else 0
+                total = max(total_bytes, downloaded)
+                progress = (downloaded / total) * 100 if total > 0 else 0
+                
+                try:
                     progress_callback({
-                        'filename': repo_id,
+                        'filename': f"{repo_id} ({self._format_size(downloaded)}/{self._format_size(total)})",
                         'progress': f"{progress:.1f}%",
-                        'speed': "0 B/s",
-                        'status': f'Downloading ({downloaded_files}/{total_files})'
+                        'speed': self._format_speed(speed),
+                        'status': f'Downloading ({completed_files[0]}/{total_files} files)',
+                        'downloaded': downloaded,
+                        'total': total
                     })
-            
-            # Download repository
-            snapshot_download(
-                repo_id=repo_id,
-                repo_type=repo_type,
-                local_dir=destination,
-                local_dir_use_symlinks=False
-            )
-            
-            return True
+                except Exception as callback_error:
+                    print(f"Progress callback error: {callback_error}")
+            
+            def bytes_callback(name, downloaded, total):
+                with lock:
+                    file_progress[name] = downloaded
+                    report()
+            
+            def fetch(name):
+                ok = self._download_single_file(repo_id, name, destination, repo_type, None, bytes_callback,
+                                                source_url=source_url)
+                with lock:
+                    if ok:
+                        completed_files[0] += 1
+                    else:
+                        failed_files.append(name)
+                    report(force=True)
+                return ok
+            
+            workers = max_workers or self.max_workers
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                results = list(pool.map(fetch, files))
+            
+            if failed_files:
+                print(f"Failed to download {len(failed_files)} file(s) from {repo_id}: {', '.join(failed_files)}")
+            
+            return all(results)
             
         except Exception as e:
+            print(f"Error downloading repository {repo_id}: {e}")
             return False
     
     def _parse_hf_url(self, url):
@@ -401,14 +590,16 @@ class HuggingFaceDownloader:
         """Get repository information"""
         try:
             if repo_type == 'model':
-                info = self.api.model_info(repo_id)
-                files = [f.rfilename for f in info.siblings] if info.siblings else []
+                info = self.api.model_info(repo_id, files_metadata=True)
             elif repo_type == 'dataset':
-                info = self.api.dataset_info(repo_id)
-                files = [f.rfilename for f in info.siblings] if info.siblings else []
+                info = self.api.dataset_info(repo_id, files_metadata=True)
             else:
                 return None
             
+            siblings = info.siblings or []
+            files = [f.rfilename for f in siblings]
+            file_sizes = {f.rfilename: getattr(f, 'size', None) or 0 for f in siblings}
+            
             return {
                 'repo_id': repo_id,
                 'repo_type': repo_type,
@@ -420,7 +611,8 @@ class HuggingFaceDownloader:
                 'created_at': getattr(info, 'created_at', None),
                 'last_modified': getattr(info, 'last_modified', None),
                 'files': files,
-                'total_size': sum(getattr(f, 'size', 0) for f in info.siblings) if info.siblings else 0
+                'file_sizes': file_sizes,
+                'total_size': sum(file_sizes.values())
             }
             
         except Exception as e:
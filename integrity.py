@@ -0,0 +1,172 @@
+"""
+Integrity
+Hash downloads while they stream and check them against expected digests
+"""
+
+import re
+import base64
+import hashlib
+
+try:
+    import crc32c as _crc32c  # Optional dependency: pip install crc32c
+except ImportError:
+    _crc32c = None
+
+HEX_LENGTHS = {64: 'sha256', 40: 'sha1', 32: 'md5'}  # Bare hex checksums by length
+DIGEST_NAMES = {'sha-256': 'sha256', 'sha-512': 'sha512', 'md5': 'md5', 'sha': 'sha1'}
+
+
+class IntegrityError(Exception):
+    """Downloaded data does not match its expected digest"""
+
+
+class _GitBlobHash:
+    """sha1 of a git blob ("blob <size>\\0" + content) - the ETag of regular files on the HF hub"""
+
+    def __init__(self, size):
+        self._hash = hashlib.sha1(b'blob %d\0' % size)
+
+    def update(self, data):
+        self._hash.update(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+class _Crc32c:
+    """CRC32C (Castagnoli) via the optional crc32c package"""
+
+    def __init__(self):
+        self._value = 0
+
+    def update(self, data):
+        self._value = _crc32c.crc32c(data, self._value)
+
+    def hexdigest(self):
+        return f"{self._value:08x}"
+
+
+def available_algorithms():
+    """Algorithms StreamHasher can compute here"""
+    algorithms = ['sha256', 'sha512', 'sha1', 'md5', 'git-sha1']
+    if _crc32c is not None:
+        algorithms.append('crc32c')
+    return algorithms
+
+
+def parse_checksum(value):
+    """
+    Parse a user-supplied checksum
+
+    Accepts "algorithm:hexdigest" (e.g. "sha256:9f86d0...") or a bare hex
+    digest, whose length selects sha256, sha1 or md5.
+
+    Returns:
+        tuple: (algorithm, hexdigest)
+    """
+    value = value.strip()
+    if ':' in value:
+        algorithm, digest = value.split(':', 1)
+        algorithm = algorithm.strip().lower().replace('-', '')
+        algorithm = 'git-sha1' if algorithm == 'gitsha1' else algorithm
+    else:
+        digest = value
+        algorithm = HEX_LENGTHS.get(len(digest))
+    digest = digest.strip().lower()
+    if algorithm not in available_algorithms() or not re.fullmatch(r'[0-9a-f]+', digest):
+        raise ValueError(f"Unsupported checksum: {value}")
+    return algorithm, digest
+
+
+def expected_from_headers(headers):
+    """
+    Find an expected digest in HTTP response headers
+
+    Checked in order: X-Linked-Etag (the LFS sha256 on the HF hub),
+    Repr-Digest / Digest, and finally an ETag that looks like an MD5 (S3,
+    GCS and most object stores use the MD5 of single-part uploads).
+
+    Returns:
+        tuple: (algorithm, hexdigest, authoritative) or None. ETag-derived
+               digests are not authoritative - some servers put an MD5 of
+               something else in the ETag - so a mismatch is only reported.
+    """
+    linked = (headers.get('X-Linked-Etag') or '').replace('W/', '').strip('"').lower()
+    if re.fullmatch(r'[0-9a-f]{64}', linked):
+        return 'sha256', linked, True
+
+    for header in ('Repr-Digest', 'Digest'):
+        for item in (headers.get(header) or '').split(','):
+            name, _, value = item.strip().partition('=')
+            algorithm = DIGEST_NAMES.get(name.strip().lower())
+            if algorithm and value:
+                try:
+                    raw = base64.b64decode(value.strip().strip(':'), validate=True)
+                except ValueError:
+                    continue
+                return algorithm, raw.hex(), True
+
+    etag = headers.get('ETag') or ''
+    if not etag.startswith('W/'):
+        etag = etag.strip('"').lower()
+        if re.fullmatch(r'[0-9a-f]{32}', etag):
+            return 'md5', etag, False
+    return None
+
+
+class StreamHasher:
+    """
+    Compute several digests over a stream in one pass
+
+    Args:
+        algorithms: Names from available_algorithms()
+        size: Total size, required for 'git-sha1'
+    """
+
+    def __init__(self, algorithms=('sha256',), size=None):
+        self._hashes = {}
+        for algorithm in dict.fromkeys(algorithms):
+            if algorithm == 'git-sha1':
+                self._hashes[algorithm] = _GitBlobHash(size)
+            elif algorithm == 'crc32c':
+                if _crc32c is None:
+                    raise ValueError("crc32c needs the optional 'crc32c' package")
+                self._hashes[algorithm] = _Crc32c()
+            else:
+                self._hashes[algorithm] = hashlib.new(algorithm)
+        self.bytes_hashed = 0
+
+    def update(self, data):
+        """Add the next bytes of the stream"""
+        for hash_obj in self._hashes.values():
+            hash_obj.update(data)
+        self.bytes_hashed += len(data)
+
+    def update_from_file(self, filepath, length, buffer_size=1024 * 1024):
+        """Hash the first length bytes of a file (the part kept when resuming)"""
+        buffer = bytearray(buffer_size)
+        view = memoryview(buffer)
+        remaining = length
+        with open(filepath, 'rb') as f:
+            while remaining > 0:
+                count = f.readinto(view[:min(buffer_size, remaining)])
+                if not count:
+                    raise IntegrityError(f"{filepath} is shorter than {length} bytes")
+                self.update(view[:count])
+                remaining -= count
+
+    def hexdigests(self):
+        """dict of algorithm -> hex digest so far"""
+        return {algorithm: hash_obj.hexdigest() for algorithm, hash_obj in self._hashes.items()}
+
+    def verify(self, algorithm, expected):
+        """
+        Compare a digest with its expected value
+
+        Raises:
+            IntegrityError: If they differ
+        """
+        actual = self._hashes[algorithm].hexdigest()
+        if actual != expected.lower():
+            raise IntegrityError(f"{algorithm} mismatch: expected {expected}, got {actual}")
+        return actual
@@ -8,13 +8,15 @@ from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.textinput import TextInput
 from kivy.uix.button import Button
 from kivy.uix.label import Label
-from kivy.uix.scrollview import ScrollView
-from kivy.uix.gridlayout import GridLayout
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
 from kivy.uix.popup import Popup
 from kivy.uix.progressbar import ProgressBar
 from kivy.uix.spinner import Spinner
 from kivy.clock import Clock
 from kivy.uix.screenmanager import ScreenManager, Screen
+from kivy.properties import StringProperty, NumericProperty
 import threading
 import os
 import sys
@@ -25,7 +27,70 @@ from youtube_downloader import YouTubeDownloader
 from huggingface_downloader import HuggingFaceDownloader
 from download_manager import DownloadManager
 from utils import URLDetector
-from downloads_database import DownloadsDatabase
+from downloads_database import DownloadsDatabase, DatabaseWriter
+from progress_aggregator import ProgressAggregator
+
+def short_filename(filename, limit=50):
+    """Filename shortened to fit a download row"""
+    return filename[:limit] + "..." if len(filename) > limit else filename
+
+
+class DownloadRow(RecycleDataViewBehavior, BoxLayout):
+    """
+    Progress display for one download in the list
+    
+    The RecycleView only creates enough of these to fill the screen and
+    rebinds them to other entries of its data list while scrolling, so a
+    row's state lives in that data, not in the widget.
+    """
+    download_id = StringProperty("")
+    filename = StringProperty("Preparing...")
+    url_type = StringProperty("")
+    progress_value = NumericProperty(0)
+    progress_text = StringProperty("0%")
+    speed = StringProperty("0 B/s")
+    status = StringProperty("Starting")
+    
+    def __init__(self, **kwargs):
+        kwargs.setdefault('orientation', 'vertical')
+        kwargs.setdefault('spacing', 5)
+        super().__init__(**kwargs)
+        
+        # Info row
+        info_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=30)
+        
+        filename_label = Label(text=self.filename, size_hint_x=0.7, halign='left')
+        self.bind(filename=filename_label.setter('text'))
+        info_layout.add_widget(filename_label)
+        
+        type_label = Label(text=self.url_type, size_hint_x=0.3, halign='right')
+        self.bind(url_type=type_label.setter('text'))
+        info_layout.add_widget(type_label)
+        
+        self.add_widget(info_layout)
+        
+        # Progress bar
+        progress_bar = ProgressBar(max=100, value=self.progress_value, size_hint_y=None, height=20)
+        self.bind(progress_value=progress_bar.setter('value'))
+        self.add_widget(progress_bar)
+        
+        # Status row
+        status_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=30)
+        
+        progress_label = Label(text=self.progress_text, size_hint_x=0.3, halign='left')
+        self.bind(progress_text=progress_label.setter('text'))
+        status_layout.add_widget(progress_label)
+        
+        speed_label = Label(text=self.speed, size_hint_x=0.4, halign='center')
+        self.bind(speed=speed_label.setter('text'))
+        status_layout.add_widget(speed_label)
+        
+        status_label = Label(text=self.status, size_hint_x=0.3, halign='right')
+        self.bind(status=status_label.setter('text'))
+        status_layout.add_widget(status_label)
+        
+        self.add_widget(status_layout)
+
 
 class DownloadScreen(Screen):
     """Main download screen"""
@@ -39,10 +104,17 @@ class DownloadScreen(Screen):
         }
         self.url_detector = URLDetector()
         self.active_downloads = {}
+        self.row_index = {}  # download_id -> position in self.download_list.data
         self.download_counter = 0
         
         # Initialize persistent downloads database
         self.downloads_db = DownloadsDatabase()
+        # All writes go through a background thread; the UI thread only touches widgets
+        self.db_writer = DatabaseWriter(self.downloads_db)
+        
+        # Progress from download threads is applied to the widgets at 10 Hz
+        self.progress = ProgressAggregator(self.update_progress, interval=0.1)
+        Clock.schedule_interval(lambda dt: self.progress.flush(), self.progress.interval)
         
         self.build_ui()
         
@@ -127,21 +199,24 @@ class DownloadScreen(Screen):
         )
         main_layout.add_widget(progress_label)
         
-        # Scrollable download list
-        scroll = ScrollView()
-        self.download_list = GridLayout(
-            cols=1,
+        # Scrollable download list - only the rows on screen have widgets
+        self.download_list = RecycleView(viewclass=DownloadRow)
+        rows_layout = RecycleBoxLayout(
+            orientation='vertical',
             spacing=5,
+            default_size=(None, 100),
+            default_size_hint=(1, None),
             size_hint_y=None
         )
-        self.download_list.bind(minimum_height=self.download_list.setter('height'))
-        scroll.add_widget(self.download_list)
-        main_layout.add_widget(scroll)
+        rows_layout.bind(minimum_height=rows_layout.setter('height'))
+        self.download_list.add_widget(rows_layout)
+        main_layout.add_widget(self.download_list)
         
         self.add_widget(main_layout)
     
     def load_downloads_from_database(self):
         """Load all downloads from database on startup"""
+        self.db_writer.flush()  # Queued changes are not in downloads_db yet
         all_downloads = self.downloads_db.get_all_downloads()
         
         # Handle both list and dict formats
@@ -150,39 +225,68 @@ class DownloadScreen(Screen):
         else:
             downloads_dict = all_downloads
         
+        existing = list(self.download_list.data)
+        rows = []
         for download_id, download_info in downloads_dict.items():
-            # Create progress widget
-            progress_widget = self.create_progress_widget(
-                download_id,
-                download_info.get('url', 'Unknown'),
-                download_info.get('url_type', 'Unknown')
-            )
-            self.download_list.add_widget(progress_widget)
-            
             # Restore download info
             self.active_downloads[download_id] = {
-                'widget': progress_widget,
                 'url': download_info.get('url', ''),
                 'type': download_info.get('url_type', ''),
                 'quality': download_info.get('quality', 'Auto')
             }
             
-            # Update widget with saved data
-            widget = progress_widget
-            widget._filename_label.text = download_info.get('filename', 'Unknown')[:50] + "..." if len(download_info.get('filename', '')) > 50 else download_info.get('filename', 'Unknown')
-            
-            progress_percent = download_info.get('progress_percent', 0)
-            widget._progress_bar.value = progress_percent
-            widget._progress_label.text = f"{progress_percent}%"
-            
+            # Row data with saved state
+            progress_percent = download_info.get('progress_percent') or 0
             status = download_info.get('status', 'Unknown')
-            widget._status_label.text = status
+            row = self._new_row(download_id, download_info.get('url_type', 'Unknown'))
+            row.update(
+                filename=short_filename(download_info.get('filename') or 'Unknown'),
+                progress_value=progress_percent,
+                progress_text=f"{progress_percent}%",
+                status=status
+            )
             
             if status == 'completed':
-                widget._progress_bar.value = 100
-                widget._progress_label.text = "100%"
+                row['progress_value'] = 100
+                row['progress_text'] = "100%"
             elif status == 'failed':
-                widget._speed_label.text = download_info.get('error', '')
+                row['speed'] = download_info.get('error') or ''
+            
+            self.row_index[download_id] = len(existing) + len(rows)
+            rows.append(row)
+        
+        # One assignment - the RecycleView lays out only what is visible
+        self.download_list.data = existing + rows
+    
+    @staticmethod
+    def _new_row(download_id, url_type):
+        """Data for a fresh row in the download list"""
+        return {
+            'download_id': download_id,
+            'filename': "Preparing...",
+            'url_type': url_type,
+            'progress_value': 0,
+            'progress_text': "0%",
+            'speed': "0 B/s",
+            'status': "Starting"
+        }
+    
+    def update_row(self, download_id, **fields):
+        """
+        Change a row of the download list
+        
+        Only the row's data entry is updated; a widget is refreshed only if
+        the row is currently on screen. Rows scrolled into view later pick
+        the new values up from the data.
+        """
+        index = self.row_index.get(download_id)
+        if index is None:
+            return
+        row = self.download_list.data[index]
+        row.update(fields)
+        view = self.download_list.view_adapter.get_visible_view(index)
+        if view is not None:
+            view.refresh_view_attrs(self.download_list, index, row)
     
     def on_url_change(self, instance, text):
         """Handle URL input change"""
@@ -210,20 +314,19 @@ class DownloadScreen(Screen):
         # Get download directory
         download_dir = self.get_download_directory()
         
-        # Create progress widget
-        progress_widget = self.create_progress_widget(download_id, url, url_type)
-        self.download_list.add_widget(progress_widget)
+        # Add a row to the download list
+        self.row_index[download_id] = len(self.download_list.data)
+        self.download_list.data.append(self._new_row(download_id, url_type))
         
         # Store download info
         self.active_downloads[download_id] = {
-            'widget': progress_widget,
             'url': url,
             'type': url_type,
             'quality': quality
         }
         
         # Add to persistent database
-        self.downloads_db.add_download(
+        self.db_writer.add(
             download_id=download_id,
             url=url,
             filename="Preparing...",
@@ -257,90 +360,18 @@ class DownloadScreen(Screen):
         self.url_input.text = ""
         self.url_info_label.text = ""
     
-    def create_progress_widget(self, download_id, url, url_type):
-        """Create a progress display widget"""
-        widget = BoxLayout(
-            orientation='vertical',
-            size_hint_y=None,
-            height=100,
-            spacing=5
-        )
-        
-        # Info row
-        info_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=30)
-        
-        filename_label = Label(
-            text="Preparing...",
-            size_hint_x=0.7,
-            halign='left'
-        )
-        info_layout.add_widget(filename_label)
-        
-        type_label = Label(
-            text=url_type,
-            size_hint_x=0.3,
-            halign='right'
-        )
-        info_layout.add_widget(type_label)
-        
-        widget.add_widget(info_layout)
-        
-        # Progress bar
-        progress_bar = ProgressBar(
-            max=100,
-            value=0,
-            size_hint_y=None,
-            height=20
-        )
-        widget.add_widget(progress_bar)
-        
-        # Status row
-        status_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=30)
-        
-        progress_label = Label(
-            text="0%",
-            size_hint_x=0.3,
-            halign='left'
-        )
-        status_layout.add_widget(progress_label)
-        
-        speed_label = Label(
-            text="0 B/s",
-            size_hint_x=0.4,
-            halign='center'
-        )
-        status_layout.add_widget(speed_label)
-        
-        status_label = Label(
-            text="Starting",
-            size_hint_x=0.3,
-            halign='right'
-        )
-        status_layout.add_widget(status_label)
-        
-        widget.add_widget(status_layout)
-        
-        # Store references for updates
-        widget._filename_label = filename_label
-        widget._progress_bar = progress_bar
-        widget._progress_label = progress_label
-        widget._speed_label = speed_label
-        widget._status_label = status_label
-        
-        return widget
-    
     def update_progress(self, download_id, progress_info):
         """Update progress display and database"""
         if download_id not in self.active_downloads:
             return
         
-        widget = self.active_downloads[download_id]['widget']
+        row = {}
         
         # Update filename if available
+        filename = None
         if 'filename' in progress_info:
             filename = progress_info['filename']
-            widget._filename_label.text = filename[:50] + "..." if len(filename) > 50 else filename
-            self.downloads_db.update_download(download_id, filename=filename)
+            row['filename'] = short_filename(filename)
         
         # Update progress
         progress_percent = None
@@ -349,42 +380,43 @@ class DownloadScreen(Screen):
             if progress_text.endswith('%'):
                 try:
                     progress_percent = float(progress_text[:-1])
-                    widget._progress_bar.value = progress_percent
+                    row['progress_value'] = progress_percent
                 except:
                     pass
-            widget._progress_label.text = progress_text
+            row['progress_text'] = progress_text
         
         # Update speed
         speed = None
         if 'speed' in progress_info:
             speed = progress_info['speed']
-            widget._speed_label.text = speed
+            row['speed'] = speed
         
         # Update status
         status = None
         if 'status' in progress_info:
             status = progress_info['status']
-            widget._status_label.text = status
+            row['status'] = status
         
-        # Update database with progress
-        if progress_percent is not None or speed is not None or status is not None:
+        self.update_row(download_id, **row)
+        
+        # Update database with progress (one write per frame)
+        if filename is not None or progress_percent is not None or speed is not None or status is not None:
             update_data = {}
+            if filename is not None:
+                update_data['filename'] = filename
             if progress_percent is not None:
                 update_data['progress_percent'] = progress_percent
             if speed is not None:
                 update_data['speed'] = speed
             if status is not None:
                 update_data['status'] = status
-            self.downloads_db.update_download(download_id, **update_data)
+            self.db_writer.update(download_id, **update_data)
     
     def youtube_download_worker(self, download_id, url, quality):
         """Worker for YouTube downloads"""
         try:
             def progress_callback(progress_info):
-                try:
-                    Clock.schedule_once(lambda dt: self.update_progress(download_id, progress_info))
-                except:
-                    pass  # Ignore callback errors if UI is closing
+                self.progress.submit(download_id, progress_info)
             
             # Map quality selection
             audio_only = (quality == "Audio Only (MP3)")
@@ -419,7 +451,7 @@ class DownloadScreen(Screen):
         """Worker for HuggingFace downloads"""
         try:
             def progress_callback(progress_info):
-                Clock.schedule_once(lambda dt: self.update_progress(download_id, progress_info))
+                self.progress.submit(download_id, progress_info)
             
             download_dir = self.get_download_directory()
             
@@ -436,7 +468,7 @@ class DownloadScreen(Screen):
         """Worker for direct downloads"""
         try:
             def progress_callback(progress_info):
-                Clock.schedule_once(lambda dt: self.update_progress(download_id, progress_info))
+                self.progress.submit(download_id, progress_info)
             
             download_dir = self.get_download_directory()
             
@@ -463,19 +495,18 @@ class DownloadScreen(Screen):
     
     def download_completed(self, download_id, result):
         """Handle download completion and update database"""
+        self.progress.discard(download_id)  # A late progress frame must not undo "Completed"
         if download_id in self.active_downloads:
-            widget = self.active_downloads[download_id]['widget']
-            widget._progress_bar.value = 100
-            widget._progress_label.text = "100%"
-            widget._status_label.text = "Completed"
+            row = {'progress_value': 100, 'progress_text': "100%", 'status': "Completed"}
             
             filename = None
             if isinstance(result, dict) and result.get('filename'):
                 filename = result['filename']
-                widget._filename_label.text = filename
+                row['filename'] = short_filename(filename)
+            self.update_row(download_id, **row)
             
             # Update database with completion
-            self.downloads_db.update_download(
+            self.db_writer.update(
                 download_id,
                 status='completed',
                 progress_percent=100,
@@ -485,13 +516,12 @@ class DownloadScreen(Screen):
     
     def download_failed(self, download_id, error):
         """Handle download failure and update database"""
+        self.progress.discard(download_id)
         if download_id in self.active_downloads:
-            widget = self.active_downloads[download_id]['widget']
-            widget._status_label.text = "Failed"
-            widget._speed_label.text = ""
+            self.update_row(download_id, status="Failed", speed="")
             
             # Update database with failure
-            self.downloads_db.update_download(
+            self.db_writer.update(
                 download_id,
                 status='failed',
                 error=str(error)
@@ -516,7 +546,17 @@ class NGKDownloadApp(App):
         sm = ScreenManager()
         download_screen = DownloadScreen(name='download')
         sm.add_widget(download_screen)
+        self.download_screen = download_screen
         return sm
+    
+    def on_pause(self):
+        """Android may kill a paused app - get queued changes onto disk"""
+        self.download_screen.db_writer.flush()
+        return True
+    
+    def on_stop(self):
+        """Write queued database changes before exiting"""
+        self.download_screen.db_writer.close()
 
 if __name__ == '__main__':
     NGKDownloadApp().run()
\ No newline at end of file
@@ -18,6 +18,8 @@ from kivy.uix.screenmanager import ScreenManager, Screen
 from kivy.uix.tabbedpanel import TabbedPanel, TabbedPanelItem
 import threading
 import requests
+import json
+import time
 import os
 import sys
 from datetime import datetime
@@ -27,6 +29,7 @@ CLOUD_FUNCTION_URL = "https://us-central1-YOUR_PROJECT.cloudfunctions.net/vm-con
 API_KEY = "your-api-key-here"  # From Cloud Function deployment
 VM_STATIC_IP = "136.114.215.21"  # Your VM's static IP
 VM_API_PORT = "5000"
+EVENT_READ_TIMEOUT = 45  # Server sends a keep-alive every 15s; reconnect if silent longer
 
 class MainScreen(Screen):
     """Main screen with tabs for Downloads and Files"""
@@ -35,6 +38,14 @@ class MainScreen(Screen):
         super().__init__(**kwargs)
         self.vm_status = 'unknown'
         self.vm_ip = None
+        self.download_widgets = {}  # download_id -> widgets updated by /events
+        self.known_downloads = set()
+        self.downloads_cache = {}  # download_id -> entry, kept in sync with ?since=
+        self.downloads_revision = None
+        self.downloads_etag = None
+        self.refresh_lock = threading.Lock()
+        self.events_thread = None
+        self.events_connected = False
         
         self.build_ui()
         
@@ -344,7 +355,8 @@ class MainScreen(Screen):
                 if response.status_code == 201:
                     Clock.schedule_once(lambda dt: self.show_info("Download queued!"))
                     Clock.schedule_once(lambda dt: self.clear_url_input())
-                    Clock.schedule_once(lambda dt: self.refresh_downloads(), 1)
+                    if not self.events_connected:
+                        Clock.schedule_once(lambda dt: self.refresh_downloads(), 1)
                 else:
                     Clock.schedule_once(lambda dt: self.show_error(f"Failed: {response.text}"))
                     
@@ -358,26 +370,130 @@ class MainScreen(Screen):
         self.url_input.text = ""
     
     def refresh_downloads(self):
-        """Refresh downloads list"""
+        """Refresh downloads list (after the first load, only rows changed since the last refresh)"""
         if self.vm_status != 'running':
             return
         
         def worker():
             try:
                 api_url = f"http://{VM_STATIC_IP}:{VM_API_PORT}"
-                response = requests.get(f"{api_url}/downloads", timeout=10)
+                with self.refresh_lock:
+                    if self.downloads_revision is None or not self.sync_download_changes(api_url):
+                        response = requests.get(f"{api_url}/downloads", timeout=10)
+                        if response.status_code != 200:
+                            return
+                        self.downloads_cache = {d['id']: d for d in response.json()}
+                        self.downloads_revision = int(response.headers.get('X-Revision', 0))
+                    downloads = list(self.downloads_cache.values())
                 
-                if response.status_code == 200:
-                    downloads = response.json()
-                    Clock.schedule_once(lambda dt: self.update_downloads_ui(downloads))
+                Clock.schedule_once(lambda dt: self.update_downloads_ui(downloads))
+                Clock.schedule_once(lambda dt: self.start_event_stream())
             except:
                 pass  # Silently fail on refresh
         
         threading.Thread(target=worker, daemon=True).start()
     
+    def sync_download_changes(self, api_url):
+        """
+        Apply rows changed since downloads_revision to the local cache
+        
+        Returns:
+            bool: False if the server asks for a full reload
+        """
+        while True:
+            headers = {'If-None-Match': self.downloads_etag} if self.downloads_etag else {}
+            response = requests.get(
+                f"{api_url}/downloads",
+                params={'since': self.downloads_revision, 'limit': 200},
+                headers=headers,
+                timeout=10
+            )
+            if response.status_code == 304:
+                return True  # Nothing changed
+            if response.status_code != 200:
+                return False
+            
+            changes = response.json()
+            if changes.get('reset'):
+                return False
+            for download in changes['downloads']:
+                self.downloads_cache[download['id']] = download
+            for download_id in changes['deleted']:
+                self.downloads_cache.pop(download_id, None)
+            self.downloads_revision = changes['revision']
+            self.downloads_etag = response.headers.get('ETag')
+            if not changes['has_more']:
+                return True
+    
+    def start_event_stream(self):
+        """Subscribe to /events so progress is pushed instead of re-fetching the list"""
+        if self.events_thread and self.events_thread.is_alive():
+            return
+        
+        def worker():
+            api_url = f"http://{VM_STATIC_IP}:{VM_API_PORT}"
+            reconnect_delay = 1
+            while self.vm_status == 'running':
+                try:
+                    response = requests.get(f"{api_url}/events", stream=True,
+                                            timeout=(10, EVENT_READ_TIMEOUT))
+                    response.raise_for_status()
+                    if reconnect_delay > 1:
+                        # Events were missed while disconnected - resync once
+                        Clock.schedule_once(lambda dt: self.refresh_downloads())
+                    reconnect_delay = 1
+                    self.events_connected = True
+                    
+                    for line in response.iter_lines(decode_unicode=True):
+                        if self.vm_status != 'running':
+                            break
+                        if line and line.startswith('data:'):
+                            deltas = json.loads(line[5:])
+                            Clock.schedule_once(lambda dt, d=deltas: self.apply_download_events(d))
+                    response.close()
+                except Exception:
+                    pass  # Dropped stream - reconnect below
+                
+                self.events_connected = False
+                time.sleep(reconnect_delay)
+                reconnect_delay = min(reconnect_delay * 2, 30)
+        
+        self.events_thread = threading.Thread(target=worker, daemon=True)
+        self.events_thread.start()
+    
+    def apply_download_events(self, deltas):
+        """Apply progress deltas from /events to the existing download rows"""
+        needs_refresh = False
+        for delta in deltas:
+            download_id = delta.get('id')
+            widgets = self.download_widgets.get(download_id)
+            if download_id not in self.known_downloads or delta.get('status') == 'deleted':
+                needs_refresh = True  # New or removed download - rebuild the list
+                continue
+            if widgets is None:
+                continue  # Not among the rows on screen
+            
+            info = widgets['info']
+            info.update(delta)
+            progress = info.get('progress_percent', 0) or 0
+            filename = info.get('filename', 'Unknown')
+            widgets['name'].text = filename[:50] + "..." if len(filename) > 50 else filename
+            widgets['bar'].value = progress
+            widgets['status'].text = f"{info.get('status', 'unknown').title()} - {progress:.0f}%"
+            widgets['speed'].text = info.get('speed', '')
+        
+        if needs_refresh:
+            self.refresh_downloads()
+    
     def update_downloads_ui(self, downloads):
         """Update downloads list UI"""
         self.downloads_list.clear_widgets()
+        self.download_widgets = {}
+        
+        # The server returns a list of entries; older servers returned an id -> entry dict
+        if isinstance(downloads, list):
+            downloads = {info.get('id'): info for info in downloads}
+        self.known_downloads = set(downloads)
         
         if not downloads:
             self.downloads_list.add_widget(Label(
@@ -390,7 +506,7 @@ class MainScreen(Screen):
         # Sort by most recent
         sorted_downloads = sorted(
             downloads.items(),
-            key=lambda x: x[1].get('added_at', ''),
+            key=lambda x: x[1].get('created_at') or x[1].get('added_at', ''),
             reverse=True
         )
         
@@ -449,6 +565,14 @@ class MainScreen(Screen):
         
         layout.add_widget(status_row)
         
+        self.download_widgets[download_id] = {
+            'info': dict(info),
+            'name': name_label,
+            'bar': progress_bar,
+            'status': status_label,
+            'speed': speed_label
+        }
+        
         return layout
     
     def refresh_files(self):
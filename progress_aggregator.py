@@ -0,0 +1,69 @@
+"""
+Progress Aggregator
+Coalesces progress callbacks from download threads into fixed-rate UI frames
+"""
+
+import threading
+
+
+class ProgressAggregator:
+    """
+    Buffer progress updates per download and apply them once per frame
+
+    Download threads call submit() as often as they like; it only merges the
+    update into a dict. The UI toolkit's timer calls flush() on the UI thread
+    every `interval` seconds, and apply_update(download_id, info) runs at most
+    once per download per frame with the merged, latest values:
+
+        Kivy:    Clock.schedule_interval(lambda dt: aggregator.flush(), aggregator.interval)
+        tkinter: def tick(): aggregator.flush(); root.after(int(aggregator.interval * 1000), tick)
+
+    Args:
+        apply_update: Called on the UI thread as apply_update(download_id, info)
+        interval: Frame interval in seconds (0.1 = 10 Hz)
+    """
+
+    def __init__(self, apply_update, interval=0.1):
+        self.apply_update = apply_update
+        self.interval = interval
+        self._pending = {}  # download_id -> merged progress info
+        self._lock = threading.Lock()
+
+    def submit(self, download_id, info):
+        """Queue a progress update (any thread)"""
+        with self._lock:
+            merged = self._pending.get(download_id)
+            if merged is None:
+                self._pending[download_id] = dict(info)
+            else:
+                merged.update(info)
+
+    def discard(self, download_id):
+        """Drop queued updates, e.g. once a download has finished"""
+        with self._lock:
+            self._pending.pop(download_id, None)
+
+    def flush(self):
+        """
+        Apply every queued update (UI thread)
+
+        Returns:
+            int: Number of downloads updated in this frame
+        """
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch = self._pending
+            self._pending = {}
+
+        for download_id, info in batch.items():
+            try:
+                self.apply_update(download_id, info)
+            except Exception as e:
+                print(f"Progress update error for {download_id}: {e}")
+        return len(batch)
+
+    def pending_count(self):
+        """Downloads with updates waiting for the next frame"""
+        with self._lock:
+            return len(self._pending)
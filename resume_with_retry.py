@@ -5,6 +5,7 @@ Resume with retry logic and better error handling
 import os
 import requests
 import time
+from http_session import get_session
 
 def resume_download(url, filepath, max_retries=5):
     """Resume download with retry logic"""
@@ -22,7 +23,7 @@ def resume_download(url, filepath, max_retries=5):
     # Get total size
     try:
         print("Getting file info from server...")
-        response = requests.head(url, allow_redirects=True, timeout=10)
+        response = get_session().head(url, allow_redirects=True, timeout=10)
         total_size = int(response.headers.get('content-length', 0))
         print(f"✓ Total size: {total_size/1024/1024:.1f} MB")
     except Exception as e:
@@ -54,7 +55,7 @@ def resume_download(url, filepath, max_retries=5):
             headers = {'Range': f'bytes={current_size}-'} if current_size > 0 else {}
             
             # Open connection with longer timeout
-            response = requests.get(url, headers=headers, stream=True, timeout=timeout)
+            response = get_session().get(url, headers=headers, stream=True, timeout=timeout)
             
             if response.status_code not in [200, 206]:
                 print(f"⚠ Server returned status {response.status_code}")
@@ -0,0 +1,300 @@
+"""
+Segmented Downloader
+Fetches a single file over several parallel HTTP Range connections
+"""
+
+import os
+import threading
+import time
+import requests
+from urllib.parse import urlparse
+from http_session import get_session
+from file_writer import preallocate
+from bandwidth_limiter import get_limiter
+
+
+class SegmentError(Exception):
+    """Raised when a segment cannot be fetched after all retries"""
+    pass
+
+
+class RemoteChangedError(SegmentError):
+    """Raised when If-Range shows the remote file changed since the segments were planned"""
+    pass
+
+
+class SegmentedDownloader:
+    """
+    Split a download into byte ranges and fetch them at the same time
+
+    All segments are written into one preallocated .part file using
+    positional writes. Each segment's progress is stored in the
+    DownloadStateManager entry so a dropped segment can be retried or
+    resumed on its own without touching the others.
+    """
+
+    def __init__(self, state_manager, num_segments=4, chunk_size=1048576, max_retries=3, timeout=30):
+        self.state_manager = state_manager
+        self.num_segments = max(1, num_segments)
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+    def plan_segments(self, total_size):
+        """Split [0, total_size) into contiguous segments"""
+        count = min(self.num_segments, max(1, total_size // self.chunk_size))
+        segment_size = total_size // count
+        segments = []
+        for index in range(count):
+            start = index * segment_size
+            end = total_size - 1 if index == count - 1 else start + segment_size - 1
+            segments.append({
+                'index': index,
+                'start': start,
+                'end': end,
+                'downloaded': 0,
+                'status': 'pending',
+                'retries': 0
+            })
+        return segments
+
+    def download(self, url, filepath, total_size, download_id, progress_callback=None, filename=None,
+                 validator=None):
+        """
+        Download url into filepath using parallel segments
+
+        Args:
+            url: URL to download from (server must support byte ranges)
+            filepath: Final file path; data is staged in filepath + '.part'
+            total_size: Total size reported by the server
+            download_id: DownloadStateManager id used to persist segment state
+            progress_callback: Function to call with progress updates
+            filename: Display name for progress updates
+            validator: Strong ETag or Last-Modified of the remote file; saved
+                       with the segments and sent as If-Range on every request
+
+        Returns:
+            bool: True if every segment completed, False otherwise
+        """
+        filename = filename or os.path.basename(filepath)
+        part_path = filepath + '.part'
+        segments = self._load_segments(download_id, part_path, total_size, validator)
+
+        # Preallocate the full size so every segment can write at its own offset
+        fd = os.open(part_path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            if os.fstat(fd).st_size > total_size:
+                os.ftruncate(fd, total_size)
+            preallocate(fd, total_size)
+        except OSError:
+            os.close(fd)
+            raise
+        lock = threading.Lock()
+        stop_event = threading.Event()
+        errors = []
+        changed = []
+
+        def worker(segment):
+            try:
+                self._fetch_segment(url, fd, segment, lock, stop_event, validator)
+            except RemoteChangedError as e:
+                with lock:
+                    segment['status'] = 'failed'
+                    errors.append(f"segment {segment['index']}: {e}")
+                    changed.append(segment['index'])
+                stop_event.set()
+            except Exception as e:
+                with lock:
+                    segment['status'] = 'failed'
+                    errors.append(f"segment {segment['index']}: {e}")
+                stop_event.set()
+
+        threads = []
+        for segment in segments:
+            if segment['status'] == 'completed':
+                continue
+            thread = threading.Thread(target=worker, args=(segment,), daemon=True)
+            threads.append(thread)
+            thread.start()
+
+        start_time = time.time()
+        initial_size = sum(s['downloaded'] for s in segments)
+
+        try:
+            while any(t.is_alive() for t in threads):
+                for thread in threads:
+                    thread.join(timeout=0.3)
+                    if thread.is_alive():
+                        break
+                self._report(download_id, segments, lock, total_size, start_time,
+                             initial_size, filename, progress_callback)
+        except BaseException:
+            # e.g. the progress callback cancelled the download - stop every segment first
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+            raise
+        finally:
+            os.close(fd)
+            self._save_segments(download_id, segments, lock)
+
+        if changed:
+            # Data from the old file must not be mixed with the new one
+            os.remove(part_path)
+            self.state_manager.update_segments(download_id, [], 0)
+
+        if errors or not all(s['status'] == 'completed' for s in segments):
+            if progress_callback:
+                progress_callback({
+                    'filename': filename,
+                    'progress': f"{(self._downloaded(segments, lock) / total_size) * 100:.1f}%",
+                    'speed': "0 B/s",
+                    'status': f"Error: {'; '.join(errors) or 'segments incomplete'}"
+                })
+            return False
+
+        os.replace(part_path, filepath)
+        return True
+
+    def _fetch_segment(self, url, fd, segment, lock, stop_event, validator=None):
+        """Fetch one segment, resuming from its own offset on each retry"""
+        limiter = get_limiter()
+        host = urlparse(url).hostname
+        while True:
+            if stop_event.is_set():
+                with lock:
+                    segment['status'] = 'paused'
+                return
+
+            offset = segment['start'] + segment['downloaded']
+            if offset > segment['end']:
+                with lock:
+                    segment['status'] = 'completed'
+                return
+
+            with lock:
+                segment['status'] = 'downloading'
+
+            attempt_start = offset
+            try:
+                headers = {'Range': f"bytes={offset}-{segment['end']}"}
+                if validator:
+                    headers['If-Range'] = validator
+                response = get_session().get(url, headers=headers, stream=True,
+                                             allow_redirects=True, timeout=self.timeout)
+                if response.status_code != 206:
+                    response.close()
+                    if validator and response.status_code == 200:
+                        raise RemoteChangedError("remote file changed since the download started")
+                    raise SegmentError(f"server ignored range request (HTTP {response.status_code})")
+
+                chunk_size = limiter.read_size(self.chunk_size, host, url)
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    if stop_event.is_set():
+                        response.close()
+                        break
+                    if not chunk:
+                        continue
+                    remaining = segment['end'] - offset + 1
+                    if len(chunk) > remaining:
+                        chunk = chunk[:remaining]
+                    self._write_at(fd, chunk, offset, lock)
+                    offset += len(chunk)
+                    with lock:
+                        segment['downloaded'] += len(chunk)
+                    limiter.throttle(len(chunk), host, url)
+                    if offset > segment['end']:
+                        response.close()
+                        break
+
+                if offset <= segment['end'] and not stop_event.is_set():
+                    raise requests.exceptions.ChunkedEncodingError("connection closed before segment end")
+
+            except SegmentError:
+                raise
+            except Exception as e:
+                with lock:
+                    if offset > attempt_start:
+                        segment['retries'] = 0  # This attempt made progress: the connection is not dead
+                    segment['retries'] += 1
+                    retries = segment['retries']
+                if retries > self.max_retries:
+                    raise SegmentError(f"gave up after {self.max_retries} retries: {e}")
+                time.sleep(min(2 ** retries, 30))
+
+    def _write_at(self, fd, data, offset, lock):
+        """Write data at an absolute file offset"""
+        if hasattr(os, 'pwrite'):
+            view = memoryview(data)
+            while view:
+                written = os.pwrite(fd, view, offset)
+                view = view[written:]
+                offset += written
+        else:
+            # No pwrite on Windows - serialize seek + write on the shared descriptor
+            with lock:
+                os.lseek(fd, offset, os.SEEK_SET)
+                os.write(fd, data)
+
+    def _load_segments(self, download_id, part_path, total_size, validator=None):
+        """Restore segment state from a previous run or plan new segments"""
+        info = self.state_manager.get_download_info(download_id) or {}
+        saved = info.get('segments')
+        if (saved and info.get('total_size') == total_size and info.get('validator') == validator
+                and os.path.exists(part_path) and os.path.getsize(part_path) == total_size):
+            for segment in saved:
+                if segment['status'] != 'completed':
+                    segment['status'] = 'pending'
+                    segment['retries'] = 0
+            return saved
+
+        segments = self.plan_segments(total_size)
+        self.state_manager.update_segments(download_id, segments, 0, extra={'validator': validator})
+        return segments
+
+    def _save_segments(self, download_id, segments, lock):
+        """Persist a snapshot of segment state"""
+        with lock:
+            snapshot = [dict(s) for s in segments]
+        self.state_manager.update_segments(
+            download_id, snapshot, sum(s['downloaded'] for s in snapshot)
+        )
+
+    def _downloaded(self, segments, lock):
+        """Total bytes downloaded across all segments"""
+        with lock:
+            return sum(s['downloaded'] for s in segments)
+
+    def _report(self, download_id, segments, lock, total_size, start_time,
+                initial_size, filename, progress_callback):
+        """Save segment state and send an aggregated progress update"""
+        self._save_segments(download_id, segments, lock)
+        if not progress_callback:
+            return
+
+        with lock:
+            downloaded = sum(s['downloaded'] for s in segments)
+            active = len([s for s in segments if s['status'] == 'downloading'])
+            done = len([s for s in segments if s['status'] == 'completed'])
+
+        elapsed = time.time() - start_time
+        speed = (downloaded - initial_size) / elapsed if elapsed > 0 else 0
+
+        progress_callback({
+            'filename': filename,
+            'progress': f"{(downloaded / total_size) * 100:.1f}%" if total_size > 0 else "0%",
+            'speed': f"{self._format_size(speed)}/s",
+            'status': f'Downloading ({active} connections, {done}/{len(segments)} segments)',
+            'downloaded': downloaded,
+            'total': total_size,
+            'segments': len(segments),
+            'active_segments': active
+        })
+
+    def _format_size(self, bytes_size):
+        """Format file size in human readable format"""
+        for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
+            if bytes_size < 1024.0:
+                return f"{bytes_size:.1f} {unit}"
+            bytes_size /= 1024.0
+        return f"{bytes_size:.1f} PB"
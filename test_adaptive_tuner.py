@@ -0,0 +1,57 @@
+"""
+Test adaptive read sizes and segment counts
+"""
+
+from adaptive_tuner import AdaptiveTuner
+
+MB = 1024 * 1024
+
+
+def test_adaptive_tuner():
+    """Read sizes follow throughput, segment counts climb per host"""
+
+    print("=" * 60)
+    print("ADAPTIVE TUNER TEST")
+    print("=" * 60)
+
+    print("\n--- TEST 1: Read size follows throughput ---")
+    tuner = AdaptiveTuner(initial_read_size=8192, sample_interval=0)
+    assert tuner.next_read_size(8192, 40 * MB) == (2 * MB, "grow reads to 2.0 MB at 40.0 MB/s")
+    assert tuner.next_read_size(2 * MB, 1 * MB)[0] == 32 * 1024
+    assert tuner.next_read_size(MB, 25 * MB)[0] == MB  # Within 2x: no change
+    assert tuner.next_read_size(MB, 10 * 1024 * MB)[0] == 4 * MB  # Capped
+    monitor = tuner.monitor("fast.example", rtt=0.02)
+    assert monitor.read_size == 256 * 1024  # Legacy 8 KB setting is floored
+    monitor.throughput = 40 * MB
+    assert monitor.update(8192) > 256 * 1024
+    assert monitor.snapshot()['rtt_ms'] == 20.0
+    monitor.finish()
+    assert tuner.read_size_for("fast.example") == monitor.read_size
+    assert tuner.read_size_for("fast.example", streams=4) == monitor.read_size // 4
+    assert tuner.read_size_for("new.example", streams=4) == 256 * 1024
+    print("✓ Reads grow on fast links, shrink on slow ones and carry over per host")
+
+    print("\n--- TEST 2: Segment count hill-climbs ---")
+    tuner = AdaptiveTuner(initial_segments=4, max_segments=16)
+    size = 1024 * MB
+    assert tuner.segments_for("a.example", size)[0] == 4
+    assert tuner.segments_for("far.example", size, rtt=0.3)[0] == 8
+    assert tuner.segments_for("a.example", 20 * MB)[0] == 2  # Too small for more
+    tuner.record_transfer("a.example", 4, size, 10.0)
+    assert tuner.segments_for("a.example", size)[0] == 6
+    tuner.record_transfer("a.example", 6, size, 7.0)  # 43% faster
+    assert tuner.segments_for("a.example", size)[0] == 8
+    tuner.record_transfer("a.example", 8, size, 6.9)  # No real gain
+    count, decision = tuner.segments_for("a.example", size)
+    assert count == 6 and "did not help" in decision
+    tuner.record_transfer("b.example", 4, size, 10.0, throttled=True)
+    assert tuner.segments_for("b.example", size)[0] == 4
+    print("✓ More connections while they help, back off when they stop")
+
+    print("\n" + "=" * 60)
+    print("ADAPTIVE TUNER TEST COMPLETE")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_adaptive_tuner()
@@ -0,0 +1,152 @@
+"""
+Test the asyncio batch download engine
+Serves local files with Range support so no real server is needed
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+from async_download_engine import AsyncDownloadEngine, claim_filename
+from download_manager import DownloadManager
+from download_state_manager import DownloadStateManager
+
+
+FILES = {
+    '/a/model.bin': os.urandom(300000),
+    '/b/model.bin': os.urandom(200000),
+    '/c/MODEL.bin': os.urandom(100000),
+    '/done.bin': os.urandom(50000),
+    '/stale.bin': os.urandom(40000),
+    '/shrunk.bin': os.urandom(40000),
+}
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Minimal handler that honours single byte ranges and answers 416 past the end"""
+    protocol_version = 'HTTP/1.1'
+
+    def _respond(self, body_wanted):
+        payload = FILES.get(self.path)
+        if payload is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        start, end, status = 0, len(payload) - 1, 200
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            if start >= len(payload):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(payload)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            end = int(match.group(2)) if match.group(2) else end
+            status = 206
+        self.send_response(status)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(payload)}')
+        self.end_headers()
+        if body_wanted:
+            self.wfile.write(payload[start:end + 1])
+
+    def do_HEAD(self):
+        self._respond(False)
+
+    def do_GET(self):
+        self._respond(True)
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_async_download_engine():
+    """Colliding names, finished and stale .part files, thread fallback"""
+
+    print("=" * 60)
+    print("ASYNC DOWNLOAD ENGINE TEST")
+    print("=" * 60)
+
+    server = ThreadingServer(('127.0.0.1', 0), RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        print("\n--- TEST 1: Name claiming ---")
+        claimed = set()
+        assert [claim_filename(n, claimed) for n in ['x.bin', 'X.bin', 'x.bin']] == ['x.bin', 'X (2).bin', 'x (3).bin']
+        print("✓ Repeated names get numbered variants")
+
+        if AsyncDownloadEngine.is_available():
+            print("\n--- TEST 2: Same basename from different paths ---")
+            destination = os.path.join(work_dir, 'async')
+            urls = [base + path for path in ('/a/model.bin', '/b/model.bin', '/c/MODEL.bin')]
+            results = AsyncDownloadEngine(write_buffer_size=64 * 1024).download_many(urls, destination)
+            assert all(results.values())
+            assert _read(os.path.join(destination, 'model.bin')) == FILES['/a/model.bin']
+            assert _read(os.path.join(destination, 'model (2).bin')) == FILES['/b/model.bin']
+            assert _read(os.path.join(destination, 'MODEL (3).bin')) == FILES['/c/MODEL.bin']
+            print("✓ Each URL got its own file")
+
+            print("\n--- TEST 3: 416 on resume checks the .part size ---")
+            with open(os.path.join(destination, 'done.bin.part'), 'wb') as f:
+                f.write(FILES['/done.bin'])
+            with open(os.path.join(destination, 'stale.bin.part'), 'wb') as f:
+                f.write(os.urandom(len(FILES['/stale.bin']) + 10))  # Longer than the file now is
+            results = AsyncDownloadEngine().download_many([base + '/done.bin', base + '/stale.bin'], destination)
+            assert all(results.values())
+            assert _read(os.path.join(destination, 'done.bin')) == FILES['/done.bin']
+            assert _read(os.path.join(destination, 'stale.bin')) == FILES['/stale.bin']
+            print("✓ A complete .part is kept, a stale one is downloaded again")
+        else:
+            print("\n(aiohttp not installed - async tests skipped)")
+
+        print("\n--- TEST 4: Thread fallback names files the same way ---")
+        destination = os.path.join(work_dir, 'threads')
+        dm = DownloadManager(segments=1, state_manager=DownloadStateManager(os.path.join(work_dir, 'state')))
+        urls = [base + '/a/model.bin', base + '/b/model.bin']
+        assert all(dm.download_many(urls, destination, backend='threads').values())
+        assert _read(os.path.join(destination, 'model.bin')) == FILES['/a/model.bin']
+        assert _read(os.path.join(destination, 'model (2).bin')) == FILES['/b/model.bin']
+        print("✓ Thread pool downloads do not share targets")
+
+        print("\n--- TEST 5: 416 on a thread resume checks the size ---")
+        dm.probe(base + '/shrunk.bin')  # Cached size is 40000
+        with open(os.path.join(destination, 'shrunk.bin.part'), 'wb') as f:
+            f.write(os.urandom(30000))
+        FILES['/shrunk.bin'] = os.urandom(20000)  # Remote file shrank since
+        statuses = []
+        assert dm.download(base + '/shrunk.bin', destination, lambda info: statuses.append(info['status']))
+        assert 'Already Complete' not in statuses
+        assert _read(os.path.join(destination, 'shrunk.bin')) == FILES['/shrunk.bin']
+        print("✓ A .part longer than the remote file is downloaded again")
+
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir)
+
+    print("\n" + "=" * 60)
+    print("ASYNC DOWNLOAD ENGINE TEST COMPLETE")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_async_download_engine()
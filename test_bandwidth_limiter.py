@@ -0,0 +1,81 @@
+"""
+Test token-bucket bandwidth shaping
+"""
+
+import time
+import threading
+
+from bandwidth_limiter import BandwidthLimiter, parse_rate
+
+
+def test_bandwidth_limiter():
+    """Shared global rate, per-host limits and the serving reserve"""
+
+    print("=" * 60)
+    print("BANDWIDTH LIMITER TEST")
+    print("=" * 60)
+
+    print("\n--- TEST 1: Rate parsing ---")
+    assert parse_rate("2M") == 2 * 1024 * 1024
+    assert parse_rate("20Mbit") == parse_rate("20mbps") == 2500000
+    assert parse_rate(None) == parse_rate(0) == 0
+    print("✓ Bytes, bits and unlimited")
+
+    print("\n--- TEST 2: Concurrent transfers share the global rate ---")
+    limiter = BandwidthLimiter(global_rate=2 * 1024 * 1024)
+
+    def transfer(host):
+        for _ in range(16):
+            limiter.throttle(64 * 1024, host, f"http://{host}/file")
+
+    threads = [threading.Thread(target=transfer, args=(f"host{i}",)) for i in range(4)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+    # 4 MB at 2 MB/s, less the initial half-second burst
+    assert 1.3 < elapsed < 2.5, elapsed
+    print(f"✓ 4 MB across 4 transfers took {elapsed:.2f}s at 2 MB/s")
+
+    print("\n--- TEST 3: Tightest limit wins ---")
+    limiter.set_host_limit("slow.example", "256K")
+    limiter.set_download_limit("http://slow.example/a", "64K")
+    assert limiter.limit_for("slow.example", "http://slow.example/a") == 64 * 1024
+    assert limiter.limit_for("fast.example") == 2 * 1024 * 1024
+    assert limiter.read_size(1024 * 1024, "slow.example", "http://slow.example/a") == 16 * 1024
+    limiter.set_host_limit("slow.example", 0)
+    assert "slow.example" not in limiter.get_limits()['hosts']
+    print("✓ Per-host and per-download limits apply and can be removed")
+
+    print("\n--- TEST 4: Serving reserve ---")
+    limiter = BandwidthLimiter(link_rate="100M", serving_reserve="30M")
+    assert limiter.get_limits()['effective_global'] == 0
+    with limiter.serving():
+        assert limiter.get_limits()['effective_global'] == 70 * 1024 * 1024
+    assert limiter.get_limits()['effective_global'] == 0
+    print("✓ Downloads give up the reserve only while files are served")
+
+    print("\n--- TEST 5: Limits keyed by download id ---")
+    limiter = BandwidthLimiter()
+    limiter.register_download("playlist", "https://youtube.example/list")
+    limiter.register_download("item1", "https://youtube.example/v1", parent="playlist")
+    limiter.set_download_limit("playlist", "1M")
+    limiter.set_download_limit("item1", "256K")
+    assert limiter.limit_for(url="https://youtube.example/v1") == 256 * 1024
+    limiter.unregister_download("item1", "https://youtube.example/v1")
+    assert limiter.limit_for(url="https://youtube.example/v1") == 0
+    limiter.register_download("item2", "https://youtube.example/v2", parent="playlist")
+    assert limiter.limit_for(url="https://youtube.example/v2") == 1024 * 1024
+    limiter.unregister_download("playlist")
+    assert limiter.get_limits()['downloads'] == {}
+    print("✓ Playlist limits reach their items and are dropped when downloads finish")
+
+    print("\n" + "=" * 60)
+    print("BANDWIDTH LIMITER TEST COMPLETE")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_bandwidth_limiter()
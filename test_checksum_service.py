@@ -0,0 +1,100 @@
+"""
+Test parallel checksums and the stat-keyed cache
+"""
+
+import os
+import shutil
+import hashlib
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import checksum_service
+from checksum_service import ChecksumService
+from utils import FileUtils
+
+
+def test_checksum_service():
+    """Directory hashing, cache reuse and invalidation"""
+
+    print("=" * 60)
+    print("CHECKSUM SERVICE TEST")
+    print("=" * 60)
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        downloads = os.path.join(temp_dir, 'downloads')
+        os.makedirs(os.path.join(downloads, 'sub'))
+        contents = {}
+        for i in range(12):
+            name = os.path.join('sub' if i % 2 else '', f'file{i}.bin')
+            contents[name] = os.urandom(100000 * (i + 1))
+            with open(os.path.join(downloads, name), 'wb') as f:
+                f.write(contents[name])
+        with open(os.path.join(downloads, 'partial.bin.part'), 'wb') as f:
+            f.write(b'incomplete')
+
+        print("\n--- TEST 1: Whole directory in a process pool ---")
+        service = ChecksumService(os.path.join(temp_dir, 'cache.json'), max_workers=4)
+        results = service.checksum_directory(downloads)
+        assert results == {name: hashlib.sha256(data).hexdigest() for name, data in contents.items()}
+        print(f"✓ {len(results)} files hashed, partial files skipped")
+
+        print("\n--- TEST 2: Cache survives restarts and notices changes ---")
+        changed = os.path.join(downloads, 'file0.bin')
+        with open(changed, 'ab') as f:
+            f.write(b'more')
+        reloaded = ChecksumService(os.path.join(temp_dir, 'cache.json'), use_processes=False)
+        hashed = []
+        original_job = checksum_service._hash_job
+        checksum_service._hash_job = lambda path, algorithm: hashed.append(path) or original_job(path, algorithm)
+        try:
+            results = reloaded.checksum_directory(downloads)
+        finally:
+            checksum_service._hash_job = original_job
+        assert hashed == [os.path.abspath(changed)]
+        assert results['file0.bin'] == hashlib.sha256(contents['file0.bin'] + b'more').hexdigest()
+        print("✓ Modified files are rehashed, unchanged ones come from the cache")
+
+        print("\n--- TEST 3: FileUtils.calculate_checksum ---")
+        assert FileUtils.calculate_checksum(changed) == hashlib.md5(contents['file0.bin'] + b'more').hexdigest()
+        assert FileUtils.calculate_checksum(os.path.join(downloads, 'missing.bin')) is None
+        print("✓ Large-buffer checksum matches hashlib")
+
+        print("\n--- TEST 4: Broken process pool falls back to threads ---")
+        class BrokenPool(ProcessPoolExecutor):
+            def submit(self, *args, **kwargs):
+                raise BrokenProcessPool("worker died")
+        original_pool = checksum_service.ProcessPoolExecutor
+        checksum_service.ProcessPoolExecutor = BrokenPool
+        try:
+            fallback = ChecksumService(os.path.join(temp_dir, 'fallback.json'), max_workers=4)
+            results = fallback.checksum_directory(downloads)
+        finally:
+            checksum_service.ProcessPoolExecutor = original_pool
+        assert results == service.checksum_directory(downloads)
+        assert fallback.use_processes is False
+        print("✓ Every file hashed after the pool broke")
+
+        print("\n--- TEST 5: Cache size is bounded ---")
+        bounded = ChecksumService(os.path.join(temp_dir, 'bounded.json'), use_processes=False, max_entries=3)
+        paths = sorted(os.path.join(downloads, name) for name in contents)
+        bounded.checksum_many(paths[:5])
+        bounded.checksum_many(paths[:1])  # Recently used again
+        bounded.checksum_many(paths[5:6])
+        assert list(bounded.cache) == [paths[4], paths[0], paths[5]]
+        os.remove(paths[5])
+        reloaded = ChecksumService(os.path.join(temp_dir, 'bounded.json'), use_processes=False, max_entries=3)
+        assert list(reloaded.cache) == [paths[4], paths[0]]
+        print("✓ Least recently used and deleted files are dropped")
+
+    finally:
+        shutil.rmtree(temp_dir)
+
+    print("\n" + "=" * 60)
+    print("CHECKSUM SERVICE TEST COMPLETE")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_checksum_service()
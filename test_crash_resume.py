@@ -0,0 +1,139 @@
+"""
+Test resuming a preallocated download after the process was killed
+Serves a local file with Range support so no real server is needed
+"""
+
+import os
+import re
+import sys
+import shutil
+import tempfile
+import threading
+import subprocess
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+from download_state_manager import DownloadStateManager
+from download_manager import DownloadManager
+
+
+PAYLOAD = os.urandom(12 * 1024 * 1024 + 321)
+
+# Child process: download until the writer holds unwritten data, checkpoint, then die
+CRASHING_DOWNLOAD = """
+import os, sys
+sys.path.insert(0, {repo!r})
+from download_state_manager import DownloadStateManager
+from download_manager import DownloadManager
+
+dm = DownloadManager(segments=1, state_manager=DownloadStateManager({state_dir!r}))
+
+def progress(info):
+    if info.get('downloaded', 0) >= 6 * 1024 * 1024:
+        dm.state_manager._save_state()
+        os._exit(1)  # No cleanup: buffered bytes never reach the file
+
+dm.download({url!r}, {filepath!r}, progress)
+"""
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Minimal handler that honours single byte ranges"""
+    protocol_version = 'HTTP/1.1'
+
+    def _headers(self):
+        start, end = 0, len(PAYLOAD) - 1
+        status = 200
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else end
+            status = 206
+        self.send_response(status)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(PAYLOAD)}')
+        self.end_headers()
+        return start, end
+
+    def do_HEAD(self):
+        self._headers()
+
+    def do_GET(self):
+        start, end = self._headers()
+        try:
+            self.wfile.write(PAYLOAD[start:end + 1])
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def test_crash_resume():
+    """Kill a download while its write buffer is full, then resume it"""
+
+    print("=" * 60)
+    print("CRASH RESUME TEST")
+    print("=" * 60)
+
+    server = ThreadingServer(('127.0.0.1', 0), RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/payload.bin"
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        state_dir = os.path.join(work_dir, 'state')
+        filepath = os.path.join(work_dir, 'payload.bin')
+
+        print("\n--- TEST 1: Process killed mid-buffer ---")
+        script = CRASHING_DOWNLOAD.format(repo=os.path.dirname(os.path.abspath(__file__)),
+                                          state_dir=state_dir, url=url, filepath=filepath)
+        result = subprocess.run([sys.executable, '-c', script], timeout=60)
+        assert result.returncode == 1
+        state = DownloadStateManager(state_dir)
+        info = state.get_download_info(f"{url}_{filepath}")
+        checkpoint = info['downloaded_size']
+        assert info['preallocated'] and list(state.downloads) == [f"{url}_{filepath}"]
+        assert not os.path.exists(filepath)  # Nothing at the final name until it is complete
+        assert os.path.getsize(filepath + '.part') == len(PAYLOAD)  # Preallocated
+        with open(filepath + '.part', 'rb') as f:
+            assert f.read(checkpoint) == PAYLOAD[:checkpoint]
+        print(f"✓ Checkpoint ({checkpoint} bytes) only covers data that reached the file")
+
+        print("\n--- TEST 2: Resume completes an intact file ---")
+        dm = DownloadManager(segments=1, state_manager=state)
+        assert dm.download(url, filepath)
+        with open(filepath, 'rb') as f:
+            assert f.read() == PAYLOAD
+        print("✓ Resumed file matches the original")
+
+        print("\n--- TEST 3: Full-size .part without a state entry ---")
+        os.remove(filepath)
+        result = subprocess.run([sys.executable, '-c', script], timeout=60)
+        assert result.returncode == 1
+        fresh_state = DownloadStateManager(os.path.join(work_dir, 'other_state'))
+        statuses = []
+        dm = DownloadManager(segments=1, state_manager=fresh_state)
+        assert dm.download(url, filepath, lambda info: statuses.append(info['status']))
+        assert 'Already Complete' not in statuses
+        with open(filepath, 'rb') as f:
+            assert f.read() == PAYLOAD
+        print("✓ Preallocated .part is downloaded again, not reported complete")
+
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir)
+
+    print("\n" + "=" * 60)
+    print("CRASH RESUME TEST COMPLETE")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_crash_resume()
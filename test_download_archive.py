@@ -0,0 +1,102 @@
+"""
+Test the download archive index
+Uses hand-written .info.json files so no network access is needed
+"""
+
+import os
+import json
+import time
+import shutil
+import tempfile
+
+from download_archive import DownloadArchive
+
+
+def test_download_archive():
+    """Seeding from .info.json, offline lookups and stale entries"""
+
+    print("=" * 60)
+    print("DOWNLOAD ARCHIVE TEST")
+    print("=" * 60)
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        destination = os.path.join(temp_dir, 'downloads')
+        os.makedirs(destination)
+        archive_file = os.path.join(temp_dir, 'archive.json')
+
+        # 200 videos as yt-dlp leaves them: media file + info.json sidecar
+        for i in range(200):
+            video_id = f"vid{i:08d}"
+            stem = os.path.join(destination, f"Channel - Video {i}")
+            with open(stem + '.mp4', 'wb') as f:
+                f.write(b'x' * (i + 1))
+            with open(stem + '.info.json', 'w') as f:
+                json.dump({
+                    'id': video_id,
+                    'extractor_key': 'Youtube',
+                    'title': f"Video {i}",
+                    'webpage_url': f"https://www.youtube.com/watch?v={video_id}",
+                    '_filename': stem + '.webm'  # Name before merging - must not be trusted
+                }, f)
+
+        print("\n--- TEST 1: Seed from .info.json files ---")
+        archive = DownloadArchive(archive_file)
+        assert archive.scan(destination) == 200
+        assert archive.scan(destination) == 0  # Unchanged files are not re-read
+        print("✓ 200 existing downloads indexed")
+
+        print("\n--- TEST 2: Lookups need no network ---")
+        reloaded = DownloadArchive(archive_file)
+        start = time.time()
+        hits = [reloaded.lookup(f"https://youtu.be/vid{i:08d}", destination) for i in range(200)]
+        elapsed = time.time() - start
+        assert all(hits)
+        assert hits[5]['path'].endswith('Channel - Video 5.mp4')
+        assert hits[5]['size'] == 6
+        assert reloaded.lookup("https://youtu.be/vid99999999", destination) is None
+        print(f"✓ 200 lookups in {elapsed * 1000:.1f} ms")
+
+        print("\n--- TEST 3: Other destinations and removed files ---")
+        assert reloaded.lookup("https://youtu.be/vid00000001", temp_dir + '_elsewhere') is None
+        os.remove(os.path.join(destination, "Channel - Video 1.mp4"))
+        assert reloaded.lookup("https://youtu.be/vid00000001", destination) is None
+        print("✓ Missing files drop out of the archive")
+
+        print("\n--- TEST 4: Record a new download ---")
+        media = os.path.join(destination, "new.mp4")
+        with open(media, 'wb') as f:
+            f.write(b'new video')
+        entry = reloaded.record({'id': 'newvideo123', 'extractor_key': 'Youtube', 'title': 'New'}, media)
+        assert len(entry['sha256']) == 64
+        assert reloaded.lookup("https://www.youtube.com/watch?v=newvideo123&t=5", destination)
+        print("✓ Recorded downloads are found with their hash")
+
+        print("\n--- TEST 5: Repeated scans only revisit changed folders ---")
+        start = time.time()
+        for _ in range(20):
+            assert reloaded.scan(destination) == 0
+        elapsed = (time.time() - start) / 20
+        assert elapsed < 0.02, elapsed
+        stem = os.path.join(destination, "Channel - Late")
+        with open(stem + '.f137.mp4', 'wb') as f:
+            f.write(b'late')
+        with open(stem + '.info.json', 'w') as f:
+            json.dump({'id': 'latevideo01', 'extractor_key': 'Youtube', 'title': 'Late'}, f)
+        assert reloaded.scan(destination) == 1
+        assert reloaded.lookup("https://youtu.be/latevideo01", destination)['path'].endswith('Late.f137.mp4')
+        os.remove(stem + '.info.json')
+        reloaded.scan(destination)
+        assert stem + '.info.json' not in reloaded.scanned
+        print(f"✓ Unchanged rescan took {elapsed * 1000:.2f} ms; new and removed files are noticed")
+
+    finally:
+        shutil.rmtree(temp_dir)
+
+    print("\n" + "=" * 60)
+    print("DOWNLOAD ARCHIVE TEST COMPLETE")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_download_archive()
@@ -0,0 +1,75 @@
+"""
+Test the bounded download scheduler
+Uses dummy jobs so no network access is needed
+"""
+
+import threading
+import time
+
+from download_scheduler import DownloadScheduler
+
+
+def test_download_scheduler():
+    """Worker limit, priority order, per-host caps and queue positions"""
+    
+    print("=" * 60)
+    print("DOWNLOAD SCHEDULER TEST")
+    print("=" * 60)
+    
+    scheduler = DownloadScheduler(max_workers=2, per_host_limit=1)
+    release = threading.Event()
+    lock = threading.Lock()
+    started = []
+    running = []
+    peak = [0]
+    
+    def job(name):
+        with lock:
+            started.append(name)
+            running.append(name)
+            peak[0] = max(peak[0], len(running))
+        release.wait(5)
+        with lock:
+            running.remove(name)
+    
+    # Two hosts fill both workers; everything else must wait
+    scheduler.submit('a1', job, ('a1',), host='a.com')
+    scheduler.submit('b1', job, ('b1',), host='b.com')
+    time.sleep(0.2)
+    scheduler.submit('a2', job, ('a2',), host='a.com')
+    scheduler.submit('c1', job, ('c1',), priority=0, host='c.com')
+    scheduler.submit('c2', job, ('c2',), priority=5, host='c.com')
+    time.sleep(0.2)
+    
+    print("\n--- TEST 1: Queue positions ---")
+    positions = {job_id: scheduler.get_position(job_id) for job_id in ['a1', 'b1', 'c2', 'a2', 'c1']}
+    print(f"  Positions: {positions}")
+    assert positions['a1'] == 0 and positions['b1'] == 0
+    assert positions['c2'] == 1  # Highest priority is next in line
+    assert positions['a2'] == 2 and positions['c1'] == 3
+    assert scheduler.get_position('unknown') is None
+    print("✓ Running jobs report 0, queued jobs ordered by priority")
+    
+    print("\n--- TEST 2: Cancel a queued job ---")
+    assert scheduler.cancel('c1') is True
+    assert scheduler.cancel('a1') is False  # Already running
+    print("✓ Only queued jobs can be cancelled")
+    
+    release.set()
+    scheduler.shutdown(wait=True)
+    
+    print("\n--- TEST 3: Limits held ---")
+    print(f"  Start order: {started}, peak concurrency: {peak[0]}")
+    assert peak[0] <= 2
+    assert started[:2] == ['a1', 'b1'] or started[:2] == ['b1', 'a1']
+    assert started.index('c2') < started.index('a2')
+    assert 'c1' not in started
+    print("✓ Never more than 2 workers, priority respected")
+    
+    print("\n" + "=" * 60)
+    print("DOWNLOAD SCHEDULER TEST COMPLETE")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_download_scheduler()
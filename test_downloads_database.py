@@ -0,0 +1,227 @@
+"""
+Test the SQLite storage engine for the downloads database
+Checks API parity with the JSON engine and the automatic JSON import
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from downloads_database import DownloadsDatabase, SQLiteDownloadsDatabase, DatabaseWriter
+
+
+def test_sqlite_database():
+    """SQLite engine behaves like the JSON engine"""
+    
+    print("=" * 60)
+    print("SQLITE DOWNLOADS DATABASE TEST")
+    print("=" * 60)
+    
+    work_dir = tempfile.mkdtemp()
+    json_file = os.path.join(work_dir, "downloads_database.json")
+    db_file = os.path.join(work_dir, "downloads_database.db")
+    
+    try:
+        # Seed a legacy JSON database
+        print("\n--- TEST 1: Import existing JSON database ---")
+        legacy = DownloadsDatabase(json_file)
+        legacy.add_download("dl_1", "http://example.com/a.zip", "a.zip", work_dir, "Direct Download")
+        legacy.add_download("dl_2", "http://example.com/b.zip", "b.zip", work_dir, "Direct Download")
+        legacy.update_download("dl_1", status='completed', downloaded=100, total=100)
+        
+        db = SQLiteDownloadsDatabase(db_file, json_file=json_file)
+        assert db.get_download("dl_1")['status'] == 'completed'
+        assert len(db.get_all_downloads()) == 2
+        print("✓ Imported 2 entries from JSON")
+        
+        # Re-opening does not duplicate or overwrite newer rows
+        db.update_download("dl_2", status='downloading', downloaded=10, total=50)
+        db.close()
+        db = SQLiteDownloadsDatabase(db_file, json_file=json_file)
+        assert db.get_download("dl_2")['status'] == 'downloading'
+        print("✓ Second open skipped the already imported JSON")
+        
+        # A later write to the JSON file must not roll SQLite rows back
+        legacy.update_download("dl_1", status='failed')
+        os.utime(json_file, (os.path.getatime(json_file), os.path.getmtime(json_file) + 10))
+        db.close()
+        db = SQLiteDownloadsDatabase(db_file, json_file=json_file)
+        assert db.get_download("dl_1")['status'] == 'completed'
+        assert db.get_download("dl_2")['status'] == 'downloading'
+        print("✓ Changed JSON file is not imported again")
+        
+        print("\n--- TEST 2: Queries and statistics ---")
+        db.add_download("dl_3", "http://example.com/c.zip", "c.zip", work_dir, "Direct Download")
+        newest_first = [d['id'] for d in db.get_all_downloads()]
+        assert newest_first[0] == "dl_3"
+        assert [d['id'] for d in db.get_downloads_by_status('queued')] == ["dl_3"]
+        
+        stats = db.get_statistics()
+        print(f"  Stats: {stats}")
+        assert stats['total'] == 3
+        assert stats['completed'] == 1
+        assert stats['downloading'] == 1
+        assert stats['queued'] == 1
+        assert stats['total_downloaded'] == 110
+        assert stats['total_size'] == 150
+        print("✓ Ordering, status filter and aggregate stats match")
+        
+        print("\n--- TEST 3: Update helpers and delete ---")
+        db.update_download("dl_3", progress=100)
+        entry = db.get_download("dl_3")
+        assert entry['status'] == 'completed' and entry['completed_at']
+        assert db.update_download("missing", status='failed') is False
+        assert db.delete_download("dl_3") is True
+        assert db.get_download("dl_3") is None
+        print("✓ progress=100 completes, unknown ids rejected, delete works")
+        
+        db.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    print("\n" + "=" * 60)
+    print("SQLITE DOWNLOADS DATABASE TEST COMPLETE")
+    print("=" * 60)
+
+
+def test_delta_sync():
+    """Revisions, tombstones and cursor pages on both engines"""
+    
+    print("=" * 60)
+    print("DELTA SYNC TEST")
+    print("=" * 60)
+    
+    work_dir = tempfile.mkdtemp()
+    try:
+        engines = {
+            'json': lambda: DownloadsDatabase(os.path.join(work_dir, "delta.json")),
+            'sqlite': lambda: SQLiteDownloadsDatabase(os.path.join(work_dir, "delta.db"), json_file=None)
+        }
+        for name, open_db in engines.items():
+            print(f"\n--- {name} engine ---")
+            db = open_db()
+            for i in range(25):
+                db.add_download(f"dl_{i:02d}", f"http://example.com/{i}", f"{i}.zip", work_dir, "Direct Download")
+            
+            # Cursor pages cover every row exactly once, newest first
+            seen, cursor = [], None
+            while True:
+                rows, cursor = db.list_downloads(limit=10, cursor=cursor)
+                seen += [d['id'] for d in rows]
+                if not cursor:
+                    break
+            assert seen == [d['id'] for d in db.get_all_downloads()]
+            assert len(set(seen)) == 25
+            print("✓ 3 cursor pages returned all 25 rows in order")
+            
+            # Only changes after the client's revision come back
+            since = db.get_revision()
+            db.update_download("dl_03", status='downloading', downloaded=5)
+            db.update_download("dl_07", status='completed')
+            db.delete_download("dl_10")
+            changes = db.get_changes(since)
+            assert [d['id'] for d in changes['downloads']] == ["dl_03", "dl_07"]
+            assert changes['deleted'] == ["dl_10"]
+            assert changes['revision'] == db.get_revision() and not changes['reset']
+            assert db.get_changes(changes['revision'])['downloads'] == []
+            print("✓ since= returns 2 changed rows and 1 tombstone")
+            
+            # Change feed pages continue from the returned revision
+            first = db.get_changes(since, limit=2)
+            assert first['has_more'] and len(first['downloads']) == 2
+            rest = db.get_changes(first['revision'], limit=2)
+            assert rest['deleted'] == ["dl_10"] and not rest['has_more']
+            print("✓ Paged change feed resumes from its revision")
+            
+            # State survives a restart
+            revision = db.get_revision()
+            if hasattr(db, 'close'):
+                db.close()
+            db = open_db()
+            assert db.get_revision() == revision
+            assert db.get_changes(since)['deleted'] == ["dl_10"]
+            
+            # Clearing everything forces clients to resync
+            db.clear_downloads()
+            assert db.get_changes(since)['reset'] is True
+            print("✓ Revision and tombstones persist; clear forces a reset")
+            if hasattr(db, 'close'):
+                db.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    print("\n" + "=" * 60)
+    print("DELTA SYNC TEST COMPLETE")
+    print("=" * 60)
+
+
+def test_database_writer():
+    """Queued writes are merged and applied off the caller's thread"""
+    
+    print("=" * 60)
+    print("DATABASE WRITER TEST")
+    print("=" * 60)
+    
+    work_dir = tempfile.mkdtemp()
+    try:
+        db = DownloadsDatabase(os.path.join(work_dir, "downloads.json"))
+        saves = []
+        save_database = db._save_database
+        db._save_database = lambda: saves.append(1) or save_database()
+        writer = DatabaseWriter(db, interval=0.2, max_pending=8)
+        
+        for i in range(5):
+            writer.add(f"dl_{i}", f"https://example.com/{i}", f"file{i}.bin", work_dir, "Direct")
+        for step in range(1, 101):
+            for i in range(5):
+                writer.update(f"dl_{i}", progress_percent=step, speed=f"{step} KB/s")
+        writer.delete("dl_4")
+        assert saves == []  # Nothing written on the caller's thread
+        
+        writer.close()
+        assert writer.pending_count() == 0
+        assert len(saves) <= 6  # 4 adds + 1 batch of updates + 1 delete
+        assert db.get_download("dl_2")['progress_percent'] == 100
+        assert db.get_download("dl_4") is None
+        reloaded = DownloadsDatabase(os.path.join(work_dir, "downloads.json"))
+        assert reloaded.get_download("dl_0")['speed'] == "100 KB/s"
+        print(f"✓ 500 progress updates persisted with {len(saves)} file writes")
+        
+        print("\n--- Failed writes are retried ---")
+        db = SQLiteDownloadsDatabase(os.path.join(work_dir, "retry.db"), json_file=None)
+        db.add_download("dl_b", "https://example.com/b", "b.bin", work_dir, "Direct")
+        failures = {'add_download': 1, 'update_many': 1}
+        for name in failures:
+            def failing(*args, _name=name, _original=getattr(db, name), **kwargs):
+                if failures[_name]:
+                    failures[_name] -= 1
+                    raise sqlite3.OperationalError("database is locked")
+                return _original(*args, **kwargs)
+            setattr(db, name, failing)
+        writer = DatabaseWriter(db, interval=10)
+        writer.add("dl_a", "https://example.com/a", "a.bin", work_dir, "Direct")
+        writer.update("dl_a", progress=10)
+        writer.update("dl_b", progress=20)
+        writer.flush()
+        assert db.get_download("dl_b")['progress'] == 20  # Written on its own after update_many failed
+        assert db.get_download("dl_a") is None
+        assert writer.pending_count() == 1  # The failed add went back in the queue
+        writer.update("dl_a", progress=15)
+        writer.flush()
+        assert db.get_download("dl_a")['progress'] == 15
+        writer.close()
+        db.close()
+        print("✓ Entries whose write failed were re-queued and written")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    print("\n" + "=" * 60)
+    print("DATABASE WRITER TEST COMPLETE")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_sqlite_database()
+    test_delta_sync()
+    test_database_writer()
@@ -0,0 +1,85 @@
+"""
+Test the progress event bus behind /events
+"""
+
+import threading
+import time
+
+from event_bus import EventBus
+
+
+def test_event_bus():
+    """Coalescing, rate bound and changed-fields-only deltas"""
+
+    print("=" * 60)
+    print("EVENT BUS TEST")
+    print("=" * 60)
+
+    bus = EventBus(max_rate=5)
+    subscription = bus.subscribe()
+
+    print("\n--- TEST 1: Bursts are coalesced and rate bounded ---")
+
+    def publish_burst():
+        for i in range(500):
+            bus.publish('a', progress_percent=i / 5, speed='1 MB/s', status='Downloading')
+            bus.publish('b', progress_percent=i / 10, speed='2 MB/s', status='Downloading')
+            time.sleep(0.002)
+
+    publisher = threading.Thread(target=publish_burst)
+    start = time.time()
+    publisher.start()
+    batches = []
+    while publisher.is_alive() or not batches:
+        batch = subscription.get(timeout=1)
+        if batch:
+            batches.append((time.time() - start, batch))
+    publisher.join()
+    while True:
+        batch = subscription.get(timeout=0.5)
+        if not batch:
+            break
+        batches.append((time.time() - start, batch))
+
+    elapsed = batches[-1][0]
+    print(f"  {len(batches)} batches for 1000 updates in {elapsed:.2f}s")
+    assert len(batches) <= elapsed * 5 + 2
+    assert all(len(batch) <= 2 for _, batch in batches)
+    last = {delta['id']: delta for _, batch in batches for delta in batch}
+    assert last['a']['progress_percent'] == 499 / 5
+    print("✓ At most one delta per download per batch, latest value wins")
+
+    print("\n--- TEST 2: Only changed fields are resent ---")
+    bus.publish('a', progress_percent=100.0, speed='1 MB/s', status='Downloading')
+    batch = subscription.get(timeout=1)
+    assert batch == [{'id': 'a', 'progress_percent': 100.0}]
+    bus.publish('a', status='Downloading')
+    assert subscription.get(timeout=0.5) == []
+    print("✓ Unchanged fields and no-op updates are dropped")
+
+    print("\n--- TEST 3: Finished downloads are forgotten ---")
+    bus.publish('a', status='completed')
+    bus.publish('b', status='deleted')
+    assert subscription.get(timeout=1) == [{'id': 'a', 'status': 'completed'}, {'id': 'b', 'status': 'deleted'}]
+    assert subscription._sent == {}
+    print("✓ Last-sent state is dropped on completion and deletion")
+
+    print("\n--- TEST 4: Invalid rates keep the default limit ---")
+    for rate in (-1, 0.0, float('nan'), float('inf'), float('-inf')):
+        other = bus.subscribe(max_rate=rate)
+        assert other._min_interval == 1.0 / 5
+        other.close()
+    print("✓ Zero, negative and non-finite rates do not disable rate limiting")
+
+    print("\n--- TEST 5: Unsubscribe ---")
+    subscription.close()
+    assert bus.subscriber_count() == 0
+    print("✓ Closed subscriptions stop receiving events")
+
+    print("\n" + "=" * 60)
+    print("EVENT BUS TEST COMPLETE")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_event_bus()
@@ -0,0 +1,82 @@
+"""
+Test the in-memory file index behind GET /files
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+from file_index import FileIndex
+
+
+def wait_for(condition, timeout=5.0):
+    """Poll until condition() is true (filesystem events are asynchronous)"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return condition()
+
+
+def test_file_index():
+    """Initial build, queries from memory and live updates"""
+    
+    print("=" * 60)
+    print("FILE INDEX TEST")
+    print("=" * 60)
+    
+    root = tempfile.mkdtemp()
+    index = None
+    try:
+        os.makedirs(os.path.join(root, 'models', 'bert'))
+        for i in range(50):
+            with open(os.path.join(root, f"video_{i:02d}.mp4"), 'wb') as f:
+                f.write(b'x' * i)
+        with open(os.path.join(root, 'models', 'bert', 'config.json'), 'w') as f:
+            f.write('{}')
+        with open(os.path.join(root, 'pending.mp4.part'), 'wb') as f:
+            f.write(b'partial')
+        
+        print("\n--- TEST 1: Initial build ---")
+        index = FileIndex(root).start()
+        assert len(index) == 51
+        print(f"✓ Indexed {len(index)} files (partial files skipped), watching: {index.is_watching()}")
+        
+        print("\n--- TEST 2: Sort, search and pages ---")
+        total, page = index.query(sort='size', descending=True, offset=0, limit=10)
+        assert total == 51 and len(page) == 10
+        assert page[0]['name'] == 'video_49.mp4'
+        total, page = index.query(search='VIDEO_0', sort='name', descending=False)
+        assert total == 10 and page[0]['name'] == 'video_00.mp4'
+        total, page = index.query(search='config')
+        assert page[0]['path'] == 'models/bert/config.json'
+        print("✓ Size/name ordering, case-insensitive search and nested paths")
+        
+        print("\n--- TEST 3: Changes show up without a rescan ---")
+        os.rename(os.path.join(root, 'pending.mp4.part'), os.path.join(root, 'pending.mp4'))
+        index.update(os.path.join(root, 'pending.mp4'))  # What a finished download reports
+        os.remove(os.path.join(root, 'video_00.mp4'))
+        if not index.is_watching():
+            index.remove(os.path.join(root, 'video_00.mp4'))
+        assert wait_for(lambda: index.query(search='video_00')[0] == 0)
+        assert index.query(search='pending')[0] == 1
+        shutil.rmtree(os.path.join(root, 'models'))
+        if not index.is_watching():
+            index.remove(os.path.join(root, 'models'))
+        assert wait_for(lambda: index.query(search='config')[0] == 0)
+        print("✓ Finished, deleted and removed-directory files tracked")
+        
+    finally:
+        if index:
+            index.stop()
+        shutil.rmtree(root, ignore_errors=True)
+    
+    print("\n" + "=" * 60)
+    print("FILE INDEX TEST COMPLETE")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_file_index()
@@ -0,0 +1,55 @@
+"""
+Test the buffered, preallocating download writer
+"""
+
+import os
+import shutil
+import tempfile
+
+from file_writer import FileWriter
+
+
+def test_file_writer():
+    """Preallocation, resume offsets and trimming of unwritten space"""
+
+    print("=" * 60)
+    print("FILE WRITER TEST")
+    print("=" * 60)
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_dir, 'file.bin')
+        data = os.urandom(3 * 1024 * 1024 + 123)
+
+        print("\n--- TEST 1: Preallocated write ---")
+        with FileWriter(path, total_size=len(data), buffer_size=1024 * 1024) as writer:
+            assert os.path.getsize(path) == len(data)  # Full size reserved up front
+            for start in range(0, len(data), 100000):
+                writer.write(data[start:start + 100000])
+        with open(path, 'rb') as f:
+            assert f.read() == data
+        print("✓ Data written through the reusable buffer matches")
+
+        print("\n--- TEST 2: Interrupted transfer is trimmed ---")
+        with FileWriter(path, total_size=len(data), sync_every=1024 * 1024) as writer:
+            writer.write(data[:1000000])
+        assert os.path.getsize(path) == 1000000
+        print("✓ Unwritten preallocated space is released on close")
+
+        print("\n--- TEST 3: Resume at an offset ---")
+        with FileWriter(path, offset=1000000, total_size=len(data)) as writer:
+            writer.write(data[1000000:])
+        with open(path, 'rb') as f:
+            assert f.read() == data
+        print("✓ Existing bytes are kept and the rest is appended")
+
+    finally:
+        shutil.rmtree(temp_dir)
+
+    print("\n" + "=" * 60)
+    print("FILE WRITER TEST COMPLETE")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_file_writer()
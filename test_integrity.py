@@ -0,0 +1,66 @@
+"""
+Test streaming digests and expected-digest discovery
+"""
+
+import os
+import base64
+import hashlib
+import tempfile
+
+from integrity import StreamHasher, IntegrityError, parse_checksum, expected_from_headers
+
+
+def test_integrity():
+    """One-pass hashing, resume prefixes and header parsing"""
+
+    print("=" * 60)
+    print("INTEGRITY TEST")
+    print("=" * 60)
+
+    data = os.urandom(3 * 1024 * 1024 + 7)
+    sha256 = hashlib.sha256(data).hexdigest()
+
+    print("\n--- TEST 1: Several digests in one pass ---")
+    hasher = StreamHasher(['sha256', 'md5', 'git-sha1'], size=len(data))
+    for start in range(0, len(data), 65536):
+        hasher.update(data[start:start + 65536])
+    digests = hasher.hexdigests()
+    assert digests['sha256'] == sha256
+    assert digests['md5'] == hashlib.md5(data).hexdigest()
+    assert digests['git-sha1'] == hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+    print("✓ sha256, md5 and git blob sha1 match hashlib")
+
+    print("\n--- TEST 2: Resume re-reads only the kept prefix ---")
+    with tempfile.NamedTemporaryFile(delete=False) as f:
+        f.write(data[:2000000])
+    try:
+        hasher = StreamHasher(['sha256'])
+        hasher.update_from_file(f.name, 2000000)
+        hasher.update(data[2000000:])
+        assert hasher.verify('sha256', sha256) == sha256
+        try:
+            hasher.verify('sha256', '0' * 64)
+            assert False, "mismatch not detected"
+        except IntegrityError:
+            pass
+    finally:
+        os.remove(f.name)
+    print("✓ Resumed hash equals the full-file hash; mismatches raise")
+
+    print("\n--- TEST 3: Expected digests ---")
+    assert parse_checksum(f"SHA256:{sha256.upper()}") == ('sha256', sha256)
+    assert parse_checksum('d41d8cd98f00b204e9800998ecf8427e') == ('md5', 'd41d8cd98f00b204e9800998ecf8427e')
+    assert expected_from_headers({'X-Linked-Etag': f'"{sha256}"'}) == ('sha256', sha256, True)
+    digest = base64.b64encode(bytes.fromhex(sha256)).decode()
+    assert expected_from_headers({'Repr-Digest': f'sha-256=:{digest}:'}) == ('sha256', sha256, True)
+    assert expected_from_headers({'ETag': '"d41d8cd98f00b204e9800998ecf8427e"'})[2] is False
+    assert expected_from_headers({'ETag': '"5f3a-1234"'}) is None
+    print("✓ User checksums, X-Linked-Etag, Repr-Digest and MD5 ETags recognized")
+
+    print("\n" + "=" * 60)
+    print("INTEGRITY TEST COMPLETE")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_integrity()
@@ -0,0 +1,53 @@
+"""
+Test coalescing of UI progress updates
+"""
+
+import threading
+
+from progress_aggregator import ProgressAggregator
+
+
+def test_progress_aggregator():
+    """Many callbacks from many threads become one update per download per frame"""
+
+    print("=" * 60)
+    print("PROGRESS AGGREGATOR TEST")
+    print("=" * 60)
+
+    applied = []
+    aggregator = ProgressAggregator(lambda download_id, info: applied.append((download_id, info)))
+
+    print("\n--- TEST 1: Updates are merged per download ---")
+
+    def worker(download_id):
+        aggregator.submit(download_id, {'filename': f'{download_id}.bin', 'status': 'Downloading'})
+        for i in range(1, 1001):
+            aggregator.submit(download_id, {'progress': f'{i / 10:.1f}%', 'speed': f'{i} KB/s'})
+
+    threads = [threading.Thread(target=worker, args=(f'dl{n}',)) for n in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert aggregator.pending_count() == 20
+    assert aggregator.flush() == 20
+    assert len(applied) == 20
+    info = dict(applied)['dl7']
+    assert info == {'filename': 'dl7.bin', 'status': 'Downloading', 'progress': '100.0%', 'speed': '1000 KB/s'}
+    print("✓ 20,020 callbacks applied as 20 UI updates with the latest values")
+
+    print("\n--- TEST 2: Empty frames and finished downloads ---")
+    assert aggregator.flush() == 0
+    aggregator.submit('dl1', {'progress': '99.9%'})
+    aggregator.discard('dl1')
+    assert aggregator.flush() == 0
+    print("✓ Nothing is redrawn when nothing changed or the download finished")
+
+    print("\n" + "=" * 60)
+    print("PROGRESS AGGREGATOR TEST COMPLETE")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_progress_aggregator()
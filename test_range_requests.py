@@ -0,0 +1,129 @@
+"""
+Test Range request handling of the file server
+Covers parse_range_header, send_file_with_range and If-Range validation
+"""
+
+import os
+import re
+import shutil
+import tempfile
+
+
+PAYLOAD = os.urandom(100000)
+
+
+def _load_api_server(work_dir):
+    """Import api_server with its database and config inside work_dir"""
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        import api_server
+    finally:
+        os.chdir(cwd)
+    return api_server
+
+
+def _multipart_parts(response):
+    """Split a multipart/byteranges body into (Content-Range, data) pairs"""
+    boundary = response.headers['Content-Type'].split('boundary=')[1]
+    parts = []
+    for chunk in response.data.split(f"--{boundary}".encode())[1:-1]:
+        head, _, data = chunk.partition(b"\r\n\r\n")
+        content_range = re.search(rb"Content-Range: (\S+ \S+)", head).group(1).decode()
+        parts.append((content_range, data[:-2]))  # Drop the CRLF before the next boundary
+    return parts
+
+
+def test_range_requests():
+    """Suffix, open-ended, unsatisfiable and multi-range requests, If-Range"""
+
+    print("=" * 60)
+    print("RANGE REQUEST TEST")
+    print("=" * 60)
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        api_server = _load_api_server(work_dir)
+        size = len(PAYLOAD)
+
+        print("\n--- TEST 1: Parsing Range headers ---")
+        parse = api_server.parse_range_header
+        assert parse("bytes=-100", size) == [(size - 100, size - 1)]
+        assert parse("bytes=-200000", size) == [(0, size - 1)]  # Suffix longer than the file
+        assert parse("bytes=99000-", size) == [(99000, size - 1)]
+        assert parse("bytes=0-99,200-299", size) == [(0, 99), (200, 299)]
+        assert parse("bytes=90000-200000", size) == [(90000, size - 1)]  # End clamped
+        assert parse(f"bytes={size}-", size) == []
+        assert parse("bytes=-0", size) == []
+        assert parse("bytes=5-1", size) is None
+        assert parse("items=0-1", size) is None
+        assert parse("bytes=abc", size) is None
+        print("✓ Suffix, open-ended, multi and unsatisfiable ranges parsed")
+        assert parse("bytes=0-,0-,0-", size) == [(0, size - 1)]
+        assert parse("bytes=20-29,0-9,5-19,-10", size) == [(0, 29), (size - 10, size - 1)]
+        assert parse("bytes=" + ",".join(f"{i * 10}-{i * 10 + 1}" for i in range(100)), size) is None
+        print("✓ Overlapping ranges merged, too many ranges ignored")
+
+        # Serve a real file through the /files route
+        api_server.DOWNLOAD_DIR = work_dir
+        with open(os.path.join(work_dir, "video.bin"), 'wb') as f:
+            f.write(PAYLOAD)
+        client = api_server.app.test_client()
+
+        print("\n--- TEST 2: Single ranges ---")
+        response = client.get("/files/video.bin", headers={'Range': 'bytes=-100'})
+        assert response.status_code == 206
+        assert response.headers['Content-Range'] == f"bytes {size - 100}-{size - 1}/{size}"
+        assert response.data == PAYLOAD[-100:]
+        response = client.get("/files/video.bin", headers={'Range': 'bytes=99000-'})
+        assert response.status_code == 206
+        assert response.headers['Content-Range'] == f"bytes 99000-{size - 1}/{size}"
+        assert int(response.headers['Content-Length']) == size - 99000
+        assert response.data == PAYLOAD[99000:]
+        print("✓ Suffix and open-ended ranges return 206 with the right bytes")
+
+        print("\n--- TEST 3: Unsatisfiable range ---")
+        response = client.get("/files/video.bin", headers={'Range': f'bytes={size}-'})
+        assert response.status_code == 416
+        assert response.headers['Content-Range'] == f"bytes */{size}"
+        print("✓ 416 with Content-Range: bytes */size")
+
+        print("\n--- TEST 4: Multiple ranges ---")
+        response = client.get("/files/video.bin", headers={'Range': 'bytes=0-9,-10'})
+        assert response.status_code == 206
+        assert response.headers['Content-Type'].startswith('multipart/byteranges')
+        assert int(response.headers['Content-Length']) == len(response.data)
+        assert _multipart_parts(response) == [
+            (f"bytes 0-9/{size}", PAYLOAD[:10]),
+            (f"bytes {size - 10}-{size - 1}/{size}", PAYLOAD[-10:]),
+        ]
+        print("✓ multipart/byteranges body with one part per range")
+        response = client.get("/files/video.bin", headers={'Range': 'bytes=' + ','.join(['0-'] * 8)})
+        assert response.status_code == 206 and response.data == PAYLOAD
+        response = client.get("/files/video.bin", headers={'Range': 'bytes=' + ','.join(['0-'] * 50)})
+        assert response.status_code == 200 and response.data == PAYLOAD
+        print("✓ Repeated ranges send the file once")
+
+        print("\n--- TEST 5: If-Range ---")
+        etag = client.head("/files/video.bin").headers['ETag']
+        response = client.get("/files/video.bin", headers={'Range': 'bytes=0-9', 'If-Range': etag})
+        assert response.status_code == 206 and response.data == PAYLOAD[:10]
+        response = client.get("/files/video.bin", headers={'Range': 'bytes=0-9', 'If-Range': '"stale-etag"'})
+        assert response.status_code == 200 and response.data == PAYLOAD
+        response = client.get("/files/video.bin", headers={'Range': 'bytes=0-9', 'If-Range': f"W/{etag}"})
+        assert response.status_code == 200
+        stat = os.stat(os.path.join(work_dir, "video.bin"))
+        assert api_server._if_range_matches(stat, None)
+        assert not api_server._if_range_matches(stat, '"stale-etag"')
+        print("✓ Matching ETag gets the range, stale or weak ones get the whole file")
+
+    finally:
+        shutil.rmtree(work_dir)
+
+    print("\n" + "=" * 60)
+    print("RANGE REQUEST TEST COMPLETE")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_range_requests()
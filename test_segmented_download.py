@@ -0,0 +1,172 @@
+"""
+Test segmented (multi-connection) downloads
+Serves a local file with Range support so no real server is needed
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+from download_state_manager import DownloadStateManager
+from segmented_downloader import SegmentedDownloader
+
+
+PAYLOAD = os.urandom(3 * 1024 * 1024 + 123)
+DROP_AFTER = {'bytes': None}  # Close each response after this many bytes
+REMOTE = {'payload': PAYLOAD, 'etag': '"v1"'}  # The file the server currently has
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Minimal handler that honours single byte ranges"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        payload = REMOTE['payload']
+        start, end = 0, len(payload) - 1
+        status = 200
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if_range = self.headers.get('If-Range')
+        if match and (not if_range or if_range == REMOTE['etag']):
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else end
+            status = 206
+        self.send_response(status)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', REMOTE['etag'])
+        self.send_header('Content-Length', str(end - start + 1))
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(payload)}')
+        self.end_headers()
+        if DROP_AFTER['bytes']:
+            self.wfile.write(payload[start:min(end + 1, start + DROP_AFTER['bytes'])])
+            self.close_connection = True
+            return
+        try:
+            self.wfile.write(payload[start:end + 1])
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def half_done(sm, downloader, download_id, filepath, validator=None):
+    """Leave a .part with every segment half fetched from the current remote file"""
+    payload = REMOTE['payload']
+    segments = downloader.plan_segments(len(payload))
+    with open(filepath + '.part', 'wb') as f:
+        f.truncate(len(payload))
+        for segment in segments:
+            segment['downloaded'] = (segment['end'] - segment['start'] + 1) // 2
+            f.seek(segment['start'])
+            f.write(payload[segment['start']:segment['start'] + segment['downloaded']])
+    sm.update_segments(download_id, segments, sum(s['downloaded'] for s in segments),
+                       extra={'validator': validator})
+
+
+def test_segmented_download():
+    """Download in segments, then resume a half-finished segment"""
+
+    print("=" * 60)
+    print("SEGMENTED DOWNLOAD TEST")
+    print("=" * 60)
+
+    server = ThreadingServer(('127.0.0.1', 0), RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/payload.bin"
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        sm = DownloadStateManager(state_dir=work_dir)
+        downloader = SegmentedDownloader(sm, num_segments=4, chunk_size=256 * 1024)
+        filepath = os.path.join(work_dir, 'payload.bin')
+
+        # Test 1: Fresh segmented download
+        print("\n--- TEST 1: Fresh download over 4 segments ---")
+        download_id = sm.start_download(url, filepath, len(PAYLOAD))
+        assert downloader.download(url, filepath, len(PAYLOAD), download_id)
+        with open(filepath, 'rb') as f:
+            assert f.read() == PAYLOAD
+        segments = sm.get_download_info(download_id)['segments']
+        print(f"✓ {len(segments)} segments completed, file matches source")
+        assert all(s['status'] == 'completed' for s in segments)
+
+        # Test 2: Resume with one segment only half done
+        print("\n--- TEST 2: Resume a single dropped segment ---")
+        os.remove(filepath)
+        download_id = sm.start_download(url, filepath, len(PAYLOAD))
+        segments = downloader.plan_segments(len(PAYLOAD))
+        with open(filepath + '.part', 'wb') as f:
+            f.truncate(len(PAYLOAD))
+            for segment in segments:
+                if segment['index'] == 2:
+                    segment['downloaded'] = (segment['end'] - segment['start'] + 1) // 2
+                    segment['status'] = 'failed'
+                else:
+                    segment['downloaded'] = segment['end'] - segment['start'] + 1
+                    segment['status'] = 'completed'
+                f.seek(segment['start'])
+                f.write(PAYLOAD[segment['start']:segment['start'] + segment['downloaded']])
+        sm.update_segments(download_id, segments, sum(s['downloaded'] for s in segments))
+
+        assert downloader.download(url, filepath, len(PAYLOAD), download_id)
+        with open(filepath, 'rb') as f:
+            assert f.read() == PAYLOAD
+        print("✓ Only the dropped segment was refetched and file matches source")
+
+        # Test 3: Connections that keep dropping but make progress each time
+        print("\n--- TEST 3: Retries reset after progress ---")
+        os.remove(filepath)
+        DROP_AFTER['bytes'] = 600 * 1024
+        flaky = SegmentedDownloader(sm, num_segments=2, chunk_size=256 * 1024, max_retries=1)
+        download_id = sm.start_download(url + '?flaky', filepath, len(PAYLOAD))
+        try:
+            assert flaky.download(url, filepath, len(PAYLOAD), download_id)
+        finally:
+            DROP_AFTER['bytes'] = None
+        with open(filepath, 'rb') as f:
+            assert f.read() == PAYLOAD
+        print("✓ Segments dropped 2 times each with max_retries=1 still completed")
+
+        # Test 4: The remote file is replaced by another one of the same size
+        print("\n--- TEST 4: Resume checks the file's validator ---")
+        os.remove(filepath)
+        half_done(sm, downloader, download_id, filepath, validator='"v1"')
+        REMOTE.update(payload=os.urandom(len(PAYLOAD)), etag='"v2"')
+        try:
+            assert downloader.download(url, filepath, len(PAYLOAD), download_id, validator='"v2"')
+            with open(filepath, 'rb') as f:
+                assert f.read() == REMOTE['payload']
+            print("✓ Saved segments of the old file were re-planned")
+
+            os.remove(filepath)
+            half_done(sm, downloader, download_id, filepath, validator='"v2"')
+            REMOTE.update(payload=os.urandom(len(PAYLOAD)), etag='"v3"')  # Changes after the probe
+            assert not downloader.download(url, filepath, len(PAYLOAD), download_id, validator='"v2"')
+            assert not os.path.exists(filepath + '.part')
+            assert sm.get_download_info(download_id)['segments'] == []
+            print("✓ If-Range mismatch discards the stale segments")
+        finally:
+            REMOTE.update(payload=PAYLOAD, etag='"v1"')
+
+        sm.close()
+
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print("SEGMENTED DOWNLOAD TEST COMPLETE")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_segmented_download()
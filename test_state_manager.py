@@ -5,6 +5,10 @@ Tests state persistence without needing a real server
 
 import os
 import sys
+import json
+import time
+import shutil
+import tempfile
 from download_state_manager import DownloadStateManager
 
 def test_state_manager():
@@ -109,5 +113,69 @@ def test_state_manager():
     print(f"\nState file location: {sm.state_file}")
     print("All download states are persisted and will survive app restart!")
 
+def test_debounced_persistence():
+    """Progress stays in memory between checkpoints; completion always flushes"""
+    
+    print("=" * 60)
+    print("DEBOUNCED PERSISTENCE TEST")
+    print("=" * 60)
+    
+    state_dir = tempfile.mkdtemp()
+    try:
+        sm = DownloadStateManager(state_dir=state_dir, flush_interval=60, flush_bytes=10 * 1024 * 1024)
+        download_id = sm.start_download("http://example.com/a.bin", os.path.join(state_dir, "a.bin"), 50 * 1024 * 1024)
+        
+        def on_disk():
+            with open(sm.state_file) as f:
+                return json.load(f)[download_id]
+        
+        # Small updates only touch memory
+        for i in range(1, 5):
+            sm.update_download(download_id, i * 1024 * 1024, i)
+        assert sm.get_download_info(download_id)['downloaded_size'] == 4 * 1024 * 1024
+        assert on_disk()['downloaded_size'] == 0
+        print("✓ 4 x 1MB updates kept in memory")
+        
+        # Crossing the byte threshold writes a checkpoint
+        sm.update_download(download_id, 12 * 1024 * 1024, 12)
+        assert on_disk()['downloaded_size'] == 12 * 1024 * 1024
+        print("✓ Byte threshold triggered a checkpoint")
+        
+        # Explicit flush and completion are written straight away
+        sm.update_download(download_id, 13 * 1024 * 1024, 13)
+        sm.flush()
+        assert on_disk()['downloaded_size'] == 13 * 1024 * 1024
+        sm.complete_download(download_id)
+        assert on_disk()['status'] == 'completed'
+        print("✓ flush() and complete_download() persisted immediately")
+        
+        # Stalled downloads still reach disk after the interval
+        sm2 = DownloadStateManager(state_dir=state_dir, flush_interval=0.2)
+        sm2.update_download(download_id, 14 * 1024 * 1024, 14)
+        time.sleep(0.5)
+        assert on_disk()['downloaded_size'] == 14 * 1024 * 1024
+        print("✓ Flush timer wrote pending progress")
+        
+        leftovers = [f for f in os.listdir(state_dir) if f.endswith('.tmp')]
+        assert not leftovers
+        print("✓ No temp files left behind by atomic rename")
+        sm.close()
+        sm2.close()
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+def test_shared_state_manager():
+    """Direct and Hugging Face downloads keep their entries in one downloads.json"""
+    from download_state_manager import get_state_manager
+    from download_manager import DownloadManager
+    from huggingface_downloader import HuggingFaceDownloader
+    
+    print("\n--- Shared state manager ---")
+    assert DownloadManager().state_manager is get_state_manager()
+    assert HuggingFaceDownloader().state_manager is get_state_manager()
+    print("✓ Downloaders share one state manager, so neither overwrites the other's entries")
+
 if __name__ == "__main__":
     test_state_manager()
+    test_debounced_persistence()
+    test_shared_state_manager()
@@ -0,0 +1,58 @@
+"""
+Test the yt-dlp info cache
+Uses hand-made info dicts so no network access is needed
+"""
+
+import time
+
+from video_info_cache import VideoInfoCache, video_key
+
+
+def test_video_info_cache():
+    """Key normalization, TTL expiry, LRU eviction and copy-on-read"""
+
+    print("=" * 60)
+    print("VIDEO INFO CACHE TEST")
+    print("=" * 60)
+
+    print("\n--- TEST 1: URL normalization ---")
+    key = video_key("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+    assert key == "Youtube:dQw4w9WgXcQ"
+    assert video_key("https://youtu.be/dQw4w9WgXcQ") == key
+    assert video_key("https://m.youtube.com/watch?v=dQw4w9WgXcQ&t=42") == key
+    print(f"✓ Different URL forms share key {key}")
+
+    print("\n--- TEST 2: Hits are private copies ---")
+    cache = VideoInfoCache(ttl=60, max_entries=2)
+    info = {'id': 'dQw4w9WgXcQ', 'extractor_key': 'Youtube', 'title': 'Test', 'formats': [{'format_id': '18'}]}
+    cache.put("https://youtu.be/dQw4w9WgXcQ", info)
+    hit = cache.get("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+    assert hit == info
+    hit['formats'].append({'format_id': '22'})
+    assert len(cache.get("https://youtu.be/dQw4w9WgXcQ")['formats']) == 1
+    print("✓ Cached info is shared across URL forms and not mutated by callers")
+
+    print("\n--- TEST 3: LRU eviction ---")
+    cache.put("https://youtu.be/aaaaaaaaaaa", {'id': 'aaaaaaaaaaa', 'extractor_key': 'Youtube'})
+    cache.get("https://youtu.be/dQw4w9WgXcQ")
+    cache.put("https://youtu.be/bbbbbbbbbbb", {'id': 'bbbbbbbbbbb', 'extractor_key': 'Youtube'})
+    assert cache.get("https://youtu.be/aaaaaaaaaaa") is None
+    assert cache.get("https://youtu.be/dQw4w9WgXcQ") is not None
+    print("✓ Least recently used entry evicted")
+
+    print("\n--- TEST 4: TTL expiry and invalidation ---")
+    short = VideoInfoCache(ttl=0.1)
+    short.put("https://youtu.be/dQw4w9WgXcQ", info)
+    time.sleep(0.2)
+    assert short.get("https://youtu.be/dQw4w9WgXcQ") is None
+    cache.invalidate("https://youtu.be/dQw4w9WgXcQ")
+    assert cache.get("https://www.youtube.com/watch?v=dQw4w9WgXcQ") is None
+    print("✓ Expired and invalidated entries are refetched")
+
+    print("\n" + "=" * 60)
+    print("VIDEO INFO CACHE TEST COMPLETE")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_video_info_cache()
@@ -156,11 +156,16 @@ class ConfigManager:
             'auto_quality': True,
             'extract_audio': False,
             'max_downloads': 3,
+            'max_downloads_per_host': 2,
             'destination': os.path.expanduser("~/Downloads/NGK_Downloads"),
             'theme': 'default',
             'auto_resume': True,
             'max_retries': 3,
-            'chunk_size': 8192,
+            'chunk_size': 1048576,  # Starting read size (at least 256 KB); then follows measured throughput
+            'max_segments': 16,  # Most parallel connections the tuner may use for one file
+            'bandwidth_limit': 0,  # Bytes/s for all downloads together (0 = unlimited)
+            'link_rate': 0,  # Bytes/s the connection can carry (0 = estimate)
+            'serving_reserve': 0,  # Bytes/s kept free for /files streams while they run
             'save_thumbnails': True,
             'save_metadata': True,
             'window_geometry': '800x600',
@@ -366,14 +371,10 @@ class FileUtils:
     
     @staticmethod
     def calculate_checksum(filepath, algorithm='md5'):
-        """Calculate file checksum"""
-        import hashlib
+        """Calculate file checksum (see ChecksumService for many files)"""
+        from checksum_service import hash_file
         
         try:
-            hash_obj = hashlib.new(algorithm)
-            with open(filepath, 'rb') as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_obj.update(chunk)
-            return hash_obj.hexdigest()
+            return hash_file(filepath, algorithm)
         except Exception as e:
             return None
\ No newline at end of file
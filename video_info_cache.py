@@ -0,0 +1,105 @@
+"""
+Video Info Cache
+TTL + LRU cache of yt-dlp info dicts keyed by extractor and video ID
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from yt_dlp.extractor import gen_extractor_classes
+
+
+@lru_cache(maxsize=1)
+def _extractor_classes():
+    """All yt-dlp extractors except the catch-all generic one"""
+    return [ie for ie in gen_extractor_classes() if ie.ie_key() != 'Generic']
+
+
+@lru_cache(maxsize=4096)
+def video_key(url):
+    """
+    Normalize a URL to 'Extractor:video_id' without any network access
+
+    youtu.be/X, youtube.com/watch?v=X&t=10 and m.youtube.com/watch?v=X all
+    map to 'Youtube:X'. URLs no extractor recognizes fall back to the URL.
+    """
+    for ie in _extractor_classes():
+        try:
+            if ie.suitable(url):
+                video_id = ie.get_temp_id(url)
+                if video_id:
+                    return f"{ie.ie_key()}:{video_id}"
+                break
+        except Exception:
+            continue
+    return url
+
+
+def info_key(info):
+    """Cache key for an extracted info dict"""
+    if info.get('extractor_key') and info.get('id'):
+        return f"{info['extractor_key']}:{info['id']}"
+    return None
+
+
+class VideoInfoCache:
+    """
+    Keep recently extracted info dicts so one download needs one extraction
+
+    Entries expire after ttl seconds (format URLs handed out by sites stop
+    working after a few hours) and the least recently used entry is evicted
+    once max_entries is reached. get() returns a deep copy, since yt-dlp
+    mutates info dicts while processing them.
+    """
+
+    def __init__(self, ttl=1800, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (stored_at, info)
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        """Cached info for url, or None if missing or expired"""
+        key = video_key(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, info = entry
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return copy.deepcopy(info)
+
+    def put(self, url, info):
+        """Store a sanitized info dict under the URL's and the info's own key"""
+        keys = {video_key(url), info_key(info)} - {None}
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                self._entries[key] = (now, info)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, url):
+        """Drop the entry for url (e.g. after its format URLs expired)"""
+        with self._lock:
+            entry = self._entries.pop(video_key(url), None)
+            if entry is not None:
+                # Also drop the aliases stored for the same extraction
+                for key in [k for k, v in self._entries.items() if v[1] is entry[1]]:
+                    del self._entries[key]
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -10,10 +10,39 @@ import time
 from pathlib import Path
 import json
 import re
+from functools import partial
+from urllib.parse import urlparse
+from video_info_cache import VideoInfoCache
+from download_archive import DownloadArchive
+from bandwidth_limiter import get_limiter
+
+class DownloadContext:
+    """
+    State of one running download
+    
+    Each download gets its own context, bound into its own progress hook,
+    so one YouTubeDownloader can run many downloads at the same time without
+    their progress updates crossing over.
+    """
+    
+    def __init__(self, url, progress_callback=None, filename="Preparing..."):
+        self.url = url
+        self.host = urlparse(url).hostname
+        self.callback = progress_callback
+        self.filename = filename
+        self.downloaded_bytes = 0  # Of the file yt-dlp is currently writing
+    
+    def report(self, info):
+        """Send a progress update to this download's callback"""
+        if self.callback:
+            self.callback(info)
+
 
 class YouTubeDownloader:
-    def __init__(self):
+    def __init__(self, info_cache=None, archive=None):
         self.active_downloads = {}
+        self.info_cache = info_cache or VideoInfoCache()
+        self.archive = archive or DownloadArchive()
     
     def sanitize_filename(self, filename):
         """Remove quotes and other problematic characters from filename"""
@@ -22,8 +51,75 @@ class YouTubeDownloader:
         filename = re.sub(r'[<>:"/\\|?*]', '', filename)  # Remove Windows invalid chars
         filename = re.sub(r'\s+', ' ', filename)  # Replace multiple spaces with single space
         return filename.strip()
-
-
+    
+    def _extract_info(self, url):
+        """
+        Extract video info once and serve repeats from the info cache
+        
+        Returns a private copy of the sanitized info dict, so callers may pass
+        it straight to YoutubeDL.process_ie_result.
+        """
+        info = self.info_cache.get(url)
+        if info is not None:
+            return info
+        
+        with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
+            info = ydl.extract_info(url, download=False)
+            if not info:
+                return None
+            info = ydl.sanitize_info(info)
+        
+        self.info_cache.put(url, info)
+        return self.info_cache.get(url) or info
+    
+    def _download_info(self, ydl, url, info):
+        """
+        Download using an already extracted info dict (no second extraction)
+        
+        Falls back to a fresh extraction if the cached info went stale, e.g.
+        the site's signed format URLs expired.
+        
+        Returns:
+            dict: The processed info dict (with final file paths), or None
+        """
+        if info is None:
+            ydl.download([url])
+            return None
+        try:
+            return ydl.process_ie_result(info, download=True)
+        except (yt_dlp.utils.DownloadError, yt_dlp.utils.ReExtractInfo) as e:
+            print(f"Cached info failed ({e}), extracting again")
+            self.info_cache.invalidate(url)
+            return ydl.extract_info(url, download=True)
+    
+    def _archive_download(self, info):
+        """Record a finished download in the archive"""
+        if not info:
+            return
+        try:
+            downloads = info.get('requested_downloads') or [info]
+            filepath = downloads[0].get('filepath') or info.get('filepath')
+            self.archive.record(info, filepath)
+        except Exception as e:
+            print(f"Could not update download archive: {e}")
+    
+    def _already_downloaded(self, filepath, filename, url, progress_callback):
+        """Report an existing file and build the skipped result"""
+        if progress_callback:
+            progress_callback({
+                'filename': filename,
+                'progress': "100%",
+                'speed': "0 B/s",
+                'status': 'Already downloaded'
+            })
+        return {
+            'status': 'success',
+            'filepath': filepath,
+            'filename': filename,
+            'url': url,
+            'resumed': False,
+            'skipped': True
+        }
         
     def check_existing_download(self, url, destination):
         """Check if video is already downloaded or partially downloaded"""
@@ -35,11 +131,11 @@ class YouTubeDownloader:
                 'outtmpl': os.path.join(destination, '%(title)s.%(ext)s'),
             }
             
+            info = self._extract_info(url)
+            if not info:
+                return None
+            
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                if not info:
-                    return None
-                
                 # Generate the expected filename
                 filename = ydl.prepare_filename(info)
                 partial_filename = filename + '.part'
@@ -82,40 +178,39 @@ class YouTubeDownloader:
         Returns:
             bool: True if download successful, False otherwise
         """
+        context = DownloadContext(url, progress_callback)
         try:
             # Create destination directory
             os.makedirs(destination, exist_ok=True)
             
+            # The archive answers from the URL alone - no metadata extraction
+            self.archive.scan(destination)
+            archived = self.archive.lookup(url, destination)
+            if archived:
+                return self._already_downloaded(archived['path'], os.path.basename(archived['path']),
+                                                url, progress_callback)
+            
             # Check for existing download
             existing = self.check_existing_download(url, destination)
             if existing and existing['status'] == 'complete':
-                if progress_callback:
-                    progress_callback({
-                        'filename': existing['filename'],
-                        'progress': "100%",
-                        'speed': "0 B/s",
-                        'status': 'Already downloaded'
-                    })
-                return {
-                    'status': 'success',
-                    'filepath': existing['filepath'],
-                    'filename': existing['filename'],
-                    'url': url,
-                    'resumed': False
-                }
+                self.archive.record(self._extract_info(url), existing['filepath'])
+                return self._already_downloaded(existing['filepath'], existing['filename'],
+                                                url, progress_callback)
             
             # Get video info first to clean the title before creating the template
-            temp_ydl_opts = {'quiet': True, 'no_warnings': True}
-            with yt_dlp.YoutubeDL(temp_ydl_opts) as temp_ydl:
-                info = temp_ydl.extract_info(url, download=False)
-                uploader = self.sanitize_filename(info.get('uploader', 'Unknown'))
-                title = self.sanitize_filename(info.get('title', 'Unknown'))
+            # (served from the info cache filled by check_existing_download)
+            info = self._extract_info(url)
+            uploader = self.sanitize_filename(info.get('uploader') or 'Unknown')
+            title = self.sanitize_filename(info.get('title') or 'Unknown')
+            
+            # Use the cleaned title for display
+            context.filename = title
             
             # Configure yt-dlp options with clean filename template
             clean_template = os.path.join(destination, f'{uploader} - {title}.%(ext)s')
             ydl_opts = {
                 'outtmpl': clean_template,
-                'progress_hooks': [self._progress_hook],
+                'progress_hooks': [partial(self._progress_hook, context)],
                 'extract_flat': False,
                 'writethumbnail': True,
                 'writeinfojson': True,
@@ -127,6 +222,7 @@ class YouTubeDownloader:
                 'ignoreerrors': False,  # Don't ignore errors
                 'postprocessors': [],  # Will add specific postprocessors based on download type
             }
+            ydl_opts.update(self._rate_limit_options(context))
             
             # Configure quality settings
             if extract_audio:
@@ -158,35 +254,31 @@ class YouTubeDownloader:
                 else:
                     ydl_opts['format'] = quality
             
-            # Store callback for this download
-            self.current_callback = progress_callback
-            self.current_filename = "Preparing..."
             was_resumed = existing and existing['status'] == 'partial'
             
-            # Use the cleaned title for display
-            self.current_filename = title
-            
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                 
                 if progress_callback:
                     status_msg = 'Resuming download' if was_resumed else 'Starting'
                     progress_callback({
-                        'filename': self.current_filename,
+                        'filename': context.filename,
                         'progress': "0%",
                         'speed': "0 B/s",
                         'status': status_msg
                     })
                 
-                # Download video
-                ydl.download([url])
+                # Download video, reusing the extracted info
+                downloaded_info = self._download_info(ydl, url, info)
+            
+            self._archive_download(downloaded_info)
             
             # Clean up separate metadata and thumbnail files if audio extraction was used
             if extract_audio:
-                self._cleanup_metadata_files(destination, self.current_filename)
+                self._cleanup_metadata_files(destination, context.filename)
             
             if progress_callback:
                 progress_callback({
-                    'filename': self.current_filename,
+                    'filename': context.filename,
                     'progress': "100%",
                     'speed': "0 B/s",
                     'status': 'Completed'
@@ -196,7 +288,7 @@ class YouTubeDownloader:
             return {
                 'status': 'success',
                 'filepath': destination,
-                'filename': self.current_filename,
+                'filename': context.filename,
                 'url': url,
                 'resumed': was_resumed
             }
@@ -220,7 +312,7 @@ class YouTubeDownloader:
             
             if progress_callback:
                 progress_callback({
-                    'filename': getattr(self, 'current_filename', 'Unknown'),
+                    'filename': context.filename,
                     'progress': "0%",
                     'speed': "0 B/s",
                     'status': f'Error: {error_msg}'
@@ -228,17 +320,75 @@ class YouTubeDownloader:
             return {
                 'status': 'error',
                 'error': error_msg,
-                'filename': getattr(self, 'current_filename', 'Unknown'),
+                'filename': context.filename,
                 'url': url
             }
     
-    def _progress_hook(self, d):
-        """Progress hook for yt-dlp"""
-        if not hasattr(self, 'current_callback') or not self.current_callback:
+    def expand_playlist(self, url):
+        """
+        List the entries of a playlist or channel without extracting each video
+        
+        Returns:
+            dict: {'title', 'id', 'entries': [{'index', 'url', 'id', 'title'}]},
+                  or None if the URL is not a playlist
+        """
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': 'in_playlist',  # One request per page, not per video
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+        
+        if not info or info.get('_type') not in ('playlist', 'multi_video') or info.get('entries') is None:
+            return None
+        
+        entries = []
+        for index, entry in enumerate(info['entries'], start=1):
+            if not entry:
+                continue  # Deleted/private items show up as None
+            entry_url = entry.get('webpage_url') or entry.get('url')
+            if not entry_url:
+                continue
+            entries.append({
+                'index': index,
+                'url': entry_url,
+                'id': entry.get('id'),
+                'title': entry.get('title') or entry.get('id') or entry_url
+            })
+        
+        return {
+            'title': info.get('title') or info.get('id') or url,
+            'id': info.get('id'),
+            'entries': entries
+        }
+    
+    def _throttle(self, context, downloaded_bytes):
+        """Hold yt-dlp's download thread to the shared bandwidth limits"""
+        if downloaded_bytes < context.downloaded_bytes:
+            received = downloaded_bytes  # Next file (e.g. audio after video)
+        else:
+            received = downloaded_bytes - context.downloaded_bytes
+        context.downloaded_bytes = downloaded_bytes
+        if received > 0:
+            get_limiter().throttle(received, context.host, context.url)
+    
+    def _rate_limit_options(self, context):
+        """yt-dlp ratelimit for the tightest limit in force when the download starts"""
+        rate_limit = get_limiter().limit_for(context.host, context.url)
+        return {'ratelimit': rate_limit} if rate_limit else {}
+    
+    def _progress_hook(self, context, d):
+        """Progress hook for yt-dlp, bound to one download's context"""
+        if d['status'] == 'downloading':
+            # Runs in yt-dlp's download thread, once per block read
+            self._throttle(context, d.get('downloaded_bytes') or 0)
+        
+        if not context.callback:
             return
         
         if d['status'] == 'downloading':
-            filename = os.path.basename(d.get('filename', self.current_filename))
+            filename = os.path.basename(d.get('filename', context.filename))
             
             # Calculate progress and format display
             downloaded_bytes = d.get('downloaded_bytes', 0)
@@ -273,7 +423,7 @@ class YouTubeDownloader:
                         eta_str = self._format_time(eta_seconds)
                         speed_str = f"{self._format_size(speed_bytes)}/s - ETA: {eta_str}"
             
-            self.current_callback({
+            context.report({
                 'filename': filename_display,
                 'progress': progress_str,
                 'speed': speed_str,
@@ -281,8 +431,8 @@ class YouTubeDownloader:
             })
         
         elif d['status'] == 'finished':
-            filename = os.path.basename(d.get('filename', self.current_filename))
-            self.current_callback({
+            filename = os.path.basename(d.get('filename', context.filename))
+            context.report({
                 'filename': filename,
                 'progress': "100%",
                 'speed': "0 B/s",
@@ -292,14 +442,8 @@ class YouTubeDownloader:
     def get_video_info(self, url):
         """Get video information without downloading"""
         try:
-            ydl_opts = {
-                'quiet': True,
-                'no_warnings': True,
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                
+            info = self._extract_info(url)
+            if info:
                 # Extract relevant information
                 video_info = {
                     'title': info.get('title', 'Unknown'),
@@ -346,15 +490,8 @@ class YouTubeDownloader:
     def is_supported_url(self, url):
         """Check if URL is supported by yt-dlp"""
         try:
-            ydl_opts = {
-                'quiet': True,
-                'no_warnings': True,
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Try to extract info without downloading
-                ydl.extract_info(url, download=False)
-                return True
+            # Try to extract info without downloading (cached for the download)
+            return self._extract_info(url) is not None
         except:
             return False
     
@@ -419,12 +556,13 @@ class YouTubeDownloader:
     
     def download_with_format(self, url, destination, format_id, progress_callback=None):
         """Download video with specific format"""
+        context = DownloadContext(url, progress_callback)
         try:
             os.makedirs(destination, exist_ok=True)
             
             ydl_opts = {
                 'outtmpl': os.path.join(destination, '%(uploader)s - %(title)s.%(ext)s'),
-                'progress_hooks': [self._progress_hook],
+                'progress_hooks': [partial(self._progress_hook, context)],
                 'format': format_id,
                 'writethumbnail': True,
                 'writeinfojson': True,
@@ -435,27 +573,27 @@ class YouTubeDownloader:
                 'fragment_retries': 3,  # Retry failed fragments
                 'ignoreerrors': False,  # Don't ignore errors
             }
+            ydl_opts.update(self._rate_limit_options(context))
             
-            self.current_callback = progress_callback
+            info = self._extract_info(url)
+            context.filename = info.get('title', 'Unknown')
             
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                self.current_filename = info.get('title', 'Unknown')
                 
                 if progress_callback:
                     progress_callback({
-                        'filename': self.current_filename,
+                        'filename': context.filename,
                         'progress': "0%",
                         'speed': "0 B/s",
                         'status': 'Starting'
                     })
                 
-                ydl.download([url])
+                self._archive_download(self._download_info(ydl, url, info))
             
             return {
                 'status': 'success',
                 'filepath': destination,
-                'filename': self.current_filename,
+                'filename': context.filename,
                 'url': url
             }
             
@@ -463,7 +601,7 @@ class YouTubeDownloader:
             error_msg = str(e)
             if progress_callback:
                 progress_callback({
-                    'filename': getattr(self, 'current_filename', 'Unknown'),
+                    'filename': context.filename,
                     'progress': "0%",
                     'speed': "0 B/s",
                     'status': f'Error: {error_msg}'
@@ -471,7 +609,7 @@ class YouTubeDownloader:
             return {
                 'status': 'error',
                 'error': error_msg,
-                'filename': getattr(self, 'current_filename', 'Unknown'),
+                'filename': context.filename,
                 'url': url
             }
     